@@ -0,0 +1,423 @@
+# Depends on:  Python 3.3
+# Created:  October 18, 2026
+
+from commands import *
+from communication import encodeKeyboardCommand
+from communication import encodeMouseCommand
+from communication import iterKeyPhraseText
+from motionmodel import SimpleMotionModel
+from motionmodel import framedForPort
+
+# --------------------------------------------------------------------------
+# Actions
+# --------------------------------------------------------------------------
+# An ActionQueue records what a script does with a Mouse and a Keyboard as
+# a List of actions - MoveAction, ClickAction and KeyAction - rather than
+# sending it, so that the whole script can be optimized before anything is
+# transmitted:
+#
+#   queue = ActionQueue()
+#   queue.move(300, 200)
+#   queue.doClickDragRelease(0, 0)
+#   queue.typeKeyPhrase("hello")
+#   queue.returnToOrigin()
+#   print(queue.optimize())
+#   queue.send(serialPort, DDAMotionModel())
+#
+# optimizeActions() rewrites a List of actions into one that leaves the
+# device in the same state with fewer packets:
+#
+#   - No-ops are removed: moves of (0, 0), clicks the protocol has no code
+#     for, releases of buttons and keys that are not held, and presses of
+#     ones that already are.
+#   - Key clicks are moved ahead of the moves around them, up to the next
+#     mouse click or key press or release, and those moves are merged into
+#     one.  The keyboard does not depend on where the cursor is, and every
+#     click still happens at the same place.  Without reordering only
+#     adjacent moves are merged.  While a button or key is held, moves are
+#     sent exactly as queued, since a drag, or a move with a modifier held,
+#     depends on the path taken, and nothing is moved across them.
+#   - A press immediately followed by the release of the same button or
+#     key is folded into a click, where the protocol has a click code for
+#     it.
+#
+# Buttons and keys are assumed to be up when the actions start, as they
+# are once a Mouse has been created, so the releases a script sends "just
+# in case" are removed too.
+# --------------------------------------------------------------------------
+
+
+class MoveAction(object):
+    """ A relative move of the mouse.
+    """
+
+    __slots__ = ("xMove", "yMove")
+
+    def __init__(self, xMove, yMove):
+        self.xMove = xMove
+        self.yMove = yMove
+
+    def iterPackets(self, motionModel):
+        """ Yields the packets of the move's path.
+        """
+        return motionModel.iterPath(self.xMove, self.yMove)
+
+    def __eq__(self, other):
+        return (isinstance(other, MoveAction) and
+                self.xMove == other.xMove and self.yMove == other.yMove)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "MoveAction(%d, %d)" % (self.xMove, self.yMove)
+
+
+
+class ClickAction(object):
+    """ A click, press or release of a mouse button.
+    """
+
+    __slots__ = ("button", "clickType")
+
+    def __init__(self, button, clickType):
+        self.button = button
+        self.clickType = clickType
+
+    def iterPackets(self, motionModel):
+        """ Yields the action's mouse packet.
+        """
+        yield encodeMouseCommand(ClickDescriptor(self.button, self.clickType), 0, 0)
+
+    def __eq__(self, other):
+        return (isinstance(other, ClickAction) and
+                self.button == other.button and self.clickType == other.clickType)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "ClickAction(%r, %r)" % (self.button, self.clickType)
+
+
+
+class KeyAction(object):
+    """ A click, press or release of a key.
+    """
+
+    __slots__ = ("character", "keyPushType")
+
+    def __init__(self, character, keyPushType):
+        self.character = character
+        self.keyPushType = keyPushType
+
+    def iterPackets(self, motionModel):
+        """ Yields the action's keyboard packet.
+        """
+        yield encodeKeyboardCommand(KeyPressDescriptor(self.character, self.keyPushType))
+
+    def __eq__(self, other):
+        return (isinstance(other, KeyAction) and
+                self.character == other.character and self.keyPushType == other.keyPushType)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "KeyAction(%r, %r)" % (self.character, self.keyPushType)
+
+
+
+def iterActionPackets(actions, motionModel=SimpleMotionModel()):
+    """ Yields the packets of a sequence of actions, with moves taken along
+        the paths of the given motion model.
+    """
+    for action in actions:
+        for packet in action.iterPackets(motionModel):
+            yield packet
+
+
+def measureActions(actions, motionModel=SimpleMotionModel()):
+    """ Returns the number of bytes the actions encode to.
+    """
+    total = 0
+    for packet in iterActionPackets(actions, motionModel):
+        total += len(b"".join(packet)) if isinstance(packet, list) else len(packet)
+    return total
+
+
+def optimizeActions(actions, assumeReleased=True, reorder=True):
+    """ Returns an optimized copy of a sequence of actions, as described at
+        the top of this module, along with a dictionary counting what was
+        changed:
+
+            noOps           - actions removed because they did nothing.
+            mergedMoves     - moves merged into another move.
+            foldedClicks    - press and release pairs folded into clicks.
+
+        assumeReleased  - True if every button and key is up when the
+                          actions start.  If False, the first release of
+                          each is kept.
+
+        reorder         - False to keep key clicks where they are
+                          relative to moves.
+    """
+    counts = {"noOps": 0, "mergedMoves": 0, "foldedClicks": 0}
+    actions = _removeNoOps(actions, assumeReleased, counts)
+    actions = _mergeMoves(actions, reorder, counts)
+    return _foldClicks(actions, counts), counts
+
+
+def _removeNoOps(actions, assumeReleased, counts):
+    """ Drops the actions that cannot change anything, following whether
+        each button and key is held.  A button or key missing from the
+        held dictionary is in an unknown state.
+    """
+    held = {}
+    result = []
+    for action in actions:
+        if isinstance(action, MoveAction):
+            keep = action.xMove != 0 or action.yMove != 0
+        else:
+            if isinstance(action, ClickAction):
+                if ClickDescriptor(action.button, action.clickType).getCode() == 0:
+                    counts["noOps"] += 1
+                    continue
+                key = action.button
+                pushType = action.clickType
+            else:
+                key = (action.character,)
+                pushType = action.keyPushType
+
+            state = held.get(key, False if assumeReleased else None)
+            if pushType == ClickType.PRESS or pushType == KeyPushType.PRESS:
+                keep = state != True
+                held[key] = True
+            elif pushType == ClickType.RELEASE or pushType == KeyPushType.RELEASE:
+                keep = state != False
+                held[key] = False
+            else:
+                # A click presses and releases, releasing a held one.
+                keep = True
+                held[key] = False
+
+        if keep:
+            result.append(action)
+        else:
+            counts["noOps"] += 1
+    return result
+
+
+def _mergeMoves(actions, reorder, counts):
+    """ Merges runs of moves made while no button or key is held.  When
+        reordering, the key clicks in a run go first and every move in it
+        is merged into one that follows them.  Mouse clicks and key presses
+        and releases end a run.
+    """
+    result = []
+    keys = []
+    xMove = 0
+    yMove = 0
+    moves = 0
+
+    # The buttons and keys pressed by the actions and not yet released.
+    held = set()
+
+    for action in actions + [None]:
+        if not held:
+            if isinstance(action, MoveAction):
+                xMove += action.xMove
+                yMove += action.yMove
+                moves += 1
+                continue
+
+            if (reorder and isinstance(action, KeyAction) and
+                    action.keyPushType == KeyPushType.CLICK):
+                keys.append(action)
+                continue
+
+        # Anything else, (or the end), ends the run of moves.
+        result.extend(keys)
+        keys = []
+        if moves:
+            counts["mergedMoves"] += moves - 1
+            if xMove != 0 or yMove != 0:
+                result.append(MoveAction(xMove, yMove))
+            else:
+                counts["noOps"] += 1
+            xMove = 0
+            yMove = 0
+            moves = 0
+
+        if isinstance(action, ClickAction):
+            key = action.button
+            pushType = action.clickType
+        elif isinstance(action, KeyAction):
+            key = (action.character,)
+            pushType = action.keyPushType
+        else:
+            key = None
+        if key is not None:
+            if pushType == ClickType.PRESS or pushType == KeyPushType.PRESS:
+                held.add(key)
+            else:
+                held.discard(key)
+
+        if action is not None:
+            result.append(action)
+    return result
+
+
+def _foldClicks(actions, counts):
+    """ Folds each press that is immediately followed by the release of the
+        same button or key into one click.
+    """
+    result = []
+    for action in actions:
+        previous = result[-1] if result else None
+        if (isinstance(action, ClickAction) and isinstance(previous, ClickAction) and
+                action.button == previous.button and
+                previous.clickType == ClickType.PRESS and action.clickType == ClickType.RELEASE and
+                ClickDescriptor(action.button, ClickType.CLICK).getCode() != 0):
+            result[-1] = ClickAction(action.button, ClickType.CLICK)
+            counts["foldedClicks"] += 1
+        elif (isinstance(action, KeyAction) and isinstance(previous, KeyAction) and
+                action.character == previous.character and
+                previous.keyPushType == KeyPushType.PRESS and action.keyPushType == KeyPushType.RELEASE):
+            result[-1] = KeyAction(action.character, KeyPushType.CLICK)
+            counts["foldedClicks"] += 1
+        else:
+            result.append(action)
+    return result
+
+
+
+class ActionQueue(object):
+    """ Records Mouse and Keyboard actions for optimizing and sending later.
+        Offers the methods of both a Mouse and a Keyboard.
+    """
+
+    def __init__(self):
+        """ Creates an empty ActionQueue, with the mouse at its origin.
+        """
+        self.__actions = []
+        self.__x = 0
+        self.__y = 0
+
+
+    def doLeftClick(self):
+        """ Queues a left click.
+        """
+        self.doClick(MouseButton.LEFT, ClickType.CLICK)
+
+
+    def doRightClick(self):
+        """ Queues a right click.
+        """
+        self.doClick(MouseButton.RIGHT, ClickType.CLICK)
+
+
+    def doClick(self, button=MouseButton.LEFT, clickType=ClickType.CLICK):
+        """ Queues a click as specified by the button and click type.
+        """
+        self.__actions.append(ClickAction(button, clickType))
+
+
+    def move(self, xMove, yMove):
+        """ Queues a relative move from the mouse's current position.
+        """
+        self.__actions.append(MoveAction(xMove, yMove))
+        self.__x += xMove
+        self.__y += yMove
+
+
+    def doClickDragRelease(self, xMove, yMove, mouseButton=MouseButton.LEFT):
+        """ Queues a press, drag and release from the mouse's current
+            position.
+        """
+        if mouseButton == None:
+            raise ValueError("mouseButton must not be None.")
+
+        self.__actions.append(ClickAction(mouseButton, ClickType.PRESS))
+        self.move(xMove, yMove)
+        self.__actions.append(ClickAction(mouseButton, ClickType.RELEASE))
+
+
+    def returnToOrigin(self):
+        """ Queues a move back to the mouse's original position.
+        """
+        self.move(-self.__x, -self.__y)
+
+
+    def getLocation(self):
+        """ Returns the x and y position the queued actions leave the mouse
+            at, relative to where it started.
+        """
+        return self.__x, self.__y
+
+
+    def typeKey(self, character, keyPushType=KeyPushType.CLICK):
+        """ Queues a single key push of the provided character.
+        """
+        KeyPressDescriptor(character, keyPushType).getKeyCode()
+        self.__actions.append(KeyAction(character, keyPushType))
+
+
+    def typeKeyPhrase(self, text):
+        """ Queues a key click for every character of text.  Accepts the
+            same text sources as Keyboard.typeKeyPhrase(); a String is
+            checked before anything is queued.
+        """
+        if text == None:
+            return
+
+        for chunk in iterKeyPhraseText(text):
+            self.__actions.extend(KeyAction(character, KeyPushType.CLICK) for character in chunk)
+
+
+    def getActions(self):
+        """ Returns a copy of the queued actions.
+        """
+        return list(self.__actions)
+
+
+    def clear(self):
+        """ Empties the queue.  The mouse's position is kept, since the
+            actions already sent have moved it.
+        """
+        del self.__actions[:]
+
+
+    def optimize(self, motionModel=SimpleMotionModel(), assumeReleased=True, reorder=True):
+        """ Replaces the queued actions with optimizeActions()'s rewrite of
+            them, and returns a report as a dictionary: optimizeActions()'s
+            counts, and
+
+                actionsBefore,
+                actionsAfter    - the number of actions.
+                bytesBefore,
+                bytesAfter      - the bytes the actions encode to with the
+                                  given motion model.
+                bytesSaved      - the difference.
+        """
+        before = self.__actions
+        after, report = optimizeActions(before, assumeReleased, reorder)
+        self.__actions = after
+
+        report["actionsBefore"] = len(before)
+        report["actionsAfter"] = len(after)
+        report["bytesBefore"] = measureActions(before, motionModel)
+        report["bytesAfter"] = measureActions(after, motionModel)
+        report["bytesSaved"] = report["bytesBefore"] - report["bytesAfter"]
+        return report
+
+
+    def send(self, serialPort, motionModel=SimpleMotionModel(), motionFrames=None):
+        """ Sends the queued actions to a SerialPort, (or anything with its
+            sendPackets()), in as few writes as possible, and empties the
+            queue.  motionModel and motionFrames are as for Mouse.
+        """
+        model = framedForPort(motionModel, serialPort, motionFrames)
+        actions = self.__actions
+        self.__actions = []
+        serialPort.sendPackets(iterActionPackets(actions, model))
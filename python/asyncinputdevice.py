@@ -0,0 +1,164 @@
+# Depends on:  Python 3.7
+# Created:  October 18, 2026
+
+from itertools import chain
+
+from commands import *
+from motionmodel import SimpleMotionModel
+from motionmodel import framedForPort
+import communication
+
+
+class AsyncMouse(object):
+    """ The asyncio equivalent of inputdevice.Mouse.  Every action is a
+        coroutine that completes once its packets have been written to the
+        supplied AsyncSerialPort.
+    """
+
+    def __init__(self, serialPort, motionModel=SimpleMotionModel(), motionFrames=None):
+        """ Constructor.  Creates an AsyncMouse object with the supplied
+            AsyncSerialPort.
+
+            Unlike Mouse, the constructor cannot send anything; await
+            releaseButtons() (or use AsyncMouse.create()) to put the mouse
+            into a known state.
+
+            serialPort  - The AsyncSerialPort to send the mouse commands
+                          via.  If None/Null is provided, a ValueError is
+                          raised.
+
+            motionFrames - as for Mouse.
+        """
+        if serialPort == None:
+            raise ValueError("Parameter 'serialPort' cannot be 'None.'")
+
+        if motionModel == None:
+            raise ValueError("Parameter 'motionModel' cannot be 'None.'")
+
+        self.__serialPort = serialPort
+        self.__motionModel = framedForPort(motionModel, serialPort, motionFrames)
+
+        # Initialize location - The starting position of the mouse is
+        # the 'origin' of the grid upon which the mouse moves.
+        self.__x = 0
+        self.__y = 0
+
+
+    @classmethod
+    async def create(cls, serialPort, motionModel=SimpleMotionModel(), motionFrames=None):
+        """ Creates an AsyncMouse and releases both buttons, just as
+            constructing a Mouse does.
+        """
+        mouse = cls(serialPort, motionModel, motionFrames)
+        await mouse.releaseButtons()
+        return mouse
+
+
+    async def releaseButtons(self):
+        """ Releases both the left and right mouse buttons.
+        """
+        await self.doClick(MouseButton.LEFT, ClickType.RELEASE)
+        await self.doClick(MouseButton.RIGHT, ClickType.RELEASE)
+
+
+    async def doLeftClick(self):
+        """ Performs a left click in the Mouse's current location.
+        """
+        await self.doClick(MouseButton.LEFT, ClickType.CLICK)
+
+
+    async def doRightClick(self):
+        """ Performs a Right click in the Mouse's current location.
+        """
+        await self.doClick(MouseButton.RIGHT, ClickType.CLICK)
+
+
+    async def doClick(self, button=MouseButton.LEFT, clickType=ClickType.CLICK):
+        """ Performs a click as specified by the button and click type in the
+            parameters.
+
+            Params:
+            button      the button to click.
+            clickType   the type of click to perform.
+        """
+        packet = communication.encodeMouseCommand(ClickDescriptor(button, clickType), 0, 0)
+        await self.__serialPort.sendPackets([packet])
+
+
+    async def move(self, xMove, yMove):
+        """ Performs a relative move from the mouse's current position.
+
+            xMove   - the amount of X coordinate movement.
+
+            yMove   - the amount of Y coordinate movement.
+        """
+        await self.__serialPort.sendPackets(self.__motionModel.iterPath(xMove, yMove))
+
+        # update location.
+        self.__x += xMove
+        self.__y += yMove
+
+
+    async def doClickDragRelease(self, xMove, yMove, mouseButton=MouseButton.LEFT):
+        """ Performs a click, drag, release operation from the mouse's
+            current location.
+
+            xMove       - the amount of X coordinate movement.
+
+            yMove       - the amount of Y coordinate movement.
+
+            mouseButton - the button to click and drag with.  Defaults to
+                          the Left mouse button.
+        """
+        if mouseButton == None:
+            raise ValueError("mouseButton must not be None.")
+
+        press = communication.encodeMouseCommand(ClickDescriptor(mouseButton, ClickType.PRESS), 0, 0)
+        release = communication.encodeMouseCommand(ClickDescriptor(mouseButton, ClickType.RELEASE), 0, 0)
+
+        await self.__serialPort.sendPackets(chain([press], self.__motionModel.iterPath(xMove, yMove), [release]))
+
+        # update location.
+        self.__x += xMove
+        self.__y += yMove
+
+
+    async def returnToOrigin(self):
+        """ Returns the mouse position to its original position.
+        """
+        await self.move(-1 * self.__x, -1 * self.__y)
+
+
+    def getLocation(self):
+        """ Returns the x and y values (respectively) of this Mouse object's
+            current position relative to its original position.
+        """
+        return self.__x, self.__y
+
+
+
+class AsyncKeyboard(object):
+    """ The asyncio equivalent of inputdevice.Keyboard.
+    """
+
+    def __init__(self, serialPort):
+        """ Constructor, creates a new instance of AsyncKeyboard that sends
+            via the supplied AsyncSerialPort.
+        """
+        self.__serialPort = serialPort
+
+    async def typeKey(self, character, keyPushType=KeyPushType.CLICK):
+        """ Sends a single key push of the provided character.
+        """
+        packet = communication.encodeKeyboardCommand(KeyPressDescriptor(character, keyPushType))
+        await self.__serialPort.sendPackets([packet])
+
+    async def typeKeyPhrase(self, text):
+        """ Types the provided text, sending a key click for each
+            character.  Accepts the same text sources as
+            Keyboard.typeKeyPhrase().
+        """
+        if text == None:
+            return
+
+        await self.__serialPort.sendPackets(communication.iterKeyPhrasePackets(text))
@@ -0,0 +1,262 @@
+# Depends on:  Python 3.7, PySerial 3.0
+# Created:  October 18, 2026
+
+from projectconfig import SerialConfig
+from communication import WRITE_SIZE
+from loopback import asChunkHandler
+from serialport import DeviceStalledError
+from serialport import READ_SIZE
+
+import asyncio
+import inspect
+import os
+import serial
+import time
+
+# --------------------------------------------------------------------------
+# AsyncSerialPort
+# --------------------------------------------------------------------------
+# An asyncio flavoured SerialPort.  Rather than starting a listener thread
+# and blocking writers, the AsyncSerialPort registers the serial port's file
+# descriptor with the running event loop.  Incoming bytes are read when the
+# descriptor is readable, writes are non-blocking, and waiting for the
+# target device's 'ready' byte is an awaitable.
+#
+# The AsyncSerialPort relies on the serial port exposing a file descriptor,
+# so it is only available on Unix-like systems.
+# --------------------------------------------------------------------------
+
+class AsyncSerialPort(object):
+    """ An asyncio variant of SerialPort.  Must be constructed from within
+        a running event loop, and only used from that loop.
+    """
+
+    def __init__(self, readyTimeout=None, stallHandler=None, readSize=READ_SIZE, config=None):
+        """ Constructs a new AsyncSerialPort and starts listening for data
+            from the target device on the running event loop.
+
+            Parameters:
+                readyTimeout    - the number of seconds to wait for the
+                                  target device to become ready before
+                                  treating it as stalled.  If not specified
+                                  the port waits forever.
+
+                stallHandler    - a callable invoked as
+                                  stallHandler(serialPort, secondsWaited)
+                                  each time readyTimeout elapses without
+                                  the device becoming ready.  It may be a
+                                  coroutine function.  If no handler is
+                                  given a DeviceStalledError is raised.
+
+                readSize        - the most bytes read from the serial port
+                                  at once.
+
+                config          - the SerialConfig to use.  If not
+                                  specified the values from serial.cfg are
+                                  used.
+        """
+        self.__loop = asyncio.get_running_loop()
+
+        # The handler for loopback data, or None if loopback is off.
+        self.__loopbackHandler = None
+
+        self.__readyTimeout = readyTimeout
+        self.__stallHandler = stallHandler
+        self.__readSize = readSize
+
+        # Set while the target device is ready to receive more bytes.
+        self.__readyEvent = asyncio.Event()
+        self.__readyEvent.set()
+
+        # Keeps the packets of concurrent sendPackets() calls together.
+        self.__sendLock = asyncio.Lock()
+
+        # The error that stopped the port, once it has failed, and the
+        # futures of writers waiting for room on the descriptor.
+        self.__failure = None
+        self.__writableFutures = set()
+
+        # Initialize the pyserial serial port object that this object wraps,
+        # and switch its descriptor to non-blocking mode.
+        if config == None:
+            config = SerialConfig()
+        self.__config = config
+        self.__serialPort = serial.Serial(config.port, baudrate=config.baud, timeout=0)
+        self.__fd = self.__serialPort.fileno()
+        os.set_blocking(self.__fd, False)
+
+        #ready and wait
+        self.__ready = config.readybyte
+        self.__wait = config.waitbyte
+
+        self.__loop.add_reader(self.__fd, self.__onReadable)
+
+
+    async def sendBytes(self, bites):
+        """ Sends an array of bytes via this serial port in a single write.
+
+            Parameters:
+                bites   - a List of Bytes to send.
+        """
+        await self.sendPackets([bites])
+
+
+    async def sendPackets(self, packets):
+        """ Sends a series of packets via this serial port, joined into as
+            few writes as possible.  Flow control is honored between
+            writes exactly as it is by SerialPort.sendPackets().
+
+            Parameters:
+                packets - an iterable of packets.  Each packet may be a
+                          List of Bytes or any bytes-like object.
+        """
+        async with self.__sendLock:
+            buffer = bytearray()
+            for packet in packets:
+                if isinstance(packet, list):
+                    packet = b"".join(packet)
+
+                if buffer and len(buffer) + len(packet) > WRITE_SIZE:
+                    await self.__write(bytes(buffer))
+                    buffer.clear()
+
+                buffer += packet
+
+            if buffer:
+                await self.__write(bytes(buffer))
+
+
+    def getConfig(self):
+        """ Returns the SerialConfig this port was opened with.
+        """
+        return self.__config
+
+
+    def startLoopback(self, loopbackHandler):
+        """ Enables loopback for debug purposes using the provided
+            LoopbackHandler.
+        """
+        self.__loopbackHandler = asChunkHandler(loopbackHandler)
+
+
+    def endLoopback(self):
+        """ Turns off loopback for debug purposes.
+        """
+        self.__loopbackHandler = None
+
+
+    def close(self):
+        """ Stops listening and closes the underlying serial port.  Writers
+            still waiting on the port fail with a ConnectionError.
+        """
+        self.__fail(ConnectionError("Serial port was closed."))
+        self.__serialPort.close()
+
+
+    async def __write(self, data):
+        """ Writes all of data once the target device is ready, yielding to
+            the event loop whenever the descriptor cannot take more.
+        """
+        if self.__failure != None:
+            raise self.__failure
+
+        if not self.__readyEvent.is_set():
+            await self.__waitUntilReady()
+
+        offset = 0
+        while offset < len(data):
+            if self.__failure != None:
+                raise self.__failure
+            try:
+                offset += os.write(self.__fd, data[offset:])
+            except BlockingIOError:
+                pass
+
+            if offset < len(data):
+                await self.__writable()
+
+
+    async def __writable(self):
+        """ Waits until the serial port's descriptor can accept more bytes.
+        """
+        future = self.__loop.create_future()
+        self.__writableFutures.add(future)
+        self.__loop.add_writer(self.__fd, future.set_result, None)
+        try:
+            await future
+        finally:
+            self.__writableFutures.discard(future)
+            if self.__failure == None:
+                self.__loop.remove_writer(self.__fd)
+
+
+    async def __waitUntilReady(self):
+        """ Waits for the target device to send the ready byte, reporting a
+            stall each time the ready timeout elapses.
+        """
+        start = time.monotonic()
+        while not self.__readyEvent.is_set():
+            if self.__failure != None:
+                raise self.__failure
+            try:
+                await asyncio.wait_for(self.__readyEvent.wait(), self.__readyTimeout)
+            except asyncio.TimeoutError:
+                waited = time.monotonic() - start
+                if self.__stallHandler == None:
+                    raise DeviceStalledError("Target device not ready after %.3f seconds." % waited)
+
+                result = self.__stallHandler(self, waited)
+                if inspect.isawaitable(result):
+                    await result
+
+        if self.__failure != None:
+            raise self.__failure
+
+
+    def __onReadable(self):
+        """ Called by the event loop when bytes are waiting on the serial
+            port.
+        """
+        try:
+            chunk = os.read(self.__fd, self.__readSize)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self.__fail(e)
+            return
+
+        if not chunk:
+            self.__fail(ConnectionError("Serial port was closed by the target device."))
+            return
+
+        handler = self.__loopbackHandler
+        if handler != None:
+            handler.handleBytes(chunk)
+
+        # Only the last ready or wait byte in the chunk matters.
+        waitIndex = chunk.rfind(self.__wait)
+        readyIndex = chunk.rfind(self.__ready)
+        if waitIndex > readyIndex:
+            self.__readyEvent.clear()
+
+        elif readyIndex > waitIndex:
+            self.__readyEvent.set()
+
+
+    def __fail(self, exception):
+        """ Stops reading from a port that has failed, and fails every
+            writer waiting on it, and every later write, with the given
+            exception.
+        """
+        if self.__failure != None:
+            return
+        self.__failure = exception
+        self.__loop.remove_reader(self.__fd)
+        self.__loop.remove_writer(self.__fd)
+        for future in list(self.__writableFutures):
+            if not future.done():
+                future.set_exception(exception)
+
+        # Wake the writers waiting for the ready byte, so that they see the
+        # failure.
+        self.__readyEvent.set()
@@ -0,0 +1,407 @@
+# Depends on:  Python 3.4, PySerial 3.0
+# Created:  October 18, 2026
+
+# --------------------------------------------------------------------------
+# Send pipeline benchmarks
+# --------------------------------------------------------------------------
+# Measures the cost of each layer of the send pipeline:
+#
+#   encode  - communication.buildMouseCommand / encodeMouseCommand and the
+#             keyboard equivalents, with no I/O at all.
+#   path    - MotionModel.getPath for each motion model, with no I/O.
+#             The NumPy curve models are included when NumPy is
+#             installed, along with their batch getPaths().
+#             Packets are counted as bytes / PACKET_SIZE throughout, so
+#             the framed model, which sends motion frames, is best
+#             compared with the others by bytes and seconds.
+#   send    - whole Mouse / Keyboard actions through a real SerialPort into
+#             an ArduinoEmulator on a pseudo-terminal, which exercises
+#             SerialPort.sendPackets and the listener thread as well.  The
+#             '.ring' scenarios encode into a PacketRing instead.
+#
+# Every result is a flat dictionary, and the whole run is written out as JSON
+# so that runs from different commits can be compared:
+#
+#   python benchmark.py --output before.json
+#   ... change things ...
+#   python benchmark.py --output after.json --baseline before.json
+#
+# "Allocations" are measured as the peak memory traced by tracemalloc and the
+# number of generation 0 garbage collections during the run, both relative to
+# the number of packets produced.  Stall time is the time the emulator spent
+# between sending the wait byte and the ready byte.
+#
+# A send scenario in which the emulator dropped bytes measured a link that
+# lost data, so its throughput is not reported: it is flagged as lossy, and
+# the benchmark exits with an error.  The 'lossless' scenarios check that
+# paced writes lose nothing to a device that drains more slowly than the
+# link delivers.
+# --------------------------------------------------------------------------
+
+from commands import ClickDescriptor
+from commands import KeyPressDescriptor
+from commands import KeyPushType
+from commands import MouseButton
+from communication import buildMouseCommand
+from communication import encodeMouseCommand
+from communication import buildKeyboardCommand
+from communication import encodeKeyboardCommand
+from communication import PACKET_SIZE
+from motionmodel import SimpleMotionModel
+from motionmodel import DDAMotionModel
+from motionmodel import CachingMotionModel
+from motionmodel import FramedMotionModel
+import curvemodel
+
+import argparse
+import gc
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# The moves each motion scenario performs, per iteration.
+LONG_MOVES = [(2000, 0), (-2000, 0), (0, 1500), (0, -1500)]
+DIAGONAL_MOVES = [(1500, 900), (-1500, -900), (700, -1300), (-700, 1300)]
+DRAG_MOVES = [(400, 300), (-400, -300)]
+
+# The text the typing scenario types, per iteration.
+PHRASE = "The quick brown fox jumps over the lazy dog. " * 20
+
+# The emulated link the lossless check paces writes over: a device with the
+# default buffer that drains bytes more slowly than the link delivers them.
+LOSSLESS_LINK = {"drainRate": 2000.0, "linkRate": 5760.0, "bufferSize": 64}
+
+# The send scenarios the lossless check runs, once each.
+LOSSLESS_SCENARIOS = ("framed-dda.long", "keyboard.phrase")
+
+
+def percentile(samples, fraction):
+    """ Returns the given fraction (0 to 1) percentile of a sorted List of
+        samples, using the nearest-rank method.
+    """
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, int(round(fraction * len(samples) + 0.5)) - 1))
+    return samples[index]
+
+
+class Measurement(object):
+    """ Collects timings, packet counts and garbage collection counts for
+        one run of a benchmark.  A traced Measurement also records the 
+        peak memory allocated, at the cost of distorting the timings.
+    """
+
+    def __init__(self, name, traced=False):
+        self.__name = name
+        self.__traced = traced
+        self.__latencies = []
+        self.__packets = 0
+        self.__bytes = 0
+        self.__peak = 0
+
+    def __enter__(self):
+        gc.collect()
+        self.__gcStart = gc.get_stats()[0]["collections"]
+        if self.__traced:
+            tracemalloc.start()
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.__elapsed = time.perf_counter() - self.__start
+        if self.__traced:
+            self.__peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.__gcCount = gc.get_stats()[0]["collections"] - self.__gcStart
+        return False
+
+    def time(self, action, *args):
+        """ Runs one action, recording its latency.
+        """
+        start = time.perf_counter()
+        result = action(*args)
+        self.__latencies.append(time.perf_counter() - start)
+        return result
+
+    def count(self, packets, byteCount=None):
+        """ Records that packets (and byteCount bytes) were produced.
+        """
+        self.__packets += packets
+        self.__bytes += packets * PACKET_SIZE if byteCount is None else byteCount
+
+    def getPeak(self):
+        """ Returns the peak traced memory, in bytes.
+        """
+        return self.__peak
+
+    def result(self, peak=0, **extra):
+        """ Returns the results as a flat dictionary.
+
+            peak    - the peak memory allocated by a traced run of the same
+                      benchmark.
+        """
+        elapsed = self.__elapsed
+        latencies = sorted(self.__latencies)
+        packets = max(self.__packets, 1)
+        result = {
+            "name":                 self.__name,
+            "seconds":              elapsed,
+            "actions":              len(latencies),
+            "packets":              self.__packets,
+            "bytes":                self.__bytes,
+            "packetsPerSecond":     self.__packets / elapsed if elapsed else 0.0,
+            "bytesPerSecond":       self.__bytes / elapsed if elapsed else 0.0,
+            "latencyP50Ms":         percentile(latencies, 0.50) * 1000,
+            "latencyP90Ms":         percentile(latencies, 0.90) * 1000,
+            "latencyP99Ms":         percentile(latencies, 0.99) * 1000,
+            "latencyMaxMs":         (latencies[-1] if latencies else 0.0) * 1000,
+            "peakBytesPerPacket":   peak / packets,
+            "gen0GcPer1kPackets":   self.__gcCount * 1000.0 / packets,
+        }
+        result.update(extra)
+        return result
+
+
+def measure(name, body):
+    """ Runs body(measurement) once for timing, then once more under 
+        tracemalloc for its allocations.  Returns the timed Measurement and
+        the traced run's peak memory.
+    """
+    with Measurement(name) as timed:
+        body(timed)
+    with Measurement(name, traced=True) as traced:
+        body(traced)
+    return timed, traced.getPeak()
+
+
+def benchEncoders(iterations):
+    """ Benchmarks building single mouse and keyboard packets.
+    """
+    results = []
+    noClick = ClickDescriptor()
+    key = KeyPressDescriptor("a", KeyPushType.CLICK)
+    cases = [
+        ("encode.buildMouseCommand",      lambda: buildMouseCommand(ClickDescriptor(), 17, -9)),
+        ("encode.encodeMouseCommand",     lambda: encodeMouseCommand(noClick, 17, -9)),
+        ("encode.buildKeyboardCommand",   lambda: buildKeyboardCommand(KeyPressDescriptor("a", KeyPushType.CLICK))),
+        ("encode.encodeKeyboardCommand",  lambda: encodeKeyboardCommand(key)),
+    ]
+    for name, encode in cases:
+        def body(measurement):
+            for i in range(iterations):
+                encode()
+            measurement.count(iterations)
+        measurement, peak = measure(name, body)
+        results.append(measurement.result(peak))
+    return results
+
+
+def benchMotionModels(iterations):
+    """ Benchmarks generating paths with each motion model.
+    """
+    results = []
+    models = [
+        ("simple", SimpleMotionModel()),
+        ("dda", DDAMotionModel()),
+        ("cached-simple", CachingMotionModel(SimpleMotionModel())),
+        ("framed-dda", FramedMotionModel(DDAMotionModel())),
+    ]
+    if curvemodel.numpy is not None:
+        models += [
+            ("bezier", curvemodel.BezierMotionModel()),
+            ("catmull-rom", curvemodel.CatmullRomMotionModel()),
+            ("eased", curvemodel.EasedMotionModel()),
+        ]
+    for modelName, model in models:
+        for scenario, moves in (("long", LONG_MOVES), ("diagonal", DIAGONAL_MOVES)):
+            def body(measurement):
+                for i in range(iterations):
+                    for xMove, yMove in moves:
+                        path = measurement.time(model.getPath, xMove, yMove)
+                        pathBytes = sum(len(packet) for packet in path)
+                        measurement.count(pathBytes // PACKET_SIZE, pathBytes)
+            measurement, peak = measure("path.%s.%s" % (modelName, scenario), body)
+            results.append(measurement.result(peak))
+
+        if isinstance(model, curvemodel.CurveMotionModel):
+            def body(measurement):
+                moves = (LONG_MOVES + DIAGONAL_MOVES) * iterations
+                paths = measurement.time(model.getPaths, moves)
+                pathBytes = sum(len(packet) for path in paths for packet in path)
+                measurement.count(pathBytes // PACKET_SIZE, pathBytes)
+            measurement, peak = measure("path.%s.batch" % modelName, body)
+            results.append(measurement.result(peak))
+    return results
+
+
+def benchSend(iterations, emulatorOptions, pacing=False, prefix="send", only=None):
+    """ Benchmarks whole Mouse and Keyboard actions through a SerialPort
+        into an ArduinoEmulator.  The measured time runs until the emulator
+        has taken every byte, not just until the last write returned.  If
+        pacing, the SerialPort paces its writes to the emulated buffer.
+        Results are named after prefix, and if only is given just the
+        scenarios it names, (without the prefix), are run.
+    """
+    # Imported here so that the pure encode and path benchmarks run without
+    # pyserial or a pseudo-terminal.
+    from emulator import ArduinoEmulator
+    from emulator import BUFFER_SIZE
+    from serialport import SerialPort
+    from inputdevice import Mouse
+    from inputdevice import Keyboard
+    from packetring import PacketRing
+
+    results = []
+    models = [("simple", SimpleMotionModel), ("dda", DDAMotionModel), ("framed-dda", FramedMotionModel)]
+    scenarios = []
+    for modelName, modelClass in models:
+        scenarios.append(("%s.long" % modelName, modelClass, "move", LONG_MOVES, False))
+        scenarios.append(("%s.diagonal" % modelName, modelClass, "move", DIAGONAL_MOVES, False))
+        scenarios.append(("%s.drag" % modelName, modelClass, "drag", DRAG_MOVES, False))
+    scenarios.append(("keyboard.phrase", None, "type", [PHRASE], False))
+    scenarios.append(("dda.long.ring", DDAMotionModel, "move", LONG_MOVES, True))
+    scenarios.append(("framed-dda.long.ring", FramedMotionModel, "move", LONG_MOVES, True))
+    scenarios.append(("keyboard.phrase.ring", None, "type", [PHRASE], True))
+
+    for name, modelClass, kind, actions, useRing in scenarios:
+        if only != None and name not in only:
+            continue
+        name = "%s.%s" % (prefix, name)
+        emulator = ArduinoEmulator(**emulatorOptions)
+        config = emulator.getConfig()
+        if pacing:
+            config.devicebuffer = emulatorOptions.get("bufferSize", BUFFER_SIZE)
+        serialPort = SerialPort(config=config)
+        packetRing = PacketRing(serialPort) if useRing else None
+        try:
+            if kind == "type":
+                device = Keyboard(serialPort, packetRing=packetRing)
+                perform = device.typeKeyPhrase
+            else:
+                # Only the framed scenarios send motion frames.  The Mouse
+                # frames a DDA path itself, so that each frame fits in one
+                # of the port's writes, which are shorter when paced.
+                framed = modelClass is FramedMotionModel
+                model = DDAMotionModel() if framed else modelClass()
+                device = Mouse(serialPort, model, motionFrames=framed, packetRing=packetRing)
+                perform = device.move if kind == "move" else device.doClickDragRelease
+            emulator.waitUntilIdle()
+
+            # Device counters for the timed run.
+            stats = {}
+            
+            def body(measurement):
+                before = emulator.getStats()
+                for i in range(iterations):
+                    for action in actions:
+                        if kind == "type":
+                            measurement.time(perform, action)
+                        else:
+                            measurement.time(perform, *action)
+                emulator.waitUntilIdle()
+                after = emulator.getStats()
+                
+                received = after["bytesReceived"] - before["bytesReceived"]
+                measurement.count(received // PACKET_SIZE, received)
+                if not stats:
+                    for key in ("waitSeconds", "waitsSent"):
+                        stats[key] = after[key] - before[key]
+                stats["bytesDropped"] = stats.get("bytesDropped", 0) + after["bytesDropped"] - before["bytesDropped"]
+
+            measurement, peak = measure(name, body)
+            result = measurement.result(
+                peak,
+                stalledSeconds=stats["waitSeconds"],
+                waits=stats["waitsSent"],
+                bytesDropped=stats["bytesDropped"],
+                lossy=stats["bytesDropped"] > 0)
+            if result["lossy"]:
+                result["packetsPerSecond"] = None
+                result["bytesPerSecond"] = None
+                sys.stderr.write("%s: the emulator dropped %d bytes; throughput not reported\n"
+                                 % (name, stats["bytesDropped"]))
+            results.append(result)
+        finally:
+            serialPort.close()
+            emulator.close()
+    return results
+
+
+def gitRevision():
+    """ Returns the current git commit, or None outside a git checkout.
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, out=sys.stderr):
+    """ Prints how each result's throughput and median latency changed
+        relative to a baseline run.
+    """
+    previous = dict((result["name"], result) for result in baseline["results"])
+    for result in results:
+        old = previous.get(result["name"])
+        if old is None or not result["packetsPerSecond"] or not old["packetsPerSecond"]:
+            continue
+        throughput = result["packetsPerSecond"] / old["packetsPerSecond"]
+        latency = result["latencyP50Ms"] / old["latencyP50Ms"] if old["latencyP50Ms"] else 0.0
+        out.write("%-36s packets/s x%.2f   p50 latency x%.2f\n" % (result["name"], throughput, latency))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the Bruce send pipeline.")
+    parser.add_argument("--iterations", type=int, default=20,
+                        help="iterations of each path and send scenario")
+    parser.add_argument("--encode-iterations", type=int, default=100000,
+                        help="packets built by each encoder benchmark")
+    parser.add_argument("--no-send", action="store_true",
+                        help="skip the benchmarks that need pyserial and a pseudo-terminal")
+    parser.add_argument("--drain-rate", type=float, default=None,
+                        help="emulated device drain rate in bytes/s (default: unlimited)")
+    parser.add_argument("--link-rate", type=float, default=None,
+                        help="emulated link rate in bytes/s, 0 for unlimited (default: baud/10)")
+    parser.add_argument("--pacing", action="store_true",
+                        help="pace writes to the emulated device's buffer and link rate")
+    parser.add_argument("--no-lossless", action="store_true",
+                        help="skip the check that paced writes lose no bytes over a slow device")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="a previous JSON result file to compare against")
+    args = parser.parse_args(argv)
+
+    results = benchEncoders(args.encode_iterations)
+    results += benchMotionModels(args.iterations)
+    if not args.no_send:
+        results += benchSend(args.iterations, {"drainRate": args.drain_rate, "linkRate": args.link_rate},
+                              args.pacing)
+        if not args.no_lossless:
+            results += benchSend(1, LOSSLESS_LINK, True, "lossless", LOSSLESS_SCENARIOS)
+
+    report = {
+        "revision":  gitRevision(),
+        "python":    sys.version.split()[0],
+        "timestamp": time.time(),
+        "results":   results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as outFile:
+            json.dump(report, outFile, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as baselineFile:
+            compare(results, json.load(baselineFile))
+
+    if any(result.get("lossy") for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
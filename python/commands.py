@@ -25,56 +25,99 @@ class KeyPushType(object):
     RELEASE = "release"
     CLICK = "click"
     
+# The wire value for each (button, click type) pair.  Any other pairing is
+# sent as 0, "no click".
+CLICK_CODES = {
+    (MouseButton.LEFT,  ClickType.CLICK):   1,
+    (MouseButton.RIGHT, ClickType.CLICK):   2,
+    (MouseButton.LEFT,  ClickType.PRESS):   3,
+    (MouseButton.RIGHT, ClickType.PRESS):   4,
+    (MouseButton.LEFT,  ClickType.RELEASE): 5,
+    (MouseButton.RIGHT, ClickType.RELEASE): 6,
+}
+
+# The number of distinct click codes, (0 through 6).
+CLICK_CODE_COUNT = 7
+
+# The wire value for each key push type.
+PUSH_TYPE_CODES = {
+    KeyPushType.PRESS:   0,
+    KeyPushType.RELEASE: 1,
+    KeyPushType.CLICK:   2,
+}
+
+# The number of distinct key push type codes, (0 through 2).
+PUSH_TYPE_CODE_COUNT = 3
+
+    
 class ClickDescriptor(object):
     """ An object that defines a click.  This includes both the button 
         used for the click and the type of click action that is to be
         taken by clicks described by this descriptor object. 
+        
+        ClickDescriptors are immutable and interned: constructing one with
+        the same button and click type twice returns the same object.
     """
     
-    def __init__(self, button=MouseButton.NO_BUTTON, clicktype=ClickType.NO_CLICK):
-        """ Constructs a new ClickDescriptor.
+    __slots__ = ("__button", "__click", "__code", "__byte")
+    
+    # Interned instances, keyed by (button, click type).
+    __instances = {}
+    
+    def __new__(cls, button=MouseButton.NO_BUTTON, clicktype=ClickType.NO_CLICK):
+        """ Returns the ClickDescriptor for the supplied button and click 
+            type, creating it on first use.
         
             button      - A MouseButton, must not be null/None.  Default is NO_BUTTON if
                           nothing is specified.
                           
             clickType   - A ClickType, must not be null/None.  Default is NO_CLICK if 
                           nothing is specified.
-        """         
-        self.__button = button
-        self.__click = clicktype
+        """
+        key = (button, clicktype)
+        instance = cls.__instances.get(key)
+        if instance is None:
+            instance = super(ClickDescriptor, cls).__new__(cls)
+            instance.__button = button
+            instance.__click = clicktype
+            instance.__code = CLICK_CODES.get(key, 0)
+            instance.__byte = instance.__code.to_bytes(1, byteorder='little')
+            cls.__instances[key] = instance
+        return instance
+        
+    def getCode(self):
+        """ Returns the integer wire value of the click descriptor.
+        """
+        return self.__code
         
     def getByte(self):
         """ Returns a single byte that represents the click descriptor 
         """
-        if (self.__button == MouseButton.LEFT and self.__click == ClickType.CLICK):
-            return (1).to_bytes(1, byteorder='little')
-            
-        if (self.__button == MouseButton.RIGHT and self.__click == ClickType.CLICK):
-            return (2).to_bytes(1, byteorder='little')
-        
-        if (self.__button == MouseButton.LEFT and self.__click == ClickType.PRESS):
-            return (3).to_bytes(1, byteorder='little')
-            
-        if (self.__button == MouseButton.RIGHT and self.__click == ClickType.PRESS):
-            return (4).to_bytes(1, byteorder='little')
-            
-        if (self.__button == MouseButton.LEFT and self.__click == ClickType.RELEASE):
-            return (5).to_bytes(1, byteorder='little')
-            
-        if (self.__button == MouseButton.RIGHT and self.__click == ClickType.RELEASE):
-            return (6).to_bytes(1, byteorder='little')
-            
-        return (0).to_bytes(1, byteorder='little')
+        return self.__byte
         
             
 class KeyPressDescriptor(object):
+    """ An object that defines a single key push: the character and the 
+        KeyPushType.  KeyPressDescriptors are immutable and interned, in 
+        the same way as ClickDescriptors.
+    """
+    
+    __slots__ = ("__char", "__keyPushType", "__keyByte", "__pushTypeByte")
+    
+    # Interned instances, keyed by (character, key push type).
+    __instances = {}
     
-    def __init__(self, character, keyPushType=KeyPushType.CLICK):
-        """ Constructs a new KeyPressDescriptor.
+    def __new__(cls, character, keyPushType=KeyPushType.CLICK):
+        """ Returns the KeyPressDescriptor for the supplied character and 
+            key push type, creating it on first use.
         
             character:      The Character to send as a 'char' object.
             keyPushType:    The KeyPushType of the key push (PRESS or RELEASE)
         """
+        key = (character, keyPushType)
+        instance = cls.__instances.get(key)
+        if instance is not None:
+            return instance
         
         if (character == None):
             raise ValueError("Parameter 'character' cannot be None")
@@ -85,25 +128,42 @@ class KeyPressDescriptor(object):
         if (keyPushType == None):
             raise ValueError("Parameter 'keyPushType' cannot be None.")
         
-        self.__char = character
-        self.__keyPushType = keyPushType
+        instance = super(KeyPressDescriptor, cls).__new__(cls)
+        instance.__char = character
+        instance.__keyPushType = keyPushType
+        instance.__keyByte = character.encode()
+        
+        pushTypeCode = PUSH_TYPE_CODES.get(keyPushType)
+        if pushTypeCode is None:
+            instance.__pushTypeByte = None
+        else:
+            instance.__pushTypeByte = pushTypeCode.to_bytes(1, byteorder='little')
+        
+        cls.__instances[key] = instance
+        return instance
         
         
     def getKeyByte(self):
         """ Returns the byte that represents the Key this packet is 
             assembled for.
         """
-        return (self.__char).encode()
+        return self.__keyByte
         
+    def getKeyCode(self):
+        """ Returns the integer wire value of the key.  Raises a ValueError
+            if the character does not encode to a single byte.
+        """
+        if len(self.__keyByte) != 1:
+            raise ValueError("Character %r does not encode to a single byte." % self.__char)
+        return self.__keyByte[0]
     
     def getPushTypeByte(self):
+        """ Returns the byte that represents the KeyPushType of this key 
+            push.
         """
+        return self.__pushTypeByte
+        
+    def getPushTypeCode(self):
+        """ Returns the integer wire value of the KeyPushType.
         """
-        if self.__keyPushType == KeyPushType.PRESS:
-            return (0).to_bytes(1, byteorder='little')
-            
-        if self.__keyPushType == KeyPushType.RELEASE:
-            return (1).to_bytes(1, byteorder='little')
-
-        if self.__keyPushType == KeyPushType.CLICK:
-            return (2).to_bytes(1, byteorder='little')
+        return PUSH_TYPE_CODES[self.__keyPushType]
@@ -28,6 +28,18 @@
 #            2 = Click
 #       P3:  RESERVED (Future use as a modifier key?)
 #
+# MOTION FRAME - Optional, for firmware that supports it.
+# [Header] [N] [X1] [Y1] ... [XN] [YN] [FOOTER]
+# [135]    [  ] [  ] [  ]     [  ] [  ] [134]
+#
+#       N:   1 to 28, the number of steps in the frame.
+#       Xi:  -64 to 64 amount of X-Movement of step i. (Signed)
+#       Yi:  -64 to 64 amount of Y-Movement of step i. (Signed)
+#
+#       Each step moves the mouse exactly as a mouse packet with no click
+#       would, at less than half the bytes per step.  Frames are only sent
+#       to ports configured with 'motionframes'.
+#
 # READY PACKET - From Arduino to Python PC.
 # [132] - Ready
 # [133] - Not Ready
@@ -36,6 +48,8 @@
 from commands import KeyPushType
 from commands import KeyPressDescriptor
 from commands import ClickDescriptor
+from commands import CLICK_CODE_COUNT
+from commands import PUSH_TYPE_CODE_COUNT
 
 # Header Byte for a Click Message.
 CLICK_HEADER = 130
@@ -46,6 +60,85 @@ KEY_HEADER = 131
 # Footer byte for _ANY_ Message.
 FOOTER = 134
 
+# Header Byte for a Motion Frame.
+MOTION_HEADER = 135
+
+# The number of bytes in a single mouse or keyboard packet.
+PACKET_SIZE = 5
+
+# The largest number of bytes that should be handed to the serial port in a
+# single write.  Sized to fit inside the Arduino's 64 byte receive buffer
+# while holding a whole number of packets.
+WRITE_SIZE = 12 * PACKET_SIZE
+
+# The largest x or y movement a single mouse packet can carry.
+MAX_MOVE = 64
+
+# The bytes of a motion frame that are not steps: header, count and footer.
+MOTION_FRAME_OVERHEAD = 3
+
+# The most steps one motion frame may carry, so that a frame always fits in
+# a single write.
+MAX_FRAME_STEPS = (WRITE_SIZE - MOTION_FRAME_OVERHEAD) // 2
+
+# The bits the serial link sends per byte: 8 data bits plus a start and a 
+# stop bit.  A link carries its baud rate / BITS_PER_BYTE bytes per second.
+BITS_PER_BYTE = 10
+
+# Pre-built single bytes for the fixed parts of every packet.
+CLICK_HEADER_BYTE = CLICK_HEADER.to_bytes(1, byteorder='little')
+KEY_HEADER_BYTE = KEY_HEADER.to_bytes(1, byteorder='little')
+FOOTER_BYTE = FOOTER.to_bytes(1, byteorder='little')
+RESERVED_BYTE = (0).to_bytes(1, byteorder='little')
+
+# The number of distinct movement values in one axis of a mouse packet.
+MOVE_RANGE = 2 * MAX_MOVE + 1
+
+# Characters below this code point encode to a single byte and can be typed.
+TYPEABLE_CODES = 128
+
+# The number of characters of a key phrase encoded at once when streaming.
+KEY_PHRASE_CHUNK = 4096
+
+
+def _buildMouseTable():
+    """ Builds every possible mouse packet into one contiguous bytes 
+        object, ordered by x movement, then y movement, then click code.
+    """
+    # Build all the packets for a single x value once...
+    block = bytearray()
+    for yMove in range(-MAX_MOVE, MAX_MOVE + 1):
+        for code in range(CLICK_CODE_COUNT):
+            block += bytes((CLICK_HEADER, 0, yMove & 0xFF, code, FOOTER))
+    
+    # ...then stamp each x value into it.
+    packetCount = len(block) // PACKET_SIZE
+    table = bytearray()
+    for xMove in range(-MAX_MOVE, MAX_MOVE + 1):
+        block[1::PACKET_SIZE] = bytes((xMove & 0xFF,)) * packetCount
+        table += block
+    return bytes(table)
+    
+    
+def _buildKeyboardTable():
+    """ Builds every possible keyboard packet into one contiguous bytes
+        object, ordered by key byte, then push type code.
+    """
+    table = bytearray()
+    for keyCode in range(256):
+        for pushCode in range(PUSH_TYPE_CODE_COUNT):
+            table += bytes((KEY_HEADER, keyCode, pushCode, 0, FOOTER))
+    return bytes(table)
+
+
+# Every mouse and keyboard packet, precomputed once.  The encode functions 
+# below hand out read-only slices of these rather than building packets.
+MOUSE_TABLE = _buildMouseTable()
+KEYBOARD_TABLE = _buildKeyboardTable()
+
+_mouseView = memoryview(MOUSE_TABLE)
+_keyboardView = memoryview(KEYBOARD_TABLE)
+
 def buildMouseCommand(clickDescriptor=ClickDescriptor(), xMove=0, yMove=0):
     """ Constructs the bytes to send on the serial port to send a mouse
         Command, and returns it as a List of Bytes.
@@ -69,15 +162,45 @@ def buildMouseCommand(clickDescriptor=ClickDescriptor(), xMove=0, yMove=0):
         raise ValueError("xMove and yMove must be between -64 and 64 (inclusive).")
         
     messageBytes = []
-    messageBytes.append(CLICK_HEADER.to_bytes(1, byteorder='little'))
+    messageBytes.append(CLICK_HEADER_BYTE)
     messageBytes.append(xMove.to_bytes(1, byteorder='little', signed=True))
     messageBytes.append(yMove.to_bytes(1, byteorder='little', signed=True))
     messageBytes.append(clickDescriptor.getByte())
-    messageBytes.append(FOOTER.to_bytes(1, byteorder='little'))
+    messageBytes.append(FOOTER_BYTE)
     
     return messageBytes
     
     
+def mouseCommandOffset(clickDescriptor, xMove, yMove):
+    """ Returns the offset of the requested mouse packet within 
+        MOUSE_TABLE.  Raises a ValueError if either move is out of range.
+    """
+    if xMove > MAX_MOVE or yMove > MAX_MOVE or xMove < -MAX_MOVE or yMove < -MAX_MOVE:
+        raise ValueError("xMove and yMove must be between -64 and 64 (inclusive).")
+        
+    index = ((xMove + MAX_MOVE) * MOVE_RANGE + (yMove + MAX_MOVE)) * CLICK_CODE_COUNT + clickDescriptor.getCode()
+    return index * PACKET_SIZE
+    
+    
+def encodeMouseCommand(clickDescriptor, xMove=0, yMove=0):
+    """ Returns a mouse packet as a read-only memoryview into the 
+        precomputed MOUSE_TABLE.  Accepts the same values as 
+        buildMouseCommand(), but allocates no new packet.
+    """
+    offset = mouseCommandOffset(clickDescriptor, xMove, yMove)
+    return _mouseView[offset:offset + PACKET_SIZE]
+    
+    
+def encodeMouseCommandInto(buffer, position, clickDescriptor, xMove=0, yMove=0):
+    """ Copies a mouse packet into a caller-supplied writable buffer at 
+        the given position, and returns the position just after it.
+    """
+    offset = mouseCommandOffset(clickDescriptor, xMove, yMove)
+    end = position + PACKET_SIZE
+    buffer[position:end] = _mouseView[offset:offset + PACKET_SIZE]
+    return end
+    
+    
     
 def buildKeyboardCommand(keyPressDescriptor):
     """ Constructs and returns a List of bytes that represent a fully
@@ -86,18 +209,165 @@ def buildKeyboardCommand(keyPressDescriptor):
     if keyPressDescriptor == None:
         raise ValueError("keyPressDescriptor must not be None.")
     
-    keyPressDescriptor
-    
     messageBytes = []
-    messageBytes.append(KEY_HEADER.to_bytes(1, byteorder='little'))
+    messageBytes.append(KEY_HEADER_BYTE)
     messageBytes.append(keyPressDescriptor.getKeyByte())
     messageBytes.append(keyPressDescriptor.getPushTypeByte())
-    messageBytes.append((0).to_bytes(1, byteorder='little'))
-    messageBytes.append(FOOTER.to_bytes(1, byteorder='little'))
+    messageBytes.append(RESERVED_BYTE)
+    messageBytes.append(FOOTER_BYTE)
     
     return messageBytes
     
     
+def keyboardCommandOffset(keyPressDescriptor):
+    """ Returns the offset of the requested keyboard packet within 
+        KEYBOARD_TABLE.
+    """
+    index = keyPressDescriptor.getKeyCode() * PUSH_TYPE_CODE_COUNT + keyPressDescriptor.getPushTypeCode()
+    return index * PACKET_SIZE
+    
+    
+def encodeKeyboardCommand(keyPressDescriptor):
+    """ Returns a keyboard packet as a read-only memoryview into the
+        precomputed KEYBOARD_TABLE.
+    """
+    offset = keyboardCommandOffset(keyPressDescriptor)
+    return _keyboardView[offset:offset + PACKET_SIZE]
+    
+    
+def encodeKeyboardCommandInto(buffer, position, keyPressDescriptor):
+    """ Copies a keyboard packet into a caller-supplied writable buffer at
+        the given position, and returns the position just after it.
+    """
+    offset = keyboardCommandOffset(keyPressDescriptor)
+    end = position + PACKET_SIZE
+    buffer[position:end] = _keyboardView[offset:offset + PACKET_SIZE]
+    return end
+    
+    
+def encodeMotionFrame(steps):
+    """ Returns a motion frame carrying the given steps as a bytes object.
+    
+        steps   - a sequence of between 1 and MAX_FRAME_STEPS (x, y) 
+                  movements, each between -64 and 64 (inclusive).
+    """
+    count = len(steps)
+    if count < 1 or count > MAX_FRAME_STEPS:
+        raise ValueError("A motion frame carries between 1 and %d steps." % MAX_FRAME_STEPS)
+    
+    frame = bytearray(MOTION_FRAME_OVERHEAD + 2 * count)
+    frame[0] = MOTION_HEADER
+    frame[1] = count
+    frame[-1] = FOOTER
+    position = 2
+    for xMove, yMove in steps:
+        if xMove > MAX_MOVE or yMove > MAX_MOVE or xMove < -MAX_MOVE or yMove < -MAX_MOVE:
+            raise ValueError("xMove and yMove must be between -64 and 64 (inclusive).")
+        frame[position] = xMove & 0xFF
+        frame[position + 1] = yMove & 0xFF
+        position += 2
+    return bytes(frame)
+    
+    
+def iterMotionFrames(deltas, stepsPerFrame=MAX_FRAME_STEPS):
+    """ Packs an iterable of (x, y) steps into motion frames of up to 
+        stepsPerFrame steps each, yielding the frames.  Steps of (0, 0) 
+        are dropped.
+    """
+    if stepsPerFrame < 1 or stepsPerFrame > MAX_FRAME_STEPS:
+        raise ValueError("stepsPerFrame must be between 1 and %d (inclusive)." % MAX_FRAME_STEPS)
+    
+    steps = []
+    for step in deltas:
+        if step[0] == 0 and step[1] == 0:
+            continue
+        steps.append(step)
+        if len(steps) == stepsPerFrame:
+            yield encodeMotionFrame(steps)
+            steps.clear()
+            
+    if steps:
+        yield encodeMotionFrame(steps)
+    
+    
+def countPackets(packet):
+    """ Returns the number of packets in an encoded packet or chunk of 
+        packets, (a List of Bytes or any bytes-like object).  Mouse and
+        keyboard packets count one per PACKET_SIZE bytes, and each motion
+        frame counts as one.
+    """
+    if isinstance(packet, list):
+        packet = b"".join(packet)
+    length = len(packet)
+    if length == 0:
+        return 0
+    
+    count = 0
+    offset = 0
+    while offset < length:
+        if packet[offset] == MOTION_HEADER and offset + 1 < length:
+            offset += MOTION_FRAME_OVERHEAD + 2 * packet[offset + 1]
+        else:
+            offset += PACKET_SIZE
+        count += 1
+    return count
+    
+    
+def iterPacketSlices(packet, chunkSize=WRITE_SIZE):
+    """ Yields views of a chunk of encoded packets, (any bytes-like 
+        object), each holding as many whole packets as fit in chunkSize 
+        bytes.  A packet larger than chunkSize is yielded whole.
+    """
+    view = memoryview(packet)
+    length = len(view)
+    start = 0
+    offset = 0
+    while offset < length:
+        if view[offset] == MOTION_HEADER and offset + 1 < length:
+            end = offset + MOTION_FRAME_OVERHEAD + 2 * view[offset + 1]
+        else:
+            end = offset + PACKET_SIZE
+        if end - start > chunkSize and offset > start:
+            yield view[start:offset]
+            start = offset
+        offset = end
+    if start < length:
+        yield view[start:length]
+    
+    
+def joinPackets(packets, chunkSize=WRITE_SIZE):
+    """ Joins packets into a tuple of immutable bytes objects, each holding
+        as many whole packets as fit in chunkSize bytes.  Every chunk can 
+        be handed to the serial port as a single write.
+        
+        packets     - an iterable of packets, (Lists of bytes or bytes-like
+                      objects).
+                      
+        chunkSize   - the largest number of bytes in one chunk.  A packet
+                      larger than this is kept whole in a chunk of its own.
+    """
+    return tuple(iterJoinedPackets(packets, chunkSize))
+    
+    
+def iterJoinedPackets(packets, chunkSize=WRITE_SIZE):
+    """ Yields the same chunks as joinPackets(), one at a time, consuming
+        the packets lazily.
+    """
+    buffer = bytearray()
+    for packet in packets:
+        if isinstance(packet, list):
+            packet = b"".join(packet)
+        
+        if buffer and len(buffer) + len(packet) > chunkSize:
+            yield bytes(buffer)
+            buffer.clear()
+        
+        buffer += packet
+        
+    if buffer:
+        yield bytes(buffer)
+    
+    
 def buildKeyPhraseCommands(text):
     """ Takes a String and returns a List of packets (a List of Lists of bytes)
         to be sent over serial.
@@ -116,3 +386,118 @@ def buildKeyPhraseCommands(text):
         packets.append(buildKeyboardCommand(KeyPressDescriptor(each, KeyPushType.CLICK)))
         
     return packets
+
+
+def _buildKeyClickTranslation():
+    """ Builds a str.translate() table mapping every typeable character to
+        its key click packet, as a latin-1 string.
+    """
+    translation = {}
+    for code in range(TYPEABLE_CODES):
+        offset = keyboardCommandOffset(KeyPressDescriptor(chr(code), KeyPushType.CLICK))
+        translation[code] = KEYBOARD_TABLE[offset:offset + PACKET_SIZE].decode('latin-1')
+    return translation
+
+
+# The key click packet for every typeable character, for encoding whole 
+# phrases in one pass.
+_keyClickTranslation = _buildKeyClickTranslation()
+
+def validateKeyPhrase(text, start=0):
+    """ Raises a ValueError naming every character of text that does not
+        encode to a single byte, and so cannot be typed.
+        
+        text    - the String to check.
+        
+        start   - the position of text within a longer phrase, used to
+                  report positions within the whole phrase.
+    """
+    try:
+        text.encode('ascii')
+    except UnicodeEncodeError:
+        bad = [(start + index, each) for index, each in enumerate(text)
+               if ord(each) >= TYPEABLE_CODES]
+        shown = ", ".join("%r at %d" % (each, index) for index, each in bad[:10])
+        if len(bad) > 10:
+            shown += ", ..."
+        raise ValueError("%d character(s) do not encode to a single byte: %s" % (len(bad), shown))
+    
+    
+def encodeKeyPhrase(text):
+    """ Returns the key click packets for every character of text as a 
+        single bytes object.  Raises a ValueError, before encoding 
+        anything, if any character cannot be typed.
+    """
+    validateKeyPhrase(text)
+    return text.translate(_keyClickTranslation).encode('latin-1')
+    
+    
+def iterKeyPhrasePackets(source, chunkSize=KEY_PHRASE_CHUNK):
+    """ Streams the key click packets for a phrase, encoding chunkSize 
+        characters at a time.  Yields read-only memoryviews of up to 
+        WRITE_SIZE bytes, each holding whole packets, so the result can be
+        passed straight to SerialPort.sendPackets().
+        
+        source      - the text to type: a String, an iterable of Strings 
+                      (such as an iterator of characters or lines), or a 
+                      text file object.
+                      
+        chunkSize   - the number of characters encoded at once.
+        
+        A String is checked in full before this function returns.  Streams
+        are checked a chunk at a time, before any of the chunk is yielded, 
+        so the ValueError for an untypeable character arrives after the 
+        chunks ahead of it have been sent.
+    """
+    return _iterEncodedChunks(iterKeyPhraseText(source, chunkSize))
+    
+    
+def iterKeyPhraseText(source, chunkSize=KEY_PHRASE_CHUNK):
+    """ Splits a phrase into Strings of about chunkSize characters, each 
+        checked to be typeable before it is yielded.  Accepts the same 
+        sources, and checks them in the same way, as 
+        iterKeyPhrasePackets().
+    """
+    if isinstance(source, str):
+        validateKeyPhrase(source)
+        return (source[index:index + chunkSize] for index in range(0, len(source), chunkSize))
+    
+    if hasattr(source, "read"):
+        chunks = iter(lambda: source.read(chunkSize), "")
+    else:
+        chunks = _gatherText(source, chunkSize)
+    return _iterCheckedChunks(chunks)
+    
+    
+def _gatherText(pieces, chunkSize):
+    """ Joins an iterable of Strings into chunks of at least chunkSize
+        characters, (the last may be shorter).
+    """
+    gathered = []
+    length = 0
+    for piece in pieces:
+        gathered.append(piece)
+        length += len(piece)
+        if length >= chunkSize:
+            yield "".join(gathered)
+            gathered.clear()
+            length = 0
+    if gathered:
+        yield "".join(gathered)
+    
+    
+def _iterCheckedChunks(chunks):
+    position = 0
+    for chunk in chunks:
+        if not isinstance(chunk, str):
+            raise TypeError("Key phrases must be text, not %s." % type(chunk).__name__)
+        validateKeyPhrase(chunk, position)
+        position += len(chunk)
+        yield chunk
+    
+    
+def _iterEncodedChunks(chunks):
+    for chunk in chunks:
+        view = memoryview(chunk.translate(_keyClickTranslation).encode('latin-1'))
+        for offset in range(0, len(view), WRITE_SIZE):
+            yield view[offset:offset + WRITE_SIZE]
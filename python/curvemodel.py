@@ -0,0 +1,318 @@
+# Depends on:  Python 3.3, NumPy 1.7
+# Created:  October 18, 2026
+
+from commands import ClickDescriptor
+from communication import CLICK_HEADER
+from communication import FOOTER
+from communication import MAX_MOVE
+from communication import PACKET_SIZE
+from communication import WRITE_SIZE
+from motionmodel import MotionModel
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# --------------------------------------------------------------------------
+# Curve motion models
+# --------------------------------------------------------------------------
+# Motion models that move the mouse along curves rather than straight lines,
+# computed with NumPy.  Each model describes its curve once, in "chord
+# coordinates": 'along' runs from 0 at the start of the move to 1 at its end,
+# and 'across' is the sideways offset as a fraction of the move's length.
+# Every move is that same shape, rotated and scaled onto the move.
+#
+# A path is sampled in one vectorized pass.  The sampled positions are
+# rounded to whole pixels and the steps taken between the rounded positions,
+# which carries each step's rounding error into the next (error diffusion),
+# so the path always ends exactly on the target.  Samples are spaced so that
+# no step exceeds the protocol's +/-64 limit, steps of (0, 0) are dropped,
+# and the packets of the whole path are built as one array.
+#
+# getPaths() does the same for a whole batch of moves at once, which is the
+# fast way to precompute thousands of gestures.
+# --------------------------------------------------------------------------
+
+# The default distance, in pixels, between successive samples of a curve.
+STEP_LENGTH = 16
+
+# The number of samples used to measure a curve's length and speed when a
+# model is created.
+MEASURE_SAMPLES = 256
+
+# The easing profiles, each mapping evenly spaced times in [0, 1] to the
+# distance travelled along the curve.  Packets go out at an even rate, so an
+# eased path starts and/or ends slowly.
+EASINGS = {
+    "linear":       lambda t: t,
+    "easeIn":       lambda t: t * t,
+    "easeOut":      lambda t: t * (2 - t),
+    "easeInOut":    lambda t: t * t * (3 - 2 * t),
+}
+
+
+class CurveMotionModel(MotionModel):
+    """ The base class of the curve motion models.  Sub-classes implement
+        getCurve().
+    """
+
+    def __init__(self, easing="linear", stepLength=STEP_LENGTH):
+        """ Creates a new CurveMotionModel.
+
+            easing      - the name of one of the EASINGS.
+
+            stepLength  - the average distance, in pixels, between samples
+                          of the curve.  Shorter steps give smoother, but
+                          slower, motion.  Steps are always shortened to
+                          keep within the protocol's limit.
+        """
+        super(CurveMotionModel, self).__init__()
+
+        if numpy is None:
+            raise ImportError("Curve motion models require NumPy.")
+
+        if easing not in EASINGS:
+            raise ValueError("Unknown easing '%s'." % easing)
+
+        if stepLength == None or stepLength <= 0:
+            raise ValueError("stepLength must be positive.")
+
+        self.__ease = EASINGS[easing]
+        self.__stepLength = stepLength
+
+        # Measure the curve once: its length, and the longest distance
+        # covered between two of MEASURE_SAMPLES samples, both relative to
+        # the length of the move.
+        along, across = self.__sample(numpy.linspace(0.0, 1.0, MEASURE_SAMPLES + 1))
+        distances = numpy.hypot(numpy.diff(along), numpy.diff(across))
+        self.__lengthFactor = float(distances.sum())
+        self.__speedFactor = float(distances.max()) * MEASURE_SAMPLES
+
+
+    def getCurve(self, t):
+        """ Returns the (along, across) chord coordinates of the curve at
+            each of the times in the array t, as two arrays.  The curve
+            must run from (0, 0) at t = 0 to (1, 0) at t = 1.
+        """
+        raise NotImplementedError("Sub-classes must implement this method.")
+
+
+    def getPath(self, xMove, yMove):
+        """ Returns a List of packets that move the mouse along the curve
+            by xMove and yMove.  Each packet is a read-only view of up to
+            WRITE_SIZE bytes, holding whole mouse packets.
+        """
+        return self.getPaths([(xMove, yMove)])[0]
+
+
+    def iterPath(self, xMove, yMove):
+        """ Returns an iterator over the packets getPath() returns.
+        """
+        return iter(self.getPath(xMove, yMove))
+
+
+    def iterDeltas(self, xMove, yMove):
+        """ Yields the (x, y) movement of each step of the path.
+        """
+        xSteps, ySteps, owners, counts = self.__quantize([(xMove, yMove)])
+        return zip(xSteps.tolist(), ySteps.tolist())
+
+
+    def getPaths(self, moves):
+        """ Returns the paths for a sequence of (xMove, yMove) moves, as a
+            List holding one path, as returned by getPath(), per move.  All
+            of the moves are sampled, quantized and encoded together.
+        """
+        xSteps, ySteps, owners, counts = self.__quantize(moves)
+
+        # Encode every packet of every path as one array.
+        packets = numpy.empty((len(xSteps), PACKET_SIZE), dtype=numpy.uint8)
+        packets[:, 0] = CLICK_HEADER
+        packets[:, 1] = xSteps & 0xFF
+        packets[:, 2] = ySteps & 0xFF
+        packets[:, 3] = ClickDescriptor().getCode()
+        packets[:, 4] = FOOTER
+        data = memoryview(packets.tobytes())
+
+        paths = []
+        offset = 0
+        for count in counts.tolist():
+            end = offset + count * PACKET_SIZE
+            paths.append([data[position:min(position + WRITE_SIZE, end)]
+                          for position in range(offset, end, WRITE_SIZE)])
+            offset = end
+        return paths
+
+
+    def __sample(self, t):
+        """ Returns the chord coordinates of the eased curve at times t.
+        """
+        return self.getCurve(self.__ease(t))
+
+
+    def __quantize(self, moves):
+        """ Samples and quantizes the paths of a batch of moves.  Returns
+            the x and y steps of every path back to back, the index of the
+            move each step belongs to, and the number of steps per move.
+        """
+        moves = numpy.asarray(moves, dtype=numpy.int64).reshape(-1, 2)
+        xMoves = moves[:, 0]
+        yMoves = moves[:, 1]
+
+        # Choose how many samples each move needs: enough for the step
+        # length, and enough that no step can exceed the protocol's limit
+        # once rounded.
+        length = numpy.hypot(xMoves, yMoves)
+        samples = numpy.maximum(numpy.ceil(length * self.__lengthFactor / self.__stepLength),
+                                numpy.ceil(length * self.__speedFactor / (MAX_MOVE - 1)))
+        samples = numpy.where(length == 0, 0, numpy.maximum(samples, 1)).astype(numpy.int64)
+
+        while True:
+            xSteps, ySteps, owners = self.__steps(xMoves, yMoves, samples)
+
+            # The measured speed is only an estimate; resample any move
+            # with a step that is still too long.
+            tooLong = (numpy.abs(xSteps) > MAX_MOVE) | (numpy.abs(ySteps) > MAX_MOVE)
+            if not tooLong.any():
+                break
+            samples[numpy.unique(owners[tooLong])] *= 2
+
+        moving = (xSteps != 0) | (ySteps != 0)
+        xSteps = xSteps[moving]
+        ySteps = ySteps[moving]
+        owners = owners[moving]
+        counts = numpy.bincount(owners, minlength=len(moves))
+        return xSteps, ySteps, owners, counts
+
+
+    def __steps(self, xMoves, yMoves, samples):
+        """ Samples each move's curve the given number of times and returns
+            the steps between the rounded positions, with their owners.
+        """
+        # Lay the sample points of every move end to end: move i has
+        # samples[i] + 1 points, (none if it does not move).
+        points = numpy.where(samples > 0, samples + 1, 0)
+        owners = numpy.repeat(numpy.arange(len(samples)), points)
+        starts = numpy.repeat(numpy.cumsum(points) - points, points)
+        index = numpy.arange(len(owners)) - starts
+        spans = samples[owners]
+
+        along, across = self.__sample(index / numpy.maximum(spans, 1))
+        xMove = xMoves[owners]
+        yMove = yMoves[owners]
+        x = numpy.rint(along * xMove - across * yMove).astype(numpy.int64)
+        y = numpy.rint(along * yMove + across * xMove).astype(numpy.int64)
+
+        # Pin the end points so that floating point error cannot move them.
+        first = index == 0
+        last = index == spans
+        x[first] = 0
+        y[first] = 0
+        x[last] = xMove[last]
+        y[last] = yMove[last]
+
+        # Steps run between successive points of the same move.
+        same = owners[1:] == owners[:-1]
+        return numpy.diff(x)[same], numpy.diff(y)[same], owners[1:][same]
+
+
+
+class BezierMotionModel(CurveMotionModel):
+    """ Moves along a cubic Bezier curve.
+    """
+
+    def __init__(self, controlPoints=((1.0 / 3, 0.2), (2.0 / 3, 0.2)), easing="linear",
+                 stepLength=STEP_LENGTH):
+        """ Creates a new BezierMotionModel.
+
+            controlPoints   - the curve's two inner control points, as
+                              (along, across) chord coordinates.  The
+                              default bows the path to the left of the
+                              direction of travel by up to 15% of its
+                              length.
+
+            easing,
+            stepLength      - as for CurveMotionModel.
+        """
+        if controlPoints == None or len(controlPoints) != 2:
+            raise ValueError("A cubic Bezier curve needs two control points.")
+        self.__controlPoints = tuple(tuple(point) for point in controlPoints)
+        super(BezierMotionModel, self).__init__(easing, stepLength)
+
+
+    def getCurve(self, t):
+        """ Returns the chord coordinates of the Bezier curve at times t.
+        """
+        (a1, c1), (a2, c2) = self.__controlPoints
+        u = 1 - t
+        w1 = 3 * u * u * t
+        w2 = 3 * u * t * t
+        w3 = t * t * t
+        return w1 * a1 + w2 * a2 + w3, w1 * c1 + w2 * c2
+
+
+
+class CatmullRomMotionModel(CurveMotionModel):
+    """ Moves along a Catmull-Rom spline through a series of waypoints.
+    """
+
+    def __init__(self, waypoints=((0.5, 0.15),), easing="linear", stepLength=STEP_LENGTH):
+        """ Creates a new CatmullRomMotionModel.
+
+            waypoints   - the points the path passes through between its
+                          start and end, as (along, across) chord
+                          coordinates.
+
+            easing,
+            stepLength  - as for CurveMotionModel.
+        """
+        if waypoints == None:
+            raise ValueError("Parameter 'waypoints' cannot be 'None.'")
+
+        # The control points run from the start through the waypoints to
+        # the end, with a phantom point beyond each end so that the spline
+        # passes through every real point.
+        points = [(0.0, 0.0)] + [tuple(point) for point in waypoints] + [(1.0, 0.0)]
+        first = (2 * points[0][0] - points[1][0], 2 * points[0][1] - points[1][1])
+        last = (2 * points[-1][0] - points[-2][0], 2 * points[-1][1] - points[-2][1])
+        self.__points = numpy.array([first] + points + [last]) if numpy is not None else None
+        self.__segments = len(points) - 1
+        super(CatmullRomMotionModel, self).__init__(easing, stepLength)
+
+
+    def getCurve(self, t):
+        """ Returns the chord coordinates of the spline at times t.
+        """
+        position = t * self.__segments
+        segment = numpy.minimum(position.astype(numpy.int64), self.__segments - 1)
+        s = (position - segment)[:, None]
+
+        p0 = self.__points[segment]
+        p1 = self.__points[segment + 1]
+        p2 = self.__points[segment + 2]
+        p3 = self.__points[segment + 3]
+        curve = 0.5 * (2 * p1 + (p2 - p0) * s
+                       + (2 * p0 - 5 * p1 + 4 * p2 - p3) * s * s
+                       + (3 * p1 - p0 - 3 * p2 + p3) * s * s * s)
+        return curve[:, 0], curve[:, 1]
+
+
+
+class EasedMotionModel(CurveMotionModel):
+    """ Moves in a straight line, starting and/or ending slowly.
+    """
+
+    def __init__(self, easing="easeInOut", stepLength=STEP_LENGTH):
+        """ Creates a new EasedMotionModel.
+
+            easing,
+            stepLength  - as for CurveMotionModel.
+        """
+        super(EasedMotionModel, self).__init__(easing, stepLength)
+
+
+    def getCurve(self, t):
+        """ Returns the chord coordinates of a straight line at times t.
+        """
+        return t, numpy.zeros_like(t)
@@ -0,0 +1,834 @@
+# Depends on:  Python 3.4, PySerial 3.0
+# Created:  October 18, 2026
+
+from concurrent.futures import Future
+from collections import deque
+
+from commands import *
+from communication import PACKET_SIZE
+from communication import WRITE_SIZE
+from communication import iterKeyPhraseText
+from inputdevice import Mouse
+from inputdevice import Keyboard
+from motionmodel import SimpleMotionModel
+
+import argparse
+import os
+import selectors
+import socket
+import stat
+import struct
+import threading
+
+# --------------------------------------------------------------------------
+# Device daemon
+# --------------------------------------------------------------------------
+# Only one process can own a serial device.  A DeviceDaemon owns it - the
+# SerialPort and a Mouse and Keyboard on it - and takes commands from any
+# number of client processes over a Unix domain socket:
+#
+#   python daemon.py /tmp/bruce.sock
+#
+#   client = DaemonClient("/tmp/bruce.sock")
+#   mouse = DaemonMouse(client)
+#   keyboard = DaemonKeyboard(client)
+#   mouse.move(300, 200)
+#   keyboard.typeKeyPhrase("hello").result()
+#
+# DaemonMouse and DaemonKeyboard mirror Mouse and Keyboard, but every action
+# returns a Future that completes once the daemon has written its packets.
+# Clients may pipeline as many commands as they like without waiting.
+#
+# The daemon works in rounds.  Each round takes the next command from every
+# client that has one waiting, so a client with a long queue cannot starve
+# the others, and encodes them all into one batch that is sent to the port
+# in as few writes as possible.  Every command in the round is then
+# acknowledged.  A client's commands always run in the order it sent them.
+# Long phrases are sent as many short commands so that they interleave
+# fairly with other clients' work.
+#
+# Batches are written by a writer thread, so a device that is slow to become
+# ready holds up only the round being written: the selector thread goes on
+# accepting clients and reading their commands, and runs the next round once
+# the writer hands the batch back.  The mouse's location only moves on once
+# a batch has been written; a round that fails to write leaves it where it
+# was.
+#
+# Requests and responses are a REQUEST_HEADER or RESPONSE_HEADER followed by
+# a payload.  All integers are little-endian:
+#
+#   request     request id, opcode, payload length      payload
+#   response    request id, status, payload length      payload
+#
+#   OP_CLICK        CLICK_PAYLOAD: button, click type, as indexes into
+#                   BUTTONS and CLICK_TYPES.
+#   OP_MOVE         MOVE_PAYLOAD: x, y.
+#   OP_DRAG         DRAG_PAYLOAD: x, y, button.
+#   OP_RETURN       no payload.
+#   OP_KEY          KEY_PAYLOAD: key code, push type, as an index into
+#                   KEY_PUSH_TYPES.
+#   OP_PHRASE       the text, as ASCII.
+#   OP_LOCATION     no payload.  Responds with LOCATION_PAYLOAD: x, y.
+#
+# A response with STATUS_ERROR carries the error message as UTF-8.  Moves,
+# drags and returns to origin longer than the daemon's maxMove along either
+# axis fail.
+# --------------------------------------------------------------------------
+
+# The header of a request: request id, opcode and payload length.
+REQUEST_HEADER = struct.Struct("<IBI")
+
+# The header of a response: request id, status and payload length.
+RESPONSE_HEADER = struct.Struct("<IBI")
+
+# The largest payload the daemon accepts.  A client that sends a larger one
+# is disconnected.
+MAX_PAYLOAD = 64 * 1024
+
+# The opcodes.
+OP_CLICK = 1
+OP_MOVE = 2
+OP_DRAG = 3
+OP_RETURN = 4
+OP_KEY = 5
+OP_PHRASE = 6
+OP_LOCATION = 7
+
+# The statuses of a response.
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+# The payloads of the commands that carry fixed fields.
+CLICK_PAYLOAD = struct.Struct("<BB")
+MOVE_PAYLOAD = struct.Struct("<ii")
+DRAG_PAYLOAD = struct.Struct("<iiB")
+KEY_PAYLOAD = struct.Struct("<BB")
+LOCATION_PAYLOAD = struct.Struct("<qq")
+
+# The wire indexes of buttons, click types and key push types.
+BUTTONS = (MouseButton.NO_BUTTON, MouseButton.LEFT, MouseButton.RIGHT, MouseButton.MIDDLE)
+CLICK_TYPES = (ClickType.NO_CLICK, ClickType.CLICK, ClickType.PRESS, ClickType.RELEASE)
+KEY_PUSH_TYPES = (KeyPushType.PRESS, KeyPushType.RELEASE, KeyPushType.CLICK)
+
+# The most characters of a phrase in one command: one write's worth.
+PHRASE_SLICE = WRITE_SIZE // PACKET_SIZE
+
+# The most bytes read from a socket at once.
+RECEIVE_SIZE = 64 * 1024
+
+# The default limit on a move, drag or return to origin along either axis.
+# A path is encoded on the selector thread, so an unbounded move would hold
+# up every client.
+MAX_DAEMON_MOVE = 2 ** 15 - 1
+
+
+class DaemonError(Exception):
+    """ Raised through a Future when the daemon could not carry out a
+        command.
+    """
+    pass
+
+
+class _BatchPort(object):
+    """ Stands in for the daemon's SerialPort while a round is encoded,
+        collecting the packets of every command.
+    """
+
+    def __init__(self, serialPort):
+        self.__serialPort = serialPort
+        self.packets = []
+
+    def sendBytes(self, bites):
+        self.packets.append(bites)
+
+    def sendByte(self, bite):
+        self.packets.append(bite)
+
+    def sendPackets(self, packets):
+        self.packets.extend(packets)
+
+    def getConfig(self):
+        return self.__serialPort.getConfig()
+
+
+
+class _Client(object):
+    """ The daemon's state for one connected client.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.inbox = bytearray()
+        self.outbox = bytearray()
+
+        # Commands not yet run, each (request id, opcode, payload), and
+        # whether the client is waiting for its turn in a round.
+        self.commands = deque()
+        self.queued = False
+        self.closed = False
+
+
+
+class DeviceDaemon(object):
+    """ Shares one SerialPort between client processes through a Unix
+        domain socket.
+    """
+
+    def __init__(self, path, serialPort, motionModel=SimpleMotionModel(), motionFrames=None,
+                 maxMove=MAX_DAEMON_MOVE):
+        """ Creates a DeviceDaemon listening on the given socket path.
+            Call serve() or start() to begin taking commands.
+
+            path            - the path of the socket.  A socket already
+                              there is replaced.
+
+            serialPort      - the SerialPort to drive.  The daemon owns it,
+                              and closes it when the daemon is closed.
+
+            motionModel,
+            motionFrames    - as for Mouse.
+
+            maxMove         - the longest move, drag or return to origin
+                              along either axis, in pixels.  Longer ones
+                              fail.
+        """
+        if serialPort == None:
+            raise ValueError("Parameter 'serialPort' cannot be 'None.'")
+
+        if maxMove == None or maxMove < 0:
+            raise ValueError("maxMove must not be negative.")
+
+        self.__path = path
+        self.__serialPort = serialPort
+        self.__maxMove = maxMove
+        self.__batch = _BatchPort(serialPort)
+        self.__mouse = Mouse(self.__batch, motionModel, motionFrames)
+        self.__keyboard = Keyboard(self.__batch, self.__mouse)
+
+        # Send the button releases the Mouse queued as it was created.
+        packets = self.__batch.packets
+        self.__batch.packets = []
+        serialPort.sendPackets(packets)
+
+        try:
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+        self.__listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__listener.bind(path)
+        self.__listener.listen()
+        self.__listener.setblocking(False)
+
+        # A pipe that close() writes to, to wake the selector.
+        self.__wakeRead, self.__wakeWrite = os.pipe()
+        os.set_blocking(self.__wakeRead, False)
+
+        self.__selector = selectors.DefaultSelector()
+        self.__selector.register(self.__listener, selectors.EVENT_READ)
+        self.__selector.register(self.__wakeRead, selectors.EVENT_READ)
+
+        # Clients with commands waiting, in the order they take their turn.
+        self.__turns = deque()
+        self.__clients = set()
+
+        self.__thread = None
+        self.__closed = False
+
+        # The mouse's location once every batch written so far has reached
+        # the port, and once the round being encoded or written has.
+        self.__location = (0, 0)
+        self.__roundLocation = (0, 0)
+
+        # The batch handed to the writer thread, and the round it belongs
+        # to, waiting to be acknowledged once the writer posts it back.
+        self.__writeCondition = threading.Condition()
+        self.__batches = deque()
+        self.__written = deque()
+        self.__inFlight = None
+        self.__writer = threading.Thread(target=self.__writeBatches, daemon=True)
+        self.__writer.start()
+
+        # Counters, reported by stats().
+        self.__commands = 0
+        self.__failures = 0
+        self.__rounds = 0
+        self.__connections = 0
+
+
+    def serve(self):
+        """ Takes and runs commands until the daemon is closed.
+        """
+        try:
+            while not self.__closed:
+                timeout = 0 if self.__turns and self.__inFlight is None else None
+                for key, events in self.__selector.select(timeout):
+                    if key.fileobj is self.__listener:
+                        self.__accept()
+                    elif key.fileobj == self.__wakeRead:
+                        self.__drainWake()
+                    else:
+                        client = key.data
+                        if events & selectors.EVENT_READ:
+                            self.__receive(client)
+                        if events & selectors.EVENT_WRITE and not client.closed:
+                            self.__sendResponses(client)
+
+                while self.__written:
+                    self.__acknowledge(self.__written.popleft())
+
+                if self.__turns and self.__inFlight is None and not self.__closed:
+                    self.__runRound()
+        finally:
+            for client in list(self.__clients):
+                self.__drop(client)
+
+
+    def start(self):
+        """ Runs serve() on a background thread, and returns.
+        """
+        self.__thread = threading.Thread(target=self.serve, daemon=True)
+        self.__thread.start()
+
+
+    def close(self):
+        """ Stops the daemon, disconnects every client, removes the socket
+            and closes the SerialPort.  Commands not yet run, or not yet
+            acknowledged, are dropped.
+        """
+        if self.__closed:
+            return
+        self.__closed = True
+        os.write(self.__wakeWrite, b"\0")
+        if self.__thread is not None and self.__thread is not threading.current_thread():
+            self.__thread.join()
+
+        # Closing the port releases a writer waiting for the device.
+        self.__serialPort.close()
+        with self.__writeCondition:
+            self.__writeCondition.notify_all()
+        self.__writer.join()
+
+        self.__selector.close()
+        self.__listener.close()
+        os.close(self.__wakeRead)
+        os.close(self.__wakeWrite)
+        try:
+            os.unlink(self.__path)
+        except FileNotFoundError:
+            pass
+
+
+    def stats(self):
+        """ Returns a snapshot of the daemon's counters as a dictionary:
+
+                clients     - clients connected now.
+                connections - clients that have ever connected.
+                commands    - commands run.
+                failures    - commands that failed.
+                rounds      - rounds run; each is sent as one batch.
+                mouse       - the Mouse's stats().
+                keyboard    - the Keyboard's stats().
+        """
+        return {
+            "clients":      len(self.__clients),
+            "connections":  self.__connections,
+            "commands":     self.__commands,
+            "failures":     self.__failures,
+            "rounds":       self.__rounds,
+            "mouse":        self.__mouse.stats(),
+            "keyboard":     self.__keyboard.stats(),
+        }
+
+
+    def __accept(self):
+        try:
+            connection, address = self.__listener.accept()
+        except BlockingIOError:
+            return
+        connection.setblocking(False)
+        client = _Client(connection)
+        self.__clients.add(client)
+        self.__connections += 1
+        self.__selector.register(connection, selectors.EVENT_READ, client)
+
+
+    def __drainWake(self):
+        try:
+            while os.read(self.__wakeRead, 64):
+                pass
+        except BlockingIOError:
+            pass
+
+
+    def __receive(self, client):
+        """ Reads whatever a client has sent and queues its complete
+            commands.
+        """
+        try:
+            data = client.connection.recv(RECEIVE_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.__drop(client)
+            return
+
+        inbox = client.inbox
+        inbox += data
+        offset = 0
+        while len(inbox) - offset >= REQUEST_HEADER.size:
+            requestId, opcode, length = REQUEST_HEADER.unpack_from(inbox, offset)
+            if length > MAX_PAYLOAD:
+                self.__drop(client)
+                return
+            end = offset + REQUEST_HEADER.size + length
+            if len(inbox) < end:
+                break
+            client.commands.append((requestId, opcode, bytes(inbox[offset + REQUEST_HEADER.size:end])))
+            offset = end
+        del inbox[:offset]
+
+        if client.commands and not client.queued:
+            client.queued = True
+            self.__turns.append(client)
+
+
+    def __runRound(self):
+        """ Runs the next command of every client with one waiting, and
+            hands their packets to the writer thread as one batch.  A round
+            that sends nothing is acknowledged straight away.
+        """
+        results = []
+        for turn in range(len(self.__turns)):
+            client = self.__turns.popleft()
+            requestId, opcode, payload = client.commands.popleft()
+            results.append((client, requestId) + self.__execute(opcode, payload))
+            if client.commands:
+                self.__turns.append(client)
+            else:
+                client.queued = False
+
+        packets = self.__batch.packets
+        self.__batch.packets = []
+        self.__inFlight = results
+        if not packets:
+            self.__acknowledge(None)
+            return
+
+        with self.__writeCondition:
+            self.__batches.append(packets)
+            self.__writeCondition.notify()
+
+
+    def __writeBatches(self):
+        """ The writer thread: writes each batch handed to it, and posts
+            the error message of a failed write, or None, back to the
+            selector thread.
+        """
+        while True:
+            with self.__writeCondition:
+                while not self.__batches and not self.__closed:
+                    self.__writeCondition.wait()
+                if self.__closed:
+                    return
+                packets = self.__batches.popleft()
+
+            failure = None
+            try:
+                self.__serialPort.sendPackets(packets)
+            except Exception as error:
+                failure = ("%s: %s" % (type(error).__name__, error)).encode('utf-8')
+
+            self.__written.append(failure)
+            try:
+                os.write(self.__wakeWrite, b"\0")
+            except OSError:
+                # Closed.
+                return
+
+
+    def __acknowledge(self, failure):
+        """ Acknowledges every command of the round in flight, failing
+            those that sent packets if its batch could not be written.
+            Moves the mouse's location on if the batch was written, and
+            back if not.
+        """
+        results = self.__inFlight
+        self.__inFlight = None
+        if failure is None:
+            self.__location = self.__roundLocation
+        else:
+            self.__roundLocation = self.__location
+        self.__rounds += 1
+
+        for client, requestId, status, response, wrote in results:
+            if failure is not None and wrote:
+                status, response = STATUS_ERROR, failure
+            self.__commands += 1
+            if status != STATUS_OK:
+                self.__failures += 1
+            if not client.closed:
+                client.outbox += RESPONSE_HEADER.pack(requestId, status, len(response))
+                client.outbox += response
+
+        for client in set(result[0] for result in results):
+            if not client.closed:
+                self.__sendResponses(client)
+
+
+    def __execute(self, opcode, payload):
+        """ Encodes one command into the batch.  Returns its status, the
+            payload of its response, and whether it added any packets.
+        """
+        mark = len(self.__batch.packets)
+        mouse = self.__mouse
+        try:
+            if opcode == OP_CLICK:
+                button, clickType = CLICK_PAYLOAD.unpack(payload)
+                mouse.doClick(BUTTONS[button], CLICK_TYPES[clickType])
+            elif opcode == OP_MOVE:
+                xMove, yMove = MOVE_PAYLOAD.unpack(payload)
+                self.__checkMove(xMove, yMove)
+                mouse.move(xMove, yMove)
+                self.__moved(xMove, yMove)
+            elif opcode == OP_DRAG:
+                xMove, yMove, button = DRAG_PAYLOAD.unpack(payload)
+                self.__checkMove(xMove, yMove)
+                mouse.doClickDragRelease(xMove, yMove, BUTTONS[button])
+                self.__moved(xMove, yMove)
+            elif opcode == OP_RETURN:
+                x, y = self.__roundLocation
+                self.__checkMove(x, y)
+                mouse.move(-x, -y)
+                self.__moved(-x, -y)
+            elif opcode == OP_KEY:
+                keyCode, pushType = KEY_PAYLOAD.unpack(payload)
+                self.__keyboard.typeKey(chr(keyCode), KEY_PUSH_TYPES[pushType])
+            elif opcode == OP_PHRASE:
+                self.__keyboard.typeKeyPhrase(payload.decode('ascii'))
+            elif opcode == OP_LOCATION:
+                return STATUS_OK, LOCATION_PAYLOAD.pack(*self.__roundLocation), False
+            else:
+                raise ValueError("Unknown opcode %d." % opcode)
+        except (ValueError, IndexError, struct.error) as error:
+            del self.__batch.packets[mark:]
+            return STATUS_ERROR, ("%s: %s" % (type(error).__name__, error)).encode('utf-8'), False
+        return STATUS_OK, b"", len(self.__batch.packets) > mark
+
+
+    def __moved(self, xMove, yMove):
+        """ Adds a move to the location the round will leave the mouse at.
+        """
+        x, y = self.__roundLocation
+        self.__roundLocation = (x + xMove, y + yMove)
+
+
+    def __checkMove(self, xMove, yMove):
+        """ Raises a ValueError if a move is longer than the daemon allows.
+        """
+        if abs(xMove) > self.__maxMove or abs(yMove) > self.__maxMove:
+            raise ValueError("Moves are limited to %d pixels along either axis." % self.__maxMove)
+
+
+    def __sendResponses(self, client):
+        """ Sends as much of a client's waiting responses as its socket
+            will take, and watches for room for the rest.
+        """
+        try:
+            sent = client.connection.send(client.outbox)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self.__drop(client)
+            return
+        del client.outbox[:sent]
+
+        events = selectors.EVENT_READ
+        if client.outbox:
+            events |= selectors.EVENT_WRITE
+        self.__selector.modify(client.connection, events, client)
+
+
+    def __drop(self, client):
+        """ Disconnects a client, discarding its waiting commands.
+        """
+        if client.closed:
+            return
+        client.closed = True
+        client.commands.clear()
+        if client.queued:
+            self.__turns.remove(client)
+            client.queued = False
+        self.__clients.discard(client)
+        try:
+            self.__selector.unregister(client.connection)
+        except (KeyError, ValueError):
+            pass
+        client.connection.close()
+
+
+
+class DaemonClient(object):
+    """ A connection to a DeviceDaemon.  Thread-safe: any number of threads
+        may send commands over one DaemonClient.
+    """
+
+    def __init__(self, path):
+        """ Connects to the daemon listening on the given socket path.
+        """
+        self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__socket.connect(path)
+
+        self.__sendLock = threading.Lock()
+        self.__nextId = 0
+
+        # The Future for each request not yet answered, with the function
+        # that turns its response payload into a result.
+        self.__pending = {}
+        self.__pendingLock = threading.Lock()
+        self.__closed = False
+
+        self.__thread = threading.Thread(target=self.__read, daemon=True)
+        self.__thread.start()
+
+
+    def request(self, opcode, payload=b"", decode=None):
+        """ Sends a command and returns a Future for its response.  The
+            Future's result is decode(response payload), or None if decode
+            is not specified; a failed command raises a DaemonError.
+        """
+        if len(payload) > MAX_PAYLOAD:
+            raise ValueError("Payloads are limited to %d bytes." % MAX_PAYLOAD)
+
+        future = Future()
+        with self.__sendLock:
+            if self.__closed:
+                raise RuntimeError("DaemonClient has been closed.")
+            requestId = self.__nextId
+            self.__nextId = (requestId + 1) & 0xFFFFFFFF
+            with self.__pendingLock:
+                self.__pending[requestId] = (future, decode)
+            self.__socket.sendall(REQUEST_HEADER.pack(requestId, opcode, len(payload)) + payload)
+        return future
+
+
+    def close(self):
+        """ Disconnects from the daemon.  Futures not yet completed fail
+            with a ConnectionError.
+        """
+        with self.__sendLock:
+            if self.__closed:
+                return
+            self.__closed = True
+        try:
+            self.__socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.__thread.join()
+        self.__socket.close()
+
+
+    def __read(self):
+        buffer = bytearray()
+        try:
+            while True:
+                data = self.__socket.recv(RECEIVE_SIZE)
+                if not data:
+                    break
+                buffer += data
+
+                offset = 0
+                while len(buffer) - offset >= RESPONSE_HEADER.size:
+                    requestId, status, length = RESPONSE_HEADER.unpack_from(buffer, offset)
+                    end = offset + RESPONSE_HEADER.size + length
+                    if len(buffer) < end:
+                        break
+                    self.__complete(requestId, status, bytes(buffer[offset + RESPONSE_HEADER.size:end]))
+                    offset = end
+                del buffer[:offset]
+        except OSError:
+            pass
+        finally:
+            with self.__pendingLock:
+                pending, self.__pending = self.__pending, {}
+            for future, decode in pending.values():
+                future.set_exception(ConnectionError("The connection to the daemon was lost."))
+
+
+    def __complete(self, requestId, status, response):
+        with self.__pendingLock:
+            entry = self.__pending.pop(requestId, None)
+        if entry is None:
+            return
+
+        future, decode = entry
+        if status != STATUS_OK:
+            future.set_exception(DaemonError(response.decode('utf-8', 'replace')))
+        else:
+            future.set_result(decode(response) if decode is not None else None)
+
+
+
+class DaemonMouse(object):
+    """ The Mouse of a DeviceDaemon.  Every action returns a Future that
+        completes once the daemon has written its packets.
+
+        Every DaemonMouse on a daemon drives the same Mouse, so locations
+        are relative to where that Mouse started.
+    """
+
+    def __init__(self, client):
+        """ Constructor.
+
+            client  - the DaemonClient to send commands through.
+        """
+        if client == None:
+            raise ValueError("Parameter 'client' cannot be 'None.'")
+        self.__client = client
+
+
+    def doLeftClick(self):
+        """ Performs a left click in the Mouse's current location.
+        """
+        return self.doClick(MouseButton.LEFT, ClickType.CLICK)
+
+
+    def doRightClick(self):
+        """ Performs a right click in the Mouse's current location.
+        """
+        return self.doClick(MouseButton.RIGHT, ClickType.CLICK)
+
+
+    def doClick(self, button=MouseButton.LEFT, clickType=ClickType.CLICK):
+        """ Performs a click as specified by the button and click type.
+        """
+        payload = CLICK_PAYLOAD.pack(BUTTONS.index(button), CLICK_TYPES.index(clickType))
+        return self.__client.request(OP_CLICK, payload)
+
+
+    def move(self, xMove, yMove):
+        """ Performs a relative move from the mouse's current position.
+        """
+        return self.__client.request(OP_MOVE, MOVE_PAYLOAD.pack(xMove, yMove))
+
+
+    def doClickDragRelease(self, xMove, yMove, mouseButton=MouseButton.LEFT):
+        """ Performs a click, drag, release operation from the mouse's
+            current location.
+        """
+        if mouseButton == None:
+            raise ValueError("mouseButton must not be None.")
+        return self.__client.request(OP_DRAG, DRAG_PAYLOAD.pack(xMove, yMove, BUTTONS.index(mouseButton)))
+
+
+    def returnToOrigin(self):
+        """ Returns the mouse to its original position.
+        """
+        return self.__client.request(OP_RETURN)
+
+
+    def getLocation(self):
+        """ Returns a Future for the mouse's (x, y) location relative to
+            its original position, once every command sent before this
+            one has been run.
+        """
+        return self.__client.request(OP_LOCATION, decode=LOCATION_PAYLOAD.unpack)
+
+
+
+class DaemonKeyboard(object):
+    """ The Keyboard of a DeviceDaemon.  Every action returns a Future.
+    """
+
+    def __init__(self, client):
+        """ Constructor.
+
+            client  - the DaemonClient to send commands through.
+        """
+        if client == None:
+            raise ValueError("Parameter 'client' cannot be 'None.'")
+        self.__client = client
+
+
+    def typeKey(self, character, keyPushType=KeyPushType.CLICK):
+        """ Sends a single key push of the provided character.
+        """
+        keyCode = KeyPressDescriptor(character, keyPushType).getKeyCode()
+        return self.__client.request(OP_KEY, KEY_PAYLOAD.pack(keyCode, KEY_PUSH_TYPES.index(keyPushType)))
+
+
+    def typeKeyPhrase(self, text):
+        """ Types the provided text, which may be any source accepted by
+            Keyboard.typeKeyPhrase().  A String is checked before anything
+            is sent; streamed text is read and checked here, a chunk at a
+            time.  The Future completes once the whole phrase has been
+            typed, or fails with the first error.
+        """
+        futures = []
+        if text != None:
+            for chunk in iterKeyPhraseText(text):
+                for index in range(0, len(chunk), PHRASE_SLICE):
+                    payload = chunk[index:index + PHRASE_SLICE].encode('ascii')
+                    futures.append(self.__client.request(OP_PHRASE, payload))
+        return _allOf(futures)
+
+
+
+def _allOf(futures):
+    """ Returns a Future that completes once every one of futures has, with
+        None, or with the exception of the first to fail.
+    """
+    combined = Future()
+    if not futures:
+        combined.set_result(None)
+        return combined
+
+    state = {"remaining": len(futures), "error": None}
+    lock = threading.Lock()
+
+    def finished(future):
+        error = future.exception()
+        with lock:
+            if error is not None and state["error"] is None:
+                state["error"] = error
+            state["remaining"] -= 1
+            done = state["remaining"] == 0
+        if done:
+            if state["error"] is not None:
+                combined.set_exception(state["error"])
+            else:
+                combined.set_result(None)
+
+    for future in futures:
+        future.add_done_callback(finished)
+    return combined
+
+
+def main(argv=None):
+    # Imported here so that clients do not need pyserial.
+    from projectconfig import CONFIG_FILE
+    from projectconfig import CONFIG_SECTION
+    from projectconfig import SerialConfig
+    from serialport import SerialPort
+
+    parser = argparse.ArgumentParser(description="Shares a Bruce device between processes.")
+    parser.add_argument("path", help="the path of the Unix domain socket to listen on")
+    parser.add_argument("--config", default=CONFIG_FILE, help="the config file to read")
+    parser.add_argument("--section", default=CONFIG_SECTION, help="the section of the config file to read")
+    args = parser.parse_args(argv)
+
+    serialPort = SerialPort(config=SerialConfig(filename=args.config, section=args.section))
+    deviceDaemon = DeviceDaemon(args.path, serialPort)
+    try:
+        deviceDaemon.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        deviceDaemon.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+# Depends on:  Python 3.3
+# Created:  October 18, 2026
+
+from projectconfig import SerialConfig
+from communication import BITS_PER_BYTE
+from communication import CLICK_HEADER
+from communication import KEY_HEADER
+from communication import FOOTER
+from communication import MOTION_HEADER
+from communication import MOTION_FRAME_OVERHEAD
+from communication import MAX_FRAME_STEPS
+from communication import PACKET_SIZE
+from commands import ClickType
+from commands import KeyPushType
+from commands import MouseButton
+
+import os
+import select
+import threading
+import time
+import tty
+
+# --------------------------------------------------------------------------
+# ArduinoEmulator
+# --------------------------------------------------------------------------
+# A software stand-in for the Arduino, for exercising SerialPort, Mouse and
+# Keyboard without any hardware.  The emulator opens a pseudo-terminal; point
+# a SerialPort at getPortName() and everything it writes is decoded exactly
+# as the firmware would decode it (see the protocol in communication.py).
+#
+# The emulator models the Arduino's small receive buffer.  Bytes arrive no
+# faster than the configured baud rate allows, and leave the
+# buffer at a configurable drain rate; when the buffer fills past its high
+# water mark the emulator sends the wait byte, and once it drains below its
+# low water mark it sends the ready byte.  Bytes that arrive while the
+# buffer is full are dropped and counted, as they would be on the device.
+#
+# The decoded results - the virtual cursor position, button state, clicks
+# and the key stream - can be inspected at any time.
+#
+# The emulator also decodes motion frames, unless it is asked to behave like
+# firmware that predates them.
+#
+# Pseudo-terminals are only available on Unix-like systems.
+# --------------------------------------------------------------------------
+
+# The default size of the emulated receive buffer, (that of an Arduino Uno).
+BUFFER_SIZE = 64
+
+# How often the emulator drains its buffer, in seconds.
+TICK = 0.001
+
+# The mouse action for each click code, as (button, click type).
+CLICK_ACTIONS = {
+    1: (MouseButton.LEFT,  ClickType.CLICK),
+    2: (MouseButton.RIGHT, ClickType.CLICK),
+    3: (MouseButton.LEFT,  ClickType.PRESS),
+    4: (MouseButton.RIGHT, ClickType.PRESS),
+    5: (MouseButton.LEFT,  ClickType.RELEASE),
+    6: (MouseButton.RIGHT, ClickType.RELEASE),
+}
+
+# The key push type for each push type code.
+PUSH_TYPES = {
+    0: KeyPushType.PRESS,
+    1: KeyPushType.RELEASE,
+    2: KeyPushType.CLICK,
+}
+
+
+def toSigned(intByte):
+    """ Returns the signed value of a single byte.
+    """
+    return intByte - 256 if intByte > 127 else intByte
+
+
+class ArduinoEmulator(object):
+    """ Emulates the Arduino end of the serial link on a pseudo-terminal.
+    """
+
+    def __init__(self, bufferSize=BUFFER_SIZE, drainRate=None, highWater=None,
+                 lowWater=None, linkRate=None, motionFrames=True, config=None):
+        """ Opens a pseudo-terminal and starts emulating the device on it.
+
+            bufferSize  - the size of the emulated receive buffer in bytes.
+
+            drainRate   - the rate, in bytes per second, at which the device
+                          takes bytes out of its receive buffer.  If not
+                          specified the buffer drains as fast as bytes
+                          arrive.
+
+            highWater   - the buffer fill level at which the wait byte is
+                          sent.  Defaults to three quarters of bufferSize.
+
+            lowWater    - the fill level at or below which the ready byte
+                          is sent again.  Defaults to a quarter of
+                          bufferSize.
+
+            linkRate    - the rate, in bytes per second, at which bytes 
+                          arrive over the link.  Defaults to the config's
+                          baud rate divided by ten, (8 data bits plus start
+                          and stop bits).  0 delivers bytes immediately.
+                          
+            motionFrames - True to decode motion frames.  If False, motion
+                          frames are treated as garbage, as firmware that 
+                          predates them would.
+
+            config      - the SerialConfig supplying the baud rate and the
+                          ready and wait bytes.  If not specified 
+                          serial.cfg is used.
+        """
+        if config == None:
+            config = SerialConfig()
+
+        self.__baud = config.baud
+        self.__bufferSize = bufferSize
+        self.__drainRate = drainRate
+        self.__highWater = highWater if highWater is not None else (bufferSize * 3) // 4
+        self.__lowWater = lowWater if lowWater is not None else bufferSize // 4
+        self.__readyByte = bytes((config.readybyte,))
+        self.__waitByte = bytes((config.waitbyte,))
+        self.__motionFrames = motionFrames
+
+        self.__lock = threading.Lock()
+        self.__buffer = bytearray()
+        self.__waiting = False
+        self.__drainCredit = 0.0
+        self.__linkRate = linkRate if linkRate is not None else config.baud / float(BITS_PER_BYTE)
+        self.__linkCredit = 0.0
+
+        # Decoder state - the bytes of the frame being decoded.
+        self.__frame = bytearray()
+
+        # Decoded results.
+        self.__x = 0
+        self.__y = 0
+        self.__buttons = {MouseButton.LEFT: False, MouseButton.RIGHT: False}
+        self.__clicks = []
+        self.__keys = []
+
+        # Counters.
+        self.__bytesReceived = 0
+        self.__bytesDropped = 0
+        self.__packetCount = 0
+        self.__frameErrors = 0
+        self.__waitsSent = 0
+        self.__readiesSent = 0
+        self.__waitSeconds = 0.0
+        self.__waitStart = 0.0
+
+        self.__master, self.__slave = os.openpty()
+        tty.setraw(self.__slave)
+        self.__portName = os.ttyname(self.__slave)
+
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+
+    def getPortName(self):
+        """ Returns the path of the pseudo-terminal to open as the serial
+            port.
+        """
+        return self.__portName
+
+
+    def getConfig(self):
+        """ Returns a SerialConfig pointed at this emulator.
+        """
+        return SerialConfig(port=self.__portName,
+                            baud=self.__baud,
+                            readybyte=self.__readyByte[0],
+                            waitbyte=self.__waitByte[0],
+                            motionframes=self.__motionFrames)
+
+
+    def getPosition(self):
+        """ Returns the virtual cursor's (x, y) position relative to where
+            it started.
+        """
+        with self.__lock:
+            return self.__x, self.__y
+
+
+    def isPressed(self, button):
+        """ Returns True if the given MouseButton is currently held.
+        """
+        with self.__lock:
+            return self.__buttons[button]
+
+
+    def getClicks(self):
+        """ Returns a List of (button, click type, x, y) tuples, one for each
+            click, press or release received.
+        """
+        with self.__lock:
+            return list(self.__clicks)
+
+
+    def getKeys(self):
+        """ Returns a List of (character, key push type) tuples, one for
+            each key packet received.
+        """
+        with self.__lock:
+            return list(self.__keys)
+
+
+    def getTypedText(self):
+        """ Returns the text typed by key clicks and presses.
+        """
+        with self.__lock:
+            return "".join(char for char, pushType in self.__keys
+                           if pushType != KeyPushType.RELEASE)
+
+
+    def getStats(self):
+        """ Returns a dictionary of the emulator's counters.
+        """
+        with self.__lock:
+            return {
+                "bytesReceived": self.__bytesReceived,
+                "bytesDropped":  self.__bytesDropped,
+                "packets":       self.__packetCount,
+                "frameErrors":   self.__frameErrors,
+                "waitsSent":     self.__waitsSent,
+                "readiesSent":   self.__readiesSent,
+                "waitSeconds":   self.__waitSeconds,
+                "buffered":      len(self.__buffer),
+            }
+
+
+    def waitUntilIdle(self, timeout=None):
+        """ Blocks until the receive buffer is empty and nothing more has
+            arrived for a few ticks.  Returns False if the timeout expired
+            first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        lastReceived = -1
+        while True:
+            with self.__lock:
+                received = self.__bytesReceived
+                empty = not self.__buffer
+            if empty and received == lastReceived:
+                return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            lastReceived = received
+            time.sleep(10 * TICK)
+
+
+    def close(self):
+        """ Stops the emulator and closes the pseudo-terminal.
+        """
+        self.__running = False
+        self.__thread.join()
+        os.close(self.__master)
+        os.close(self.__slave)
+
+
+    def __run(self):
+        lastTick = time.monotonic()
+        while self.__running:
+            # Only take as many bytes off the link as the baud rate would
+            # have delivered by now.
+            if self.__linkRate:
+                readSize = int(self.__linkCredit)
+            else:
+                readSize = 4096
+
+            if readSize > 0 and select.select([self.__master], [], [], TICK)[0]:
+                try:
+                    data = os.read(self.__master, readSize)
+                except OSError:
+                    data = b""
+                self.__linkCredit -= len(data)
+                self.__receive(data)
+            elif readSize <= 0:
+                time.sleep(TICK)
+            else:
+                # The link is idle; bytes sent from now on arrive at the 
+                # link rate, not all at once.
+                self.__linkCredit = 0.0
+
+            now = time.monotonic()
+            if self.__linkRate:
+                self.__linkCredit = min(self.__linkCredit + (now - lastTick) * self.__linkRate, 4096)
+            self.__drain(now - lastTick)
+            lastTick = now
+
+
+    def __receive(self, data):
+        """ Places newly arrived bytes into the receive buffer.
+        """
+        with self.__lock:
+            if self.__drainRate is None:
+                # The buffer drains as fast as bytes arrive, so it never
+                # fills.
+                for intByte in self.__buffer:
+                    self.__decode(intByte)
+                self.__buffer.clear()
+                for intByte in data:
+                    self.__decode(intByte)
+                self.__bytesReceived += len(data)
+                return
+
+            room = self.__bufferSize - len(self.__buffer)
+            if len(data) > room:
+                self.__bytesDropped += len(data) - room
+                data = data[:room]
+            self.__bytesReceived += len(data)
+            self.__buffer += data
+
+            if not self.__waiting and len(self.__buffer) >= self.__highWater:
+                self.__waiting = True
+                self.__waitsSent += 1
+                self.__waitStart = time.monotonic()
+                os.write(self.__master, self.__waitByte)
+
+
+    def __drain(self, elapsed):
+        """ Takes bytes out of the receive buffer at the drain rate and
+            decodes them.
+        """
+        with self.__lock:
+            if self.__drainRate is None:
+                count = len(self.__buffer)
+            else:
+                self.__drainCredit = min(self.__drainCredit + elapsed * self.__drainRate, self.__bufferSize)
+                count = min(int(self.__drainCredit), len(self.__buffer))
+                self.__drainCredit -= count
+
+            if count:
+                for intByte in self.__buffer[:count]:
+                    self.__decode(intByte)
+                del self.__buffer[:count]
+
+            if self.__waiting and len(self.__buffer) <= self.__lowWater:
+                self.__waiting = False
+                self.__readiesSent += 1
+                self.__waitSeconds += time.monotonic() - self.__waitStart
+                os.write(self.__master, self.__readyByte)
+
+
+    def __decode(self, intByte):
+        """ Feeds one byte to the protocol decoder.
+        """
+        frame = self.__frame
+        if not frame:
+            # Skip anything that is not the start of a packet.
+            if (intByte == CLICK_HEADER or intByte == KEY_HEADER or
+                    (intByte == MOTION_HEADER and self.__motionFrames)):
+                frame.append(intByte)
+            else:
+                self.__frameErrors += 1
+            return
+
+        frame.append(intByte)
+        if frame[0] == MOTION_HEADER:
+            # The length of a motion frame follows from its step count.
+            if frame[1] < 1 or frame[1] > MAX_FRAME_STEPS:
+                self.__resync()
+                return
+            if len(frame) < MOTION_FRAME_OVERHEAD + 2 * frame[1]:
+                return
+        elif len(frame) < PACKET_SIZE:
+            return
+
+        if frame[-1] != FOOTER:
+            self.__resync()
+            return
+
+        self.__packetCount += 1
+        if frame[0] == MOTION_HEADER:
+            for index in range(2, len(frame) - 1, 2):
+                self.__x += toSigned(frame[index])
+                self.__y += toSigned(frame[index + 1])
+        elif frame[0] == CLICK_HEADER:
+            self.__x += toSigned(frame[1])
+            self.__y += toSigned(frame[2])
+            action = CLICK_ACTIONS.get(frame[3])
+            if action is not None:
+                button, clickType = action
+                if clickType == ClickType.PRESS:
+                    self.__buttons[button] = True
+                elif clickType == ClickType.RELEASE:
+                    self.__buttons[button] = False
+                self.__clicks.append((button, clickType, self.__x, self.__y))
+        else:
+            pushType = PUSH_TYPES.get(frame[2])
+            if pushType is not None:
+                self.__keys.append((chr(frame[1]), pushType))
+        frame.clear()
+
+
+    def __resync(self):
+        """ Recovers from a corrupt frame by dropping its header and 
+            rescanning what followed it.
+        """
+        self.__frameErrors += 1
+        rest = self.__frame[1:]
+        self.__frame.clear()
+        for each in rest:
+            self.__decode(each)
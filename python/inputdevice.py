@@ -1,8 +1,17 @@
 # Adam Anderson
 # February 24, 2013
 
+from itertools import chain
+from time import monotonic
+from time import perf_counter
+from time import sleep
+
 from commands import *
 from motionmodel import SimpleMotionModel
+from motionmodel import TimedPath
+from motionmodel import framedForPort
+from metrics import ActionMetrics
+from metrics import MeteredPackets
 import communication
 
 
@@ -12,12 +21,26 @@ class Mouse(object):
         serial port object.
     """
     
-    def __init__(self, serialPort, motionModel=SimpleMotionModel()):
+    def __init__(self, serialPort, motionModel=SimpleMotionModel(), motionFrames=None, coalesce=False,
+                 packetRing=None):
         """ Constructor.  Creates a Mouse object with the supplied 
             SerialPort from the serialport module.
             
-            serialPort  - The serial port to send the mouse commands via.
-                          If None/Null is provided, a ValueError is raised.
+            serialPort      - The serial port to send the mouse commands 
+                              via.  If None/Null is provided, a ValueError
+                              is raised.
+                          
+            motionFrames    - True to send paths as motion frames, False 
+                              to send mouse packets.  If not specified the
+                              port's 'motionframes' setting decides.
+                              
+            coalesce        - True to hold back moves and merge them, (see
+                              flush()).
+                              
+            packetRing      - a PacketRing sending to serialPort.  If 
+                              specified, clicks and paths are encoded 
+                              straight into it, (see packetring.py).
+                              Timed moves are sent as usual.
         """
         if serialPort == None:
             raise ValueError("Parameter 'serialPort' cannot be 'None.'")
@@ -26,7 +49,20 @@ class Mouse(object):
             raise ValueError("Parameter 'motionModel' cannot be 'None.'")
         
         self.__serialPort = serialPort
-        self.__motionModel = motionModel
+        self.__motionModel = framedForPort(motionModel, serialPort, motionFrames)
+        self.__packetRing = packetRing
+        
+        # Per-action counters, reported by stats().
+        self.__metrics = ActionMetrics()
+        
+        # When coalescing, the movement not yet sent.
+        self.__coalesce = coalesce
+        self.__pendingX = 0
+        self.__pendingY = 0
+        
+        # The timing of the last timed move, reported by 
+        # getLastMoveTiming().
+        self.__lastMoveTiming = None
         
         self.doClick(MouseButton.LEFT, ClickType.RELEASE)
         self.doClick(MouseButton.RIGHT, ClickType.RELEASE)
@@ -60,24 +96,53 @@ class Mouse(object):
             button      the button to click.
             clickType   the type of click to perform.
         """
-        packet = communication.buildMouseCommand(ClickDescriptor(button, clickType), 0, 0)
+        self.flush()
+        start = perf_counter()
+        if self.__packetRing != None:
+            self.__packetRing.putMouse(ClickDescriptor(button, clickType))
+            self.__packetRing.flush()
+            self.__metrics.record("click", perf_counter() - start, 1, communication.PACKET_SIZE)
+            return
+            
+        packet = communication.encodeMouseCommand(ClickDescriptor(button, clickType), 0, 0)
         self.__serialPort.sendBytes(packet)
+        self.__metrics.record("click", perf_counter() - start, 1, len(packet))
         
     
-    def move(self, xMove, yMove):
+    def move(self, xMove, yMove, durationMs=None, rateHz=None):
         """ Performs a relative move from the mouse's current position.
             When completed, this mouse object will have moved the provided
             xMove value along the x-axis and the yMove value along the 
             y-axis.
             
-            xMove   - the amount of X coordinate movement.
+            xMove       - the amount of X coordinate movement.
                       
-            yMove   - the amount of Y coordinate movement.
-        """
+            yMove       - the amount of Y coordinate movement.
+            
+            durationMs  - if specified, the move is paced to take this 
+                          many milliseconds, sent in ticks at rateHz 
+                          against a monotonic clock, and this call returns
+                          once it is done.  Ticks that fall behind are 
+                          merged so the move catches up.  See 
+                          getLastMoveTiming().
+                          
+            rateHz      - the ticks per second of a timed move, (see
+                          motionmodel.TimedPath).
             
-        # Builds the 
-        for packet in self.__motionModel.getPath(xMove, yMove):
-            self.__serialPort.sendBytes(packet)
+            When coalescing, an untimed move is only recorded, to be sent
+            with any others by the next flush().  A timed move flushes 
+            first.
+        """
+        if durationMs != None:
+            self.flush()
+            self.__sendTimedPath(xMove, yMove, durationMs / 1000.0, rateHz)
+        elif rateHz != None:
+            raise ValueError("rateHz only applies to timed moves; specify durationMs.")
+        elif self.__coalesce:
+            self.__pendingX += xMove
+            self.__pendingY += yMove
+        else:
+            self.__sendPath("move", xMove, yMove)
         
         # update location.
         self.__x += xMove
@@ -100,13 +165,25 @@ class Mouse(object):
         if mouseButton == None:
             raise ValueError("mouseButton must not be None.")
         
-        packets = []
-        packets.append(communication.buildMouseCommand(ClickDescriptor(mouseButton, ClickType.PRESS), 0, 0))
-        packets = packets + self.__motionModel.getPath(xMove, yMove)
-        packets.append(communication.buildMouseCommand(ClickDescriptor(mouseButton, ClickType.RELEASE), 0, 0))
-        
-        for packet in packets:
-            self.__serialPort.sendBytes(packet)
+        self.flush()
+        start = perf_counter()
+        ring = self.__packetRing
+        if ring != None:
+            bytesBefore = ring.getBytesSent()
+            packetsBefore = ring.getPacketsSent()
+            ring.putMouse(ClickDescriptor(mouseButton, ClickType.PRESS))
+            self.__motionModel.writePath(ring, xMove, yMove)
+            ring.putMouse(ClickDescriptor(mouseButton, ClickType.RELEASE))
+            ring.flush()
+            self.__metrics.record("drag", perf_counter() - start, ring.getPacketsSent() - packetsBefore,
+                                  ring.getBytesSent() - bytesBefore)
+        else:
+            press = communication.encodeMouseCommand(ClickDescriptor(mouseButton, ClickType.PRESS), 0, 0)
+            release = communication.encodeMouseCommand(ClickDescriptor(mouseButton, ClickType.RELEASE), 0, 0)
+            
+            path = MeteredPackets(chain([press], self.__motionModel.iterPath(xMove, yMove), [release]))
+            self.__serialPort.sendPackets(path)
+            self.__metrics.recordMetered("drag", perf_counter() - start, path)
         
         # update location.
         self.__x += xMove
@@ -114,23 +191,153 @@ class Mouse(object):
 
     
     def returnToOrigin(self):
-        """ Returns the mouse position to its original position.
+        """ Returns the mouse position to its original position.  When 
+            coalescing, this is merged with any pending moves just as 
+            move() is.
         """
         x = (-1 * self.__x)
         y = (-1 * self.__y)
-        for packet in self.__motionModel.getPath(x, y):
-            self.__serialPort.sendBytes(packet)
+        if self.__coalesce:
+            self.__pendingX += x
+            self.__pendingY += y
+        else:
+            self.__sendPath("returnToOrigin", x, y)
             
         self.__x += x
         self.__y += y
         
         
+    def flush(self):
+        """ Sends any moves held back by coalescing as one merged path, 
+            so that the cursor is where getLocation() says it is.  Clicks
+            and drags flush first, as does a Keyboard given this Mouse.
+            Moves that cancel out send nothing.  Does nothing when not 
+            coalescing.
+        """
+        x = self.__pendingX
+        y = self.__pendingY
+        if x != 0 or y != 0:
+            self.__pendingX = 0
+            self.__pendingY = 0
+            self.__sendPath("flush", x, y)
+        
+        
+    def getPending(self):
+        """ Returns the x and y movement held back by coalescing and not
+            yet sent.
+        """
+        return self.__pendingX, self.__pendingY
+        
+        
     def getLocation(self):
         """ Returns the x and y values (respectively) of this Mouse object's
             current position relative to its original position, (the 
             position the mouse cursor was when the script was started).
         """
         return self.__x, self.__y
+        
+        
+    def getLastMoveTiming(self):
+        """ Returns how the last timed move kept to its time, or None if
+            there has not been one.  A dictionary of:
+            
+            duration        - the seconds the move should have taken.
+            elapsed         - the seconds it did take, until its last
+                              packet was written.
+            overrun         - elapsed - duration: positive if the move ran
+                              late, negative if it finished early.
+            minimumSeconds  - the seconds the link needs for the path at
+                              the port's baud rate.  A move given less 
+                              time than this cannot keep to it.
+            rate            - the ticks per second the move was sent at.
+            ticks           - the number of ticks.
+            lateTicks       - the ticks sent late, merged into a later one.
+            maxLag          - the furthest, in seconds, that a tick was 
+                              sent after its deadline.
+        """
+        return self.__lastMoveTiming
+        
+        
+    def stats(self):
+        """ Returns a snapshot of this Mouse's per-action counters: a 
+            dictionary mapping each action ('click', 'move', 'timedMove',
+            'drag', 'returnToOrigin' and, when coalescing, 'flush') to the number
+            of times it ran, the packets and bytes it sent, and histograms
+            of its total time and of the time spent generating its path.
+        """
+        return self.__metrics.snapshot()
+        
+        
+    def __sendPath(self, action, xMove, yMove):
+        """ Sends the path for a move, recording it as the given action.
+        """
+        start = perf_counter()
+        ring = self.__packetRing
+        if ring != None:
+            bytesBefore = ring.getBytesSent()
+            packetsBefore = ring.getPacketsSent()
+            self.__motionModel.writePath(ring, xMove, yMove)
+            ring.flush()
+            self.__metrics.record(action, perf_counter() - start, ring.getPacketsSent() - packetsBefore,
+                                  ring.getBytesSent() - bytesBefore)
+            return
+            
+        path = MeteredPackets(self.__motionModel.iterPath(xMove, yMove))
+        self.__serialPort.sendPackets(path)
+        self.__metrics.recordMetered(action, perf_counter() - start, path)
+        
+        
+    def __sendTimedPath(self, xMove, yMove, seconds, rateHz):
+        """ Sends a move paced to take the given number of seconds.
+        """
+        start = perf_counter()
+        getConfig = getattr(self.__serialPort, "getConfig", None)
+        plan = TimedPath(self.__motionModel, xMove, yMove, seconds, rateHz,
+                         getConfig().baud if getConfig != None else None)
+        generationSeconds = perf_counter() - start
+        ticks = plan.getTicks()
+        rate = plan.getRate()
+        
+        # Tick i is due (i + 1) / rate seconds after the move begins, so 
+        # that the last arrives as the time runs out.  Deadlines are 
+        # measured from the start, not from the previous tick, so that
+        # time lost to one tick is made up by the next; any ticks already
+        # overdue are sent together.
+        begin = monotonic()
+        sent = 0
+        packetCount = 0
+        lateTicks = 0
+        maxLag = 0.0
+        while sent < len(ticks):
+            deadline = begin + (sent + 1) / rate
+            now = monotonic()
+            if now < deadline:
+                sleep(deadline - now)
+                now = monotonic()
+            
+            due = min(len(ticks), max(sent + 1, int((now - begin) * rate)))
+            maxLag = max(maxLag, now - deadline)
+            lateTicks += due - sent - 1
+            packets = [packet for tick in ticks[sent:due] for packet in tick]
+            if packets:
+                packets = MeteredPackets(packets)
+                self.__serialPort.sendPackets(packets)
+                packetCount += packets.packets
+            sent = due
+        elapsed = monotonic() - begin
+        
+        self.__lastMoveTiming = {
+            "duration": seconds,
+            "elapsed": elapsed,
+            "overrun": elapsed - seconds,
+            "minimumSeconds": plan.getMinimumSeconds(),
+            "rate": rate,
+            "ticks": len(ticks),
+            "lateTicks": lateTicks,
+            "maxLag": maxLag,
+        }
+        self.__metrics.record("timedMove", perf_counter() - start, 
+                              packetCount, plan.getByteCount(), generationSeconds)
 
 
 
@@ -139,23 +346,78 @@ class Keyboard(object):
         keystrokes in an automated fashion.
     """
     
-    def __init__(self, serialPort):
+    def __init__(self, serialPort, mouse=None, packetRing=None):
         """ Constructor, creates a new instance of Keyboard.
+        
+            mouse       - a Mouse on the same device.  If specified, its 
+                          held back moves are flushed before every key is
+                          sent, so keys go to wherever the cursor should 
+                          be.
+                          
+            packetRing  - a PacketRing sending to serialPort.  If 
+                          specified, keys are encoded straight into it, 
+                          (see packetring.py).
         """
         self.__serialPort = serialPort
+        self.__mouse = mouse
+        self.__packetRing = packetRing
+        
+        # Per-action counters, reported by stats().
+        self.__metrics = ActionMetrics()
         
     def typeKey(self, character, keyPushType=KeyPushType.CLICK):
         """ Sends a single key-press as described by the provided KeyPressDescriptor.
         """
-        packet = communication.buildKeyboardCommand(KeyPressDescriptor(character, keyPushType))
+        if self.__mouse != None:
+            self.__mouse.flush()
+        start = perf_counter()
+        if self.__packetRing != None:
+            self.__packetRing.putKey(KeyPressDescriptor(character, keyPushType))
+            self.__packetRing.flush()
+            self.__metrics.record("typeKey", perf_counter() - start, 1, communication.PACKET_SIZE)
+            return
+            
+        packet = communication.encodeKeyboardCommand(KeyPressDescriptor(character, keyPushType))
         self.__serialPort.sendBytes(packet)
+        self.__metrics.record("typeKey", perf_counter() - start, 1, len(packet))
     
     def typeKeyPhrase(self, text):
+        """ Types the provided text, sending a key click for each 
+            character.
+            
+            text    - a String, an iterable of Strings, or a text file
+                      object.  The text is encoded and sent a chunk at a
+                      time, so it may be arbitrarily large.  A String with 
+                      a character that does not encode to a single byte is
+                      rejected with a ValueError before anything is sent; 
+                      streamed text is checked a chunk at a time.
         """
-        """
-        # Get a List of Lists of Bytes
-        packets = communication.buildKeyPhraseCommands(text)
+        if text == None:
+            return
         
-        # for each list of bytes, call send.
-        for packet in packets:
-            self.__serialPort.sendBytes(packet)
+        if self.__mouse != None:
+            self.__mouse.flush()
+        start = perf_counter()
+        ring = self.__packetRing
+        if ring != None:
+            bytesBefore = ring.getBytesSent()
+            packetsBefore = ring.getPacketsSent()
+            try:
+                ring.putKeyPhrase(text)
+            finally:
+                ring.flush()
+            self.__metrics.record("typeKeyPhrase", perf_counter() - start,
+                                  ring.getPacketsSent() - packetsBefore,
+                                  ring.getBytesSent() - bytesBefore)
+            return
+            
+        packets = MeteredPackets(communication.iterKeyPhrasePackets(text))
+        self.__serialPort.sendPackets(packets)
+        self.__metrics.recordMetered("typeKeyPhrase", perf_counter() - start, packets)
+        
+    def stats(self):
+        """ Returns a snapshot of this Keyboard's per-action counters, in
+            the same form as Mouse.stats().  The generation time of 
+            'typeKeyPhrase' is the time spent encoding the phrase.
+        """
+        return self.__metrics.snapshot()
@@ -7,16 +7,49 @@
 # Whats a loopback handler?
 # --------------------------------------------------------------------------
 # Loopback handlers define and interface for how received bytes should be
-# handled.  Whenever a byte is received by a serial port, if loopback is
+# handled.  Whenever bytes are received by a serial port, if loopback is
 # activated for the serial port, the loopback handler is called to 'handle'
-# the newly received byte.
+# the newly received bytes.
+#
+# The serial port reads in chunks and hands each chunk to the handler's
+# handleBytes() method.  Older handlers that only implement handleByte()
+# are wrapped in a ByteLoopbackAdapter, which feeds them one byte at a time.
 #
 # Two simple LoopbackHandlers are defined here - the default one simply 
 # prints out each byte.  The Logging handler writes each byte to a file.
+# The Capture handler keeps its file open and writes timestamped chunks in
+# batches using a compact binary format; readCapture() and captureToText()
+# turn a capture back into something readable.
 # Consider writing your own loopback handler for whatever your project
 # requires.
 # --------------------------------------------------------------------------
 
+import os
+import struct
+import sys
+import threading
+import time
+
+# The first bytes of every capture file.
+CAPTURE_MAGIC = b"BRUCECAP\x01"
+
+# Each record in a capture file is this header - the time the chunk was
+# received (seconds since the epoch) and the chunk length - followed by the
+# chunk itself.
+CAPTURE_RECORD = struct.Struct("<dH")
+
+# The default number of seconds a CaptureLoopbackHandler buffers for.
+CAPTURE_FLUSH_INTERVAL = 1.0
+
+# The default number of buffered bytes that forces a flush.
+CAPTURE_FLUSH_SIZE = 64 * 1024
+
+# The default capture file size at which the file is rotated.
+CAPTURE_MAX_FILE_SIZE = 16 * 1024 * 1024
+
+# The default number of rotated capture files kept.
+CAPTURE_BACKUP_COUNT = 3
+
 class DefaultLoopbackHandler(object):
     """ A simple, loopback handler that simply prints out the bytes 
         received by this serial port to the console.
@@ -30,6 +63,15 @@ class DefaultLoopbackHandler(object):
             of the byte that was received by the serial port.
         """
         print(intByte)
+        
+    def handleBytes(self, chunk):
+        """ This method prints out each byte in a received chunk.
+        
+            The parameter received is a bytes-like object holding every
+            byte read from the serial port in a single read.
+        """
+        for intByte in chunk:
+            print(intByte)
 
 
 class LoggingLoopbackHandler(object):
@@ -55,3 +97,206 @@ class LoggingLoopbackHandler(object):
         """
         with open(self.__filename, 'a') as logFile:
             logFile.write(str(intByte) + "\n")
+            
+    def handleBytes(self, chunk):
+        """ This method logs every byte of a received chunk to the 
+            specified logfile, opening the file once per chunk.
+        """
+        with open(self.__filename, 'a') as logFile:
+            logFile.write("".join(str(intByte) + "\n" for intByte in chunk))
+
+
+class CaptureLoopbackHandler(object):
+    """ A loopback handler that writes every received chunk, with the time
+        it arrived, to a binary capture file.  The file is kept open and
+        records are written in batches, either once flushInterval seconds
+        have passed since the last write or once flushSize bytes are 
+        buffered.  A timer writes out what is left buffered once the 
+        device goes quiet.  When the file reaches maxFileSize it is rotated, in the
+        same way as the logging module's RotatingFileHandler: the current
+        file becomes filename.1, filename.1 becomes filename.2, and so on.
+    """
+    
+    def __init__(self, filename="loopback_capture.bin", flushInterval=CAPTURE_FLUSH_INTERVAL,
+                 flushSize=CAPTURE_FLUSH_SIZE, maxFileSize=CAPTURE_MAX_FILE_SIZE,
+                 backupCount=CAPTURE_BACKUP_COUNT):
+        """ Constructs a CaptureLoopbackHandler and opens its capture file.
+        
+            Params:
+            filename        The name of the capture file.
+            flushInterval   The most seconds a chunk stays buffered before
+                            being written.
+            flushSize       The number of buffered bytes that forces a 
+                            write.
+            maxFileSize     The file size at which the file is rotated.  
+                            0 disables rotation.
+            backupCount     The number of rotated files to keep.
+        """
+        self.__filename = filename
+        self.__flushInterval = flushInterval
+        self.__flushSize = flushSize
+        self.__maxFileSize = maxFileSize
+        self.__backupCount = backupCount
+        
+        self.__buffer = bytearray()
+        self.__lastFlush = time.monotonic()
+        self.__lock = threading.Lock()
+        self.__file = None
+        self.__open()
+        
+        # The timer that writes out the buffer if no more chunks arrive to
+        # trigger a write, or None if nothing is buffered.
+        self.__timer = None
+        
+    def handleByte(self, intByte):
+        """ Captures a single received byte.
+        """
+        self.handleBytes(bytes((intByte,)))
+        
+    def handleBytes(self, chunk):
+        """ Buffers a received chunk as one timestamped record, writing out 
+            the buffer if it is due.
+        """
+        with self.__lock:
+            if self.__file is None:
+                return
+                
+            # Records hold at most 65535 bytes, far more than one read.
+            for start in range(0, len(chunk), 0xFFFF):
+                part = chunk[start:start + 0xFFFF]
+                self.__buffer += CAPTURE_RECORD.pack(time.time(), len(part))
+                self.__buffer += part
+                
+            elapsed = time.monotonic() - self.__lastFlush
+            if len(self.__buffer) >= self.__flushSize or elapsed >= self.__flushInterval:
+                self.__flush()
+            elif self.__timer is None:
+                self.__timer = threading.Timer(self.__flushInterval - elapsed, self.__onTimer)
+                self.__timer.daemon = True
+                self.__timer.start()
+                
+    def flush(self):
+        """ Writes out any buffered records.
+        """
+        with self.__lock:
+            if self.__file is not None:
+                self.__flush()
+                
+    def close(self):
+        """ Writes out any buffered records and closes the capture file.
+        """
+        with self.__lock:
+            if self.__file is not None:
+                self.__flush()
+                self.__file.close()
+                self.__file = None
+                
+    def __onTimer(self):
+        with self.__lock:
+            if self.__file is not None:
+                self.__flush()
+                
+    def __open(self):
+        self.__file = open(self.__filename, "ab")
+        if self.__file.tell() == 0:
+            self.__file.write(CAPTURE_MAGIC)
+    
+    def __flush(self):
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+            
+        if self.__buffer:
+            if (self.__maxFileSize and 
+                    self.__file.tell() + len(self.__buffer) > self.__maxFileSize and
+                    self.__file.tell() > len(CAPTURE_MAGIC)):
+                self.__rotate()
+                
+            self.__file.write(self.__buffer)
+            self.__file.flush()
+            self.__buffer.clear()
+        self.__lastFlush = time.monotonic()
+        
+    def __rotate(self):
+        self.__file.close()
+        if self.__backupCount > 0:
+            for index in range(self.__backupCount - 1, 0, -1):
+                source = "%s.%d" % (self.__filename, index)
+                if os.path.exists(source):
+                    os.replace(source, "%s.%d" % (self.__filename, index + 1))
+            os.replace(self.__filename, self.__filename + ".1")
+        else:
+            os.remove(self.__filename)
+        self.__open()
+
+
+def readCapture(filename):
+    """ Yields a (timestamp, chunk) tuple for each record in a capture 
+        file written by a CaptureLoopbackHandler.
+    """
+    with open(filename, "rb") as captureFile:
+        if captureFile.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError("%s is not a loopback capture file." % filename)
+        
+        while True:
+            header = captureFile.read(CAPTURE_RECORD.size)
+            if len(header) < CAPTURE_RECORD.size:
+                return
+            
+            timestamp, length = CAPTURE_RECORD.unpack(header)
+            chunk = captureFile.read(length)
+            if len(chunk) < length:
+                return
+            yield timestamp, chunk
+
+
+def captureToText(filename, out=sys.stdout):
+    """ Writes a capture file out as text: one line per received byte, 
+        holding the time it arrived and its integer value.
+    """
+    for timestamp, chunk in readCapture(filename):
+        for intByte in chunk:
+            out.write("%.6f %d\n" % (timestamp, intByte))
+
+
+class ByteLoopbackAdapter(object):
+    """ Adapts a loopback handler that only implements handleByte() so that
+        it can receive whole chunks through handleBytes().
+    """
+    
+    def __init__(self, handler):
+        """ Constructs a ByteLoopbackAdapter.
+        
+            Params:
+            handler     The handleByte() loopback handler to adapt.
+        """
+        self.__handler = handler
+        
+    def handleByte(self, intByte):
+        """ Passes a single byte straight through to the adapted handler.
+        """
+        self.__handler.handleByte(intByte)
+        
+    def handleBytes(self, chunk):
+        """ Passes each byte of the chunk to the adapted handler in turn.
+        """
+        handleByte = self.__handler.handleByte
+        for intByte in chunk:
+            handleByte(intByte)
+            
+            
+def asChunkHandler(handler):
+    """ Returns a loopback handler that implements handleBytes().  Handlers
+        that already implement it are returned unchanged, others are 
+        wrapped in a ByteLoopbackAdapter.
+    """
+    if hasattr(handler, "handleBytes"):
+        return handler
+    return ByteLoopbackAdapter(handler)
+
+
+
+if __name__ == "__main__":
+    # Usage: python loopback.py CAPTURE_FILE
+    for each in sys.argv[1:]:
+        captureToText(each)
@@ -0,0 +1,317 @@
+# Depends on:  Python 3.3
+# Created:  October 18, 2026
+
+from communication import WRITE_SIZE
+from communication import countPackets
+from communication import iterJoinedPackets
+from communication import iterPacketSlices
+
+import mmap
+import struct
+import time
+
+# --------------------------------------------------------------------------
+# Macros
+# --------------------------------------------------------------------------
+# A MacroRecorder stands in for a SerialPort.  Hand it to Mouse and Keyboard
+# and every action they perform is captured, already encoded and split into
+# writes, instead of (or as well as) being sent.  save() compiles the
+# recording into a macro file, which a MacroPlayer maps into memory and
+# writes straight to a SerialPort - no motion model or encoder runs on
+# replay.
+#
+#   recorder = MacroRecorder()
+#   mouse = Mouse(recorder, DDAMotionModel())
+#   mouse.move(300, 200)
+#   recorder.delay(0.5)
+#   mouse.doLeftClick()
+#   recorder.save("login.macro")
+#
+#   player = MacroPlayer("login.macro", serialPort)
+#   player.play(loops=10)
+#
+# Each sendPackets() call made to the recorder is one action.  A macro file
+# is laid out as:
+#
+#   MACRO_MAGIC
+#   MACRO_HEADER                    action count, write count
+#   MACRO_ACTION x action count     first write, write count, delay
+#   MACRO_WRITE_END x write count   end offset of each write in the data
+#   data                            every write, back to back
+#
+# All integers are little-endian.  A write is a whole number of packets of
+# at most WRITE_SIZE bytes, exactly as SerialPort.sendPackets() would have
+# written them.  A MacroPlayer hands each write to the port's sendBuffer()
+# straight from the mapped file, splitting it only if the port's writes are
+# smaller, (as when they are paced).
+# --------------------------------------------------------------------------
+
+# The first bytes of every macro file.
+MACRO_MAGIC = b"BRUCEMAC\x01"
+
+# The number of actions and the number of writes in the macro.
+MACRO_HEADER = struct.Struct("<II")
+
+# Each action: the index of its first write, its number of writes, and the
+# seconds to wait before it is played.
+MACRO_ACTION = struct.Struct("<IId")
+
+# The format of one entry of the table of write end offsets.
+MACRO_WRITE_END = "I"
+
+
+class MacroRecorder(object):
+    """ Records the packets sent by Mouse and Keyboard actions.  Use it in
+        place of a SerialPort.
+    """
+
+    def __init__(self, serialPort=None, recordDelays=False):
+        """ Creates an empty MacroRecorder.
+
+            serialPort      - if specified, everything recorded is also
+                              sent on to this SerialPort.
+
+            recordDelays    - if True, the time between one action and
+                              the next is recorded as a delay, so that
+                              replay keeps the recording's pace.
+        """
+        self.__serialPort = serialPort
+        self.__recordDelays = recordDelays
+
+        # Each action as (first write, write count, delay).
+        self.__actions = []
+        self.__writes = []
+        self.__pendingDelay = 0.0
+        self.__lastAction = None
+
+
+    def sendBytes(self, bites):
+        """ Records an array of bytes as one action.
+        """
+        self.sendPackets([bites])
+
+
+    def sendBuffer(self, buffer, packetCount=None):
+        """ Records a buffer of whole packets, (as sent by a PacketRing), 
+            as one action.
+        """
+        self.sendPackets([bytes(buffer)])
+
+
+    def sendByte(self, bite):
+        """ Records a single byte as one action.
+        """
+        self.sendPackets([bite])
+
+
+    def sendPackets(self, packets):
+        """ Records a series of packets as one action.
+        """
+        now = time.monotonic()
+        delay = self.__pendingDelay
+        if self.__recordDelays and self.__lastAction != None:
+            delay += now - self.__lastAction
+        self.__pendingDelay = 0.0
+
+        writes = list(iterJoinedPackets(packets))
+        self.__actions.append((len(self.__writes), len(writes), delay))
+        self.__writes.extend(writes)
+
+        if self.__serialPort != None:
+            self.__serialPort.sendPackets(writes)
+        self.__lastAction = time.monotonic()
+
+
+    def delay(self, seconds):
+        """ Adds a pause of the given number of seconds before the next
+            action.
+        """
+        self.__pendingDelay += seconds
+
+
+    def getActionCount(self):
+        """ Returns the number of actions recorded so far.
+        """
+        return len(self.__actions)
+
+
+    def clear(self):
+        """ Discards everything recorded so far.
+        """
+        self.__actions = []
+        self.__writes = []
+        self.__pendingDelay = 0.0
+        self.__lastAction = None
+
+
+    def save(self, filename):
+        """ Compiles the recording into a macro file.
+        """
+        ends = []
+        end = 0
+        for write in self.__writes:
+            end += len(write)
+            ends.append(end)
+
+        with open(filename, "wb") as macroFile:
+            macroFile.write(MACRO_MAGIC)
+            macroFile.write(MACRO_HEADER.pack(len(self.__actions), len(self.__writes)))
+            for action in self.__actions:
+                macroFile.write(MACRO_ACTION.pack(*action))
+            macroFile.write(struct.pack("<%d%s" % (len(ends), MACRO_WRITE_END), *ends))
+            for write in self.__writes:
+                macroFile.write(write)
+
+
+
+class MacroPlayer(object):
+    """ Replays a macro file to a SerialPort.
+    """
+
+    def __init__(self, filename, serialPort):
+        """ Maps a macro file into memory, ready to play it from its first
+            action.
+
+            filename    - the macro file, as written by MacroRecorder.
+
+            serialPort  - the SerialPort to play the macro to.  A port
+                          without sendBuffer() is sent each write through
+                          sendPackets().
+        """
+        if serialPort == None:
+            raise ValueError("Parameter 'serialPort' cannot be 'None.'")
+        self.__serialPort = serialPort
+        self.__sendBuffer = getattr(serialPort, "sendBuffer", None)
+        getWriteSize = getattr(serialPort, "getWriteSize", None)
+        self.__writeSize = getWriteSize() if getWriteSize != None else WRITE_SIZE
+
+        self.__file = open(filename, "rb")
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except:
+            self.__file.close()
+            raise
+        self.__view = memoryview(self.__map)
+
+        try:
+            self.__parse(filename)
+        except:
+            self.close()
+            raise
+
+        # The index of the next action to play.
+        self.__position = 0
+
+
+    def getActionCount(self):
+        """ Returns the number of actions in the macro.
+        """
+        return len(self.__actions)
+
+
+    def getDelay(self, action):
+        """ Returns the delay before the given action, in seconds.
+        """
+        return self.__actions[action][2]
+
+
+    def seek(self, action):
+        """ Makes the given action the next one to be played.
+        """
+        if action < 0 or action > len(self.__actions):
+            raise IndexError("Action %d is not in the macro." % action)
+        self.__position = action
+
+
+    def tell(self):
+        """ Returns the index of the next action to be played.
+        """
+        return self.__position
+
+
+    def play(self, count=None, loops=1, delays=True):
+        """ Plays actions from the current position.
+
+            count   - the number of actions to play.  If not specified,
+                      plays to the end of the macro.
+
+            loops   - the number of times to play those actions.  None
+                      loops until the call is interrupted.
+
+            delays  - if False, the recorded delays are skipped.
+
+            Afterwards the position is just past the last action played.
+        """
+        start = self.__position
+        stop = len(self.__actions) if count == None else min(start + count, len(self.__actions))
+
+        loop = 0
+        while loops == None or loop < loops:
+            for action in range(start, stop):
+                self.__position = action
+                self.__playAction(action, delays)
+            self.__position = stop
+            loop += 1
+
+
+    def close(self):
+        """ Releases the mapped macro file.
+        """
+        if self.__file != None:
+            self.__data = None
+            self.__view.release()
+            self.__map.close()
+            self.__file.close()
+            self.__file = None
+
+
+    def __playAction(self, action, delays):
+        first, writeCount, delay = self.__actions[action]
+        if delays and delay > 0:
+            time.sleep(delay)
+
+        data = self.__data
+        ends = self.__ends
+        sendBuffer = self.__sendBuffer
+        if sendBuffer == None:
+            self.__serialPort.sendPackets(data[ends[index]:ends[index + 1]]
+                                          for index in range(first, first + writeCount))
+            return
+
+        counts = self.__packetCounts
+        writeSize = self.__writeSize
+        for index in range(first, first + writeCount):
+            start = ends[index]
+            end = ends[index + 1]
+            if end - start <= writeSize:
+                sendBuffer(data[start:end], counts[index])
+            else:
+                for piece in iterPacketSlices(data[start:end], writeSize):
+                    sendBuffer(piece)
+
+
+    def __parse(self, filename):
+        view = self.__view
+        if bytes(view[:len(MACRO_MAGIC)]) != MACRO_MAGIC:
+            raise ValueError("%s is not a macro file." % filename)
+
+        offset = len(MACRO_MAGIC)
+        actionCount, writeCount = MACRO_HEADER.unpack_from(view, offset)
+        offset += MACRO_HEADER.size
+
+        self.__actions = [MACRO_ACTION.unpack_from(view, offset + index * MACRO_ACTION.size)
+                          for index in range(actionCount)]
+        offset += actionCount * MACRO_ACTION.size
+
+        endFormat = "<%d%s" % (writeCount, MACRO_WRITE_END)
+        self.__ends = (0,) + struct.unpack_from(endFormat, view, offset)
+        offset += struct.calcsize(endFormat)
+
+        self.__data = view[offset:]
+        if len(self.__data) < self.__ends[-1]:
+            raise ValueError("%s is truncated." % filename)
+
+        # Counted once, so that replay does not count packets again.
+        ends = self.__ends
+        self.__packetCounts = [countPackets(self.__data[ends[index]:ends[index + 1]])
+                               for index in range(writeCount)]
@@ -0,0 +1,167 @@
+# Depends on:  Python 3.3
+# Created:  October 18, 2026
+
+from communication import countPackets
+from time import perf_counter
+
+# --------------------------------------------------------------------------
+# Metrics
+# --------------------------------------------------------------------------
+# Lightweight counters and histograms used by SerialPort, Mouse and Keyboard
+# to report where time goes.  Recording is a handful of integer operations,
+# so metrics are always on.  Each metric is only ever updated from one
+# thread at a time; a snapshot taken from another thread may be a moment out
+# of date but is never needed to be exact.
+# --------------------------------------------------------------------------
+
+# The number of histogram buckets.  Bucket n holds durations below 2**n
+# microseconds, so the last bucket starts at a little over a minute.
+HISTOGRAM_BUCKETS = 28
+
+
+class Histogram(object):
+    """ A histogram of durations with power-of-two microsecond buckets.
+    """
+
+    __slots__ = ("__counts", "__count", "__total", "__max")
+
+    def __init__(self):
+        """ Creates an empty Histogram.
+        """
+        self.__counts = [0] * HISTOGRAM_BUCKETS
+        self.__count = 0
+        self.__total = 0.0
+        self.__max = 0.0
+
+    def record(self, seconds):
+        """ Records one duration, in seconds.
+        """
+        bucket = int(seconds * 1000000).bit_length()
+        if bucket >= HISTOGRAM_BUCKETS:
+            bucket = HISTOGRAM_BUCKETS - 1
+        self.__counts[bucket] += 1
+        self.__count += 1
+        self.__total += seconds
+        if seconds > self.__max:
+            self.__max = seconds
+
+    def getCount(self):
+        """ Returns the number of durations recorded.
+        """
+        return self.__count
+
+    def getTotal(self):
+        """ Returns the sum of every duration recorded, in seconds.
+        """
+        return self.__total
+
+    def getMax(self):
+        """ Returns the longest duration recorded, in seconds.
+        """
+        return self.__max
+
+    def percentile(self, fraction):
+        """ Returns an upper bound on the given fraction (0 to 1) percentile
+            of the recorded durations, in seconds.
+        """
+        if self.__count == 0:
+            return 0.0
+
+        target = fraction * self.__count
+        seen = 0
+        for bucket, count in enumerate(self.__counts):
+            seen += count
+            if count and seen >= target:
+                return min((1 << bucket) / 1000000.0, self.__max)
+        return self.__max
+
+    def snapshot(self):
+        """ Returns the histogram as a dictionary.  'buckets' maps each
+            non-empty bucket's upper bound, in seconds, to its count.
+        """
+        return {
+            "count":   self.__count,
+            "total":   self.__total,
+            "mean":    self.__total / self.__count if self.__count else 0.0,
+            "max":     self.__max,
+            "p50":     self.percentile(0.50),
+            "p90":     self.percentile(0.90),
+            "p99":     self.percentile(0.99),
+            "buckets": dict(((1 << bucket) / 1000000.0, count)
+                            for bucket, count in enumerate(self.__counts) if count),
+        }
+
+
+class MeteredPackets(object):
+    """ Wraps an iterable of packets, counting the packets and bytes taken
+        from it and the time spent producing them.  Wrapping a motion
+        model's iterPath() measures the time spent generating the path,
+        even though generation is interleaved with writing.  A SerialPort
+        handed a MeteredPackets takes its count of packets rather than
+        counting them again.
+    """
+
+    __slots__ = ("__iterator", "packets", "bytes", "seconds")
+
+    def __init__(self, packets):
+        self.__iterator = iter(packets)
+        self.packets = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = perf_counter()
+        try:
+            packet = next(self.__iterator)
+        finally:
+            self.seconds += perf_counter() - start
+        self.packets += countPackets(packet)
+        self.bytes += len(packet)
+        return packet
+
+
+class ActionMetrics(object):
+    """ Per-action metrics for an input device: how many times each action
+        ran, the packets and bytes it sent, how long it took, and how much
+        of that time was spent generating packets.
+    """
+
+    def __init__(self):
+        """ Creates an empty ActionMetrics.
+        """
+        # action name -> [count, packets, bytes, duration Histogram,
+        #                 generation Histogram]
+        self.__actions = {}
+
+    def record(self, action, seconds, packets=0, byteCount=0, generationSeconds=0.0):
+        """ Records one run of an action.
+        """
+        entry = self.__actions.get(action)
+        if entry is None:
+            entry = [0, 0, 0, Histogram(), Histogram()]
+            self.__actions[action] = entry
+        entry[0] += 1
+        entry[1] += packets
+        entry[2] += byteCount
+        entry[3].record(seconds)
+        entry[4].record(generationSeconds)
+
+    def recordMetered(self, action, seconds, metered):
+        """ Records one run of an action whose packets were counted by a
+            MeteredPackets.
+        """
+        self.record(action, seconds, metered.packets, metered.bytes, metered.seconds)
+
+    def snapshot(self):
+        """ Returns a dictionary mapping each action name to its metrics.
+        """
+        return dict((action, {
+            "count":        entry[0],
+            "packets":      entry[1],
+            "bytes":        entry[2],
+            "seconds":      entry[3].snapshot(),
+            "generation":   entry[4].snapshot(),
+        }) for action, entry in list(self.__actions.items()))
@@ -1,31 +1,87 @@
 # Adam Anderson
 # February 25, 2013
 
+from collections import OrderedDict
 from fractions import Fraction
 from math import floor
 from math import fabs
-from communication import buildMouseCommand
+from communication import encodeMouseCommand
+from communication import iterJoinedPackets
+from communication import WRITE_SIZE
+from communication import MAX_MOVE
+from communication import MAX_FRAME_STEPS
+from communication import MOTION_FRAME_OVERHEAD
+from communication import PACKET_SIZE
+from communication import iterMotionFrames
+from communication import BITS_PER_BYTE
 from commands import ClickDescriptor
 
+import threading
+
 # The maximum allowable denominator - used to reduce fractions to manageable values.
 MAX_DENOMINATOR = 8
 
 MOVE_CHUNK = 2
 
+# The default number of paths a CachingMotionModel keeps.
+CACHE_ENTRIES = 256
+
+# The default number of encoded bytes a CachingMotionModel keeps.
+CACHE_BYTES = 1024 * 1024
+
+# The default rate, in ticks per second, of a TimedPath: the report rate of
+# an ordinary USB mouse.
+TIMED_MOVE_RATE = 125
+
 class MotionModel(object):
     """ A class that represents a MotionModel.  MotionModels use their
-        getPath() method to calculate a List of packets (Lists of bytes)
-        that describe the mouse's motion from one point to another.
+        getPath() method to calculate a List of packets (bytes-like 
+        objects) that describe the mouse's motion from one point to 
+        another.
+        
+        MotionModels may also stream their paths through iterPath(), which
+        yields the same packets lazily so that sending can begin before
+        the whole path has been generated.
     """        
     
     def getPath(self, xMove, yMove):
-        """ Generates a List of Packets (lists of bytes) that describe
+        """ Generates a List of Packets (bytes-like objects) that describe
             the mouse's motions from the current mouse position to the 
             relative position described by the xMove and yMove values.
             
             xMove   - Integer.  the amount of x to move 
         """
         raise NotImplementedError("Sub-classes must implement this method.")
+        
+    def iterPath(self, xMove, yMove):
+        """ Returns an iterator over the same packets getPath() returns.
+            The default implementation simply walks getPath(); sub-classes
+            that can generate their paths lazily should override it.
+        """
+        return iter(self.getPath(xMove, yMove))
+        
+    def iterDeltas(self, xMove, yMove):
+        """ Yields the (x, y) movement of each packet of the path.  The 
+            default implementation reads them back out of iterPath(), 
+            which must yield mouse packets, or chunks of them.
+        """
+        for chunk in self.iterPath(xMove, yMove):
+            if isinstance(chunk, list):
+                chunk = b"".join(chunk)
+            for offset in range(0, len(chunk), PACKET_SIZE):
+                xStep = chunk[offset + 1]
+                yStep = chunk[offset + 2]
+                yield (xStep - 256 if xStep > 127 else xStep,
+                       yStep - 256 if yStep > 127 else yStep)
+                       
+    def writePath(self, packetRing, xMove, yMove):
+        """ Appends the path to a PacketRing, (see packetring.py), rather
+            than returning it.  The default implementation copies in the
+            packets of iterPath(); sub-classes that can encode their steps
+            straight into the ring should override it.
+        """
+        for packet in self.iterPath(xMove, yMove):
+            packetRing.putPacket(packet)
 
 
 class SimpleMotionModel(MotionModel):
@@ -41,7 +97,8 @@ class SimpleMotionModel(MotionModel):
         
     
     def getPath(self, xMove, yMove):
-        """ Returns a List of packets (a packet being a List of Bytes)
+        """ Returns a List of packets (a packet being a read-only view of
+            the packet's bytes)
             that represent a series of moves to create a path from the 
             current position to the relative point specified by the xMove
             and yMove parameters.
@@ -52,14 +109,18 @@ class SimpleMotionModel(MotionModel):
             yMove       - An Integer value that represents the relative
                           y position to move the mouse to.
         """
-
-        # Initialize the packet List to send back.
-        packets = []
+        return list(self.iterPath(xMove, yMove))
+        
         
-        # If both moves are zero, return an empty List - there is 
-        # nowhere to go.
+    def iterPath(self, xMove, yMove):
+        """ Yields the packets of the path described in getPath() one at a
+            time, using constant memory no matter how long the path is.
+        """
+        noClick = ClickDescriptor()
+        
+        # If both moves are zero, there is nowhere to go.
         if xMove == 0 and yMove == 0:
-            return packets
+            return
 
         # if the x-move is zero, chunk up the vertical movements into 
         # lengths of 2.
@@ -67,28 +128,22 @@ class SimpleMotionModel(MotionModel):
             absoluteYMove = abs(yMove)
             moveCount = floor(absoluteYMove / MOVE_CHUNK)
             
-            print("MC", moveCount)
-            
             if (yMove < 0):
                 chunk = -1 * MOVE_CHUNK
             else:
                 chunk = MOVE_CHUNK
             
-            print("C", chunk)
-            
-            
+            packet = encodeMouseCommand(noClick, 0, chunk)
             for i in range(moveCount):
-                packets.append(buildMouseCommand(ClickDescriptor(), 0, chunk))
+                yield packet
                 
             remainder_y = yMove % MOVE_CHUNK
             if chunk * remainder_y < 0:
                 remainder_y = remainder_y * -1
                 
-            print("R", remainder_y)
-            packets.append(buildMouseCommand(ClickDescriptor(), 0, remainder_y))
-            print("\n end")
-            
-            return packets
+            # A zero remainder would be a packet that moves nothing.
+            if remainder_y != 0:
+                yield encodeMouseCommand(noClick, 0, remainder_y)
             
         else:
             # Figure out the Slope of the line from the current position, 
@@ -107,9 +162,10 @@ class SimpleMotionModel(MotionModel):
             # Calculate the number of "whole" moves that need to be made
             moveCount = abs(floor(xMove / slope.denominator))
             
-            # Build and add all of the "whole moves".
+            # Build and yield all of the "whole moves".
+            packet = encodeMouseCommand(noClick, x_chunk, y_chunk)
             for i in range(moveCount):
-                packets.append(buildMouseCommand(ClickDescriptor(), x_chunk, y_chunk))
+                yield packet
 
             # build and append the fractional, "partial" move to put us in the right
             # final position.
@@ -124,5 +180,433 @@ class SimpleMotionModel(MotionModel):
                 if remainder_y * slope.numerator < 0:
                     remainder_y = remainder_y * -1
             
-            packets.append(buildMouseCommand(ClickDescriptor(), remainder_x, remainder_y))
-            return packets
+            if remainder_x != 0 or remainder_y != 0:
+                yield encodeMouseCommand(noClick, remainder_x, remainder_y)
+
+
+class DDAMotionModel(MotionModel):
+    """ A motion model that draws a straight line to the destination with
+        an integer digital differential analyzer.  Each step moves up to 
+        maxStep along the longer axis, so the path uses as few packets as
+        the protocol allows and always ends exactly on the target.
+    """
+    
+    def __init__(self, maxStep=MAX_MOVE):
+        """ Creates a new instance of DDA motion model.
+        
+            maxStep     - the largest movement along either axis in one 
+                          packet, between 1 and 64.  Defaults to 64.
+        """
+        super(DDAMotionModel, self).__init__()
+        
+        if maxStep == None or maxStep < 1 or maxStep > MAX_MOVE:
+            raise ValueError("maxStep must be between 1 and 64 (inclusive).")
+            
+        self.__maxStep = maxStep
+        
+    
+    def getPath(self, xMove, yMove):
+        """ Returns a List of packets that move the mouse in a straight 
+            line by xMove and yMove.
+            
+            xMove       - An Integer value that represents the relative
+                          x position to move the mouse to.
+                          
+            yMove       - An Integer value that represents the relative
+                          y position to move the mouse to.
+        """
+        return list(self.iterPath(xMove, yMove))
+        
+        
+    def iterPath(self, xMove, yMove):
+        """ Yields the packets of the path described in getPath() one at a
+            time.
+        """
+        noClick = ClickDescriptor()
+        for xStep, yStep in self.iterDeltas(xMove, yMove):
+            yield encodeMouseCommand(noClick, xStep, yStep)
+            
+            
+    def iterDeltas(self, xMove, yMove):
+        """ Yields the (x, y) movement of each step of the path.  No step
+            is ever (0, 0).
+        """
+        steps = -(-max(abs(xMove), abs(yMove)) // self.__maxStep)
+        
+        # Position i of n along the line is (i * move) // n; each step is 
+        # the difference between successive positions.  Integer floor
+        # division keeps every step within maxStep and lands the last one 
+        # exactly on the target.
+        lastX = 0
+        lastY = 0
+        for i in range(1, steps + 1):
+            x = (i * xMove) // steps
+            y = (i * yMove) // steps
+            yield x - lastX, y - lastY
+            lastX = x
+            lastY = y
+            
+            
+    def writePath(self, packetRing, xMove, yMove):
+        """ Encodes each step of the path straight into a PacketRing.
+        """
+        noClick = ClickDescriptor()
+        putMouse = packetRing.putMouse
+        for xStep, yStep in self.iterDeltas(xMove, yMove):
+            putMouse(noClick, xStep, yStep)
+
+
+class CachingMotionModel(MotionModel):
+    """ A motion model that wraps any other MotionModel and remembers the
+        paths it generates, keyed by (xMove, yMove).  Paths are stored 
+        pre-joined into immutable bytes chunks that the SerialPort can 
+        write directly, and the least recently used paths are discarded
+        once either the entry limit or the byte budget is exceeded.
+        
+        A single CachingMotionModel may be shared between several Mouse
+        objects.
+    """
+    
+    def __init__(self, motionModel, maxEntries=CACHE_ENTRIES, maxBytes=CACHE_BYTES, chunkSize=WRITE_SIZE):
+        """ Creates a new CachingMotionModel.
+        
+            motionModel - the MotionModel whose paths are cached.  Must not
+                          be None.
+                          
+            maxEntries  - the most paths to keep.
+            
+            maxBytes    - the most encoded bytes to keep across all paths.
+                          A path bigger than this is never cached.
+                          
+            chunkSize   - the largest chunk a path is joined into.
+        """
+        super(CachingMotionModel, self).__init__()
+        
+        if motionModel == None:
+            raise ValueError("Parameter 'motionModel' cannot be 'None.'")
+        
+        self.__motionModel = motionModel
+        self.__maxEntries = maxEntries
+        self.__maxBytes = maxBytes
+        self.__chunkSize = chunkSize
+        
+        # (xMove, yMove) -> (chunks, size), least recently used first.
+        self.__paths = OrderedDict()
+        self.__bytes = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__lock = threading.Lock()
+        
+        
+    def getPath(self, xMove, yMove):
+        """ Returns the path from the wrapped motion model as a tuple of 
+            immutable bytes chunks, each holding one or more whole packets.
+            
+            xMove       - An Integer value that represents the relative
+                          x position to move the mouse to.
+                          
+            yMove       - An Integer value that represents the relative
+                          y position to move the mouse to.
+        """
+        chunks = self.__lookup(xMove, yMove)
+        if chunks is None:
+            chunks = tuple(self.__generate(xMove, yMove))
+        return chunks
+        
+        
+    def iterPath(self, xMove, yMove):
+        """ Returns an iterator over the path's bytes chunks.  Paths that
+            are not yet cached are streamed from the wrapped motion 
+            model's iterPath() and cached once fully sent.
+        """
+        chunks = self.__lookup(xMove, yMove)
+        if chunks is None:
+            return self.__generate(xMove, yMove)
+        return iter(chunks)
+        
+        
+    def iterDeltas(self, xMove, yMove):
+        """ Yields the wrapped model's steps.  Steps are not cached.
+        """
+        return self.__motionModel.iterDeltas(xMove, yMove)
+        
+        
+    def __lookup(self, xMove, yMove):
+        """ Returns the cached chunks for a move, or None on a miss.
+        """
+        key = (xMove, yMove)
+        with self.__lock:
+            entry = self.__paths.get(key)
+            if entry is None:
+                self.__misses += 1
+                return None
+                
+            self.__paths.move_to_end(key)
+            self.__hits += 1
+            return entry[0]
+            
+            
+    def __generate(self, xMove, yMove):
+        """ Yields the wrapped motion model's path in joined chunks and 
+            caches it if the whole path fits within the byte budget.
+        """
+        chunks = []
+        size = 0
+        for chunk in iterJoinedPackets(self.__motionModel.iterPath(xMove, yMove), self.__chunkSize):
+            if chunks is not None:
+                size += len(chunk)
+                if size > self.__maxBytes:
+                    chunks = None
+                else:
+                    chunks.append(chunk)
+            yield chunk
+            
+        if chunks is None:
+            return
+            
+        key = (xMove, yMove)
+        with self.__lock:
+            if key not in self.__paths:
+                self.__paths[key] = (tuple(chunks), size)
+                self.__bytes += size
+                
+                # Evict the least recently used paths until back in budget.
+                while len(self.__paths) > self.__maxEntries or self.__bytes > self.__maxBytes:
+                    evictedSize = self.__paths.popitem(last=False)[1][1]
+                    self.__bytes -= evictedSize
+        
+        
+    def clear(self):
+        """ Discards every cached path.  The hit and miss counts are kept.
+        """
+        with self.__lock:
+            self.__paths.clear()
+            self.__bytes = 0
+            
+            
+    def getHitCount(self):
+        """ Returns the number of paths served from the cache.
+        """
+        return self.__hits
+        
+        
+    def getMissCount(self):
+        """ Returns the number of paths that had to be generated.
+        """
+        return self.__misses
+        
+        
+    def getCachedBytes(self):
+        """ Returns the number of encoded bytes currently cached.
+        """
+        return self.__bytes
+        
+        
+    def getCachedPathCount(self):
+        """ Returns the number of paths currently cached.
+        """
+        return len(self.__paths)
+
+
+class FramedMotionModel(MotionModel):
+    """ A motion model that wraps any other MotionModel and sends its path
+        as motion frames rather than mouse packets, (see the protocol in 
+        communication.py).  The cursor follows exactly the same steps in
+        well under half the bytes.  Only use it with ports whose firmware
+        understands motion frames.
+    """
+    
+    def __init__(self, motionModel=None, stepsPerFrame=MAX_FRAME_STEPS):
+        """ Creates a new FramedMotionModel.
+        
+            motionModel     - the MotionModel whose steps are framed.  If 
+                              not specified a DDAMotionModel is used.
+                              
+            stepsPerFrame   - the most steps in one frame, between 1 and 
+                              MAX_FRAME_STEPS.
+        """
+        super(FramedMotionModel, self).__init__()
+        
+        if stepsPerFrame == None or stepsPerFrame < 1 or stepsPerFrame > MAX_FRAME_STEPS:
+            raise ValueError("stepsPerFrame must be between 1 and %d (inclusive)." % MAX_FRAME_STEPS)
+        
+        self.__motionModel = motionModel if motionModel != None else DDAMotionModel()
+        self.__stepsPerFrame = stepsPerFrame
+        
+        
+    def getMotionModel(self):
+        """ Returns the wrapped MotionModel.
+        """
+        return self.__motionModel
+        
+        
+    def getPath(self, xMove, yMove):
+        """ Returns a List of motion frames that move the mouse by xMove
+            and yMove along the wrapped model's path.
+        """
+        return list(self.iterPath(xMove, yMove))
+        
+        
+    def iterPath(self, xMove, yMove):
+        """ Yields the frames of the path described in getPath() one at a 
+            time.
+        """
+        return iterMotionFrames(self.__motionModel.iterDeltas(xMove, yMove), self.__stepsPerFrame)
+        
+        
+    def iterDeltas(self, xMove, yMove):
+        """ Yields the wrapped model's steps.
+        """
+        return self.__motionModel.iterDeltas(xMove, yMove)
+        
+        
+    def writePath(self, packetRing, xMove, yMove):
+        """ Encodes the frames of the path straight into a PacketRing.
+        """
+        steps = []
+        for step in self.__motionModel.iterDeltas(xMove, yMove):
+            if step[0] == 0 and step[1] == 0:
+                continue
+            steps.append(step)
+            if len(steps) == self.__stepsPerFrame:
+                packetRing.putMotionFrame(steps)
+                steps.clear()
+        if steps:
+            packetRing.putMotionFrame(steps)
+
+
+def framedForPort(motionModel, serialPort, motionFrames=None):
+    """ Returns the motion model a mouse on the given port should use: 
+        motionModel wrapped in a FramedMotionModel if the port is 
+        configured for motion frames, otherwise motionModel itself.
+    
+        motionFrames    - True or False to override the port's 
+                          configuration.  Ports without a getConfig() 
+                          method, (such as a MacroRecorder), default to 
+                          plain mouse packets.
+    """
+    if motionFrames == None:
+        getConfig = getattr(serialPort, "getConfig", None)
+        motionFrames = getConfig != None and getConfig().motionframes
+        
+    if motionFrames and not isinstance(motionModel, FramedMotionModel):
+        # Keep each frame within one of the port's writes, which are 
+        # shorter than WRITE_SIZE when paced.
+        getWriteSize = getattr(serialPort, "getWriteSize", None)
+        writeSize = getWriteSize() if getWriteSize != None else WRITE_SIZE
+        stepsPerFrame = max(1, min(MAX_FRAME_STEPS, (writeSize - MOTION_FRAME_OVERHEAD) // 2))
+        return FramedMotionModel(motionModel, stepsPerFrame)
+    return motionModel
+
+
+class TimedPath(object):
+    """ A path planned to take a given time.  The move is split into ticks
+        sent at a fixed rate, each carrying the part of the path the cursor
+        should cover in that tick, so that the last tick arrives as the
+        time runs out.  The cursor follows the motion model's path, spread
+        evenly over the ticks.
+    """
+    
+    def __init__(self, motionModel, xMove, yMove, seconds, rateHz=None, baud=None):
+        """ Plans a move.
+        
+            motionModel - the MotionModel whose path is followed.  If it is
+                          a FramedMotionModel, ticks are sent as motion 
+                          frames.
+                          
+            seconds     - the time the move should take.
+            
+            rateHz      - the number of ticks per second.  Defaults to 
+                          TIMED_MOVE_RATE.
+                          
+            baud        - the baud rate of the link, if known.  The rate is
+                          lowered to what the link can carry, and the time
+                          the link needs for the whole path is reported by
+                          getMinimumSeconds().
+        """
+        if seconds == None or seconds <= 0:
+            raise ValueError("seconds must be positive.")
+            
+        if rateHz == None:
+            rateHz = TIMED_MOVE_RATE
+        elif rateHz <= 0:
+            raise ValueError("rateHz must be positive.")
+        
+        # Every tick that moves costs at least one packet, so the link
+        # limits how many ticks a second it can carry.
+        linkRate = baud / float(BITS_PER_BYTE) if baud else None
+        if linkRate != None:
+            rateHz = min(rateHz, linkRate / PACKET_SIZE)
+        
+        tickCount = max(1, int(round(seconds * rateHz)))
+        self.__rate = tickCount / float(seconds)
+        self.__ticks = self.__plan(motionModel, xMove, yMove, tickCount)
+        self.__byteCount = sum(len(packet) for tick in self.__ticks for packet in tick)
+        self.__minimumSeconds = self.__byteCount / linkRate if linkRate != None else 0.0
+        
+        
+    def getRate(self):
+        """ Returns the number of ticks per second.  This is the requested
+            rate, adjusted so that a whole number of ticks fills the time.
+        """
+        return self.__rate
+        
+        
+    def getTicks(self):
+        """ Returns a List holding, for each tick, the List of packets to 
+            send at that tick.  A tick that does not move holds no packets.
+        """
+        return self.__ticks
+        
+        
+    def getByteCount(self):
+        """ Returns the number of bytes in the whole path.
+        """
+        return self.__byteCount
+        
+        
+    def getMinimumSeconds(self):
+        """ Returns the time the link needs to carry the whole path, or 0 if
+            the baud rate is not known.  A move planned to take less time 
+            than this will overrun.
+        """
+        return self.__minimumSeconds
+        
+        
+    def __plan(self, motionModel, xMove, yMove, tickCount):
+        framed = isinstance(motionModel, FramedMotionModel)
+        
+        # The model's path as a series of positions.
+        positions = [(0, 0)]
+        for xStep, yStep in motionModel.iterDeltas(xMove, yMove):
+            x, y = positions[-1]
+            positions.append((x + xStep, y + yStep))
+        
+        # Tick i ends at fraction i / tickCount of the way along the path,
+        # measured in the model's steps, interpolated between positions 
+        # and rounded to whole pixels.
+        steps = len(positions) - 1
+        splitter = DDAMotionModel()
+        noClick = ClickDescriptor()
+        ticks = []
+        lastX = 0
+        lastY = 0
+        for tick in range(1, tickCount + 1):
+            if tick == tickCount:
+                x, y = xMove, yMove
+            else:
+                index, remainder = divmod(tick * steps, tickCount)
+                x, y = positions[index]
+                if remainder:
+                    xNext, yNext = positions[index + 1]
+                    x = int(floor(x + (xNext - x) * remainder / float(tickCount) + 0.5))
+                    y = int(floor(y + (yNext - y) * remainder / float(tickCount) + 0.5))
+            
+            tickSteps = splitter.iterDeltas(x - lastX, y - lastY)
+            if framed:
+                ticks.append(list(iterMotionFrames(tickSteps)))
+            else:
+                ticks.append([encodeMouseCommand(noClick, xStep, yStep) for xStep, yStep in tickSteps])
+            lastX = x
+            lastY = y
+        return ticks
@@ -0,0 +1,177 @@
+# Depends on:  Python 3.3
+# Created:  October 18, 2026
+
+from communication import BITS_PER_BYTE
+
+import threading
+import time
+
+# --------------------------------------------------------------------------
+# Output pacing
+# --------------------------------------------------------------------------
+# Left to itself a SerialPort writes as fast as the operating system accepts
+# bytes, and only slows down once the target device sends its wait byte.
+# By then the device's small receive buffer is already full, and the link
+# sits idle until the ready byte arrives: a sawtooth of bursts and stalls.
+#
+# An OutputPacer meters writes with a token bucket instead.  The bucket holds
+# a quarter of the device's buffer size in bytes and fills at the link's
+# byte rate, so that the bytes still in flight when the device asks to wait
+# fit in its buffer, and the long-run rate never exceeds what the link can
+# carry.  Paced writes, and motion frames, are kept to the burst.  If the
+# device still asks to wait, it is consuming bytes more slowly than the link
+# delivers them: the pacer halves its rate and empties the bucket, then
+# creeps back up towards the link rate for as long as the device keeps up
+# (additive increase, multiplicative decrease).  Waits that arrive before the
+# bucket could have refilled at the new rate belong to the same overrun and
+# do not slow the pacer again.
+# --------------------------------------------------------------------------
+
+# The fraction of its rate the pacer keeps each time the device asks it to
+# wait.
+PACER_BACKOFF = 0.5
+
+# The fraction of the link rate the pacer's rate recovers by each second
+# that the device does not ask it to wait.
+PACER_RECOVERY = 0.1
+
+# The lowest fraction of the link rate the pacer will slow down to.
+PACER_MIN_FRACTION = 0.05
+
+# The fraction of the device's buffer the bucket holds: the largest burst.
+# The device asks the host to wait once its buffer is three quarters full,
+# and every byte already in flight must still fit, so a burst is no larger
+# than the room left above that mark.
+PACER_BURST_FRACTION = 0.25
+
+
+class OutputPacer(object):
+    """ A thread-safe token bucket that paces writes to a serial port.
+    """
+
+    def __init__(self, baud, bufferSize):
+        """ Creates an OutputPacer for a link and device.
+
+            baud        - the baud rate of the link.
+
+            bufferSize  - the size, in bytes, of the device's receive
+                          buffer.
+        """
+        if baud == None or baud <= 0:
+            raise ValueError("baud must be positive.")
+
+        if bufferSize == None or bufferSize <= 0:
+            raise ValueError("bufferSize must be positive.")
+
+        self.__maxRate = baud / float(BITS_PER_BYTE)
+        self.__minRate = self.__maxRate * PACER_MIN_FRACTION
+        self.__bufferSize = bufferSize
+        self.__burst = max(1.0, bufferSize * PACER_BURST_FRACTION)
+        self.__lock = threading.Lock()
+
+        self.__rate = self.__maxRate
+        self.__tokens = self.__burst
+        self.__lastRefill = time.monotonic()
+
+        # Until this time, waits are taken to be part of the last back off.
+        self.__holdUntil = 0.0
+
+        # Counters, reported by stats().
+        self.__pacedSeconds = 0.0
+        self.__backOffs = 0
+
+
+    def acquire(self, byteCount):
+        """ Blocks until byteCount bytes may be written, then takes them
+            from the bucket.  Writes larger than the bucket wait for it to
+            fill, and leave it in debt.  Returns the number of seconds spent
+            waiting.
+        """
+        needed = min(byteCount, self.__burst)
+        waited = 0.0
+        while True:
+            with self.__lock:
+                self.__refill()
+                if self.__tokens >= needed:
+                    self.__tokens -= byteCount
+                    self.__pacedSeconds += waited
+                    return waited
+                delay = (needed - self.__tokens) / self.__rate
+
+            time.sleep(delay)
+            waited += delay
+
+
+    def refund(self, byteCount):
+        """ Returns byteCount bytes, acquired for a write that was not
+            made, to the bucket.
+        """
+        with self.__lock:
+            self.__tokens = min(self.__burst, self.__tokens + byteCount)
+
+
+    def deviceWaiting(self):
+        """ Reports that the device has asked the host to wait.  Slows the
+            pacer down, and empties the bucket, since the device's buffer
+            is full.
+        """
+        with self.__lock:
+            self.__refill()
+            self.__tokens = min(self.__tokens, 0.0)
+            if self.__lastRefill < self.__holdUntil:
+                return
+            self.__rate = max(self.__minRate, self.__rate * PACER_BACKOFF)
+            self.__holdUntil = self.__lastRefill + self.__burst / self.__rate
+            self.__backOffs += 1
+
+
+    def reset(self):
+        """ Returns the pacer to the link rate with a full bucket, as for a
+            device that has just been connected.
+        """
+        with self.__lock:
+            self.__rate = self.__maxRate
+            self.__tokens = self.__burst
+            self.__lastRefill = time.monotonic()
+            self.__holdUntil = 0.0
+
+
+    def getBurst(self):
+        """ Returns the largest burst, in bytes, the pacer allows.
+        """
+        return self.__burst
+
+
+    def getRate(self):
+        """ Returns the current rate, in bytes per second.
+        """
+        return self.__rate
+
+
+    def stats(self):
+        """ Returns a snapshot of the pacer as a dictionary:
+
+                rate            - the current rate, in bytes per second.
+                maxRate         - the link rate, in bytes per second.
+                bufferSize      - the device's buffer size, in bytes.
+                pacedSeconds    - total time writers were held back.
+                backOffs        - times the device asked the pacer to wait.
+        """
+        return {
+            "rate":         self.__rate,
+            "maxRate":      self.__maxRate,
+            "bufferSize":   self.__bufferSize,
+            "pacedSeconds": self.__pacedSeconds,
+            "backOffs":     self.__backOffs,
+        }
+
+
+    def __refill(self):
+        """ Adds the tokens earned, and the rate recovered, since the last
+            refill.  Called with the lock held.
+        """
+        now = time.monotonic()
+        elapsed = now - self.__lastRefill
+        self.__lastRefill = now
+        self.__tokens = min(self.__burst, self.__tokens + elapsed * self.__rate)
+        self.__rate = min(self.__maxRate, self.__rate + elapsed * self.__maxRate * PACER_RECOVERY)
@@ -0,0 +1,252 @@
+# Depends on:  Python 3.3
+# Created:  October 18, 2026
+
+from communication import CLICK_HEADER
+from communication import KEY_HEADER
+from communication import FOOTER
+from communication import MOTION_HEADER
+from communication import MAX_MOVE
+from communication import MAX_FRAME_STEPS
+from communication import MOTION_FRAME_OVERHEAD
+from communication import PACKET_SIZE
+from communication import WRITE_SIZE
+from communication import countPackets
+from communication import encodeKeyPhrase
+from communication import iterKeyPhraseText
+from communication import iterPacketSlices
+
+import struct
+
+# --------------------------------------------------------------------------
+# PacketRing
+# --------------------------------------------------------------------------
+# A PacketRing encodes packets in place into one preallocated bytearray and
+# hands the serial port read-only views of it, so that steady-state sending
+# allocates no lists, bytes or bytearrays per packet and gives the garbage
+# collector nothing to pause for.
+#
+#   ring = PacketRing(serialPort)
+#   mouse = Mouse(serialPort, DDAMotionModel(), packetRing=ring)
+#   keyboard = Keyboard(serialPort, packetRing=ring)
+#
+# Packets are appended at the write position.  Once the packets waiting
+# would overflow a single write, they are handed to the port's sendBuffer()
+# as one contiguous view; flush() hands over whatever is left.  A packet is
+# never split across the end of the ring: when one does not fit, the ring
+# flushes and starts again from the beginning.  sendBuffer() writes the
+# view before it returns, so the bytes behind it can be reused straight
+# away.  A PacketRing is not thread-safe; share one between a Mouse and a
+# Keyboard only when both are used from the same thread.
+# --------------------------------------------------------------------------
+
+# The default size of a PacketRing's buffer, in bytes.
+PACKET_RING_SIZE = 64 * WRITE_SIZE
+
+# The layouts of a mouse packet, a keyboard packet, the head of a motion
+# frame and one motion frame step.
+MOUSE_PACKET = struct.Struct("<BbbBB")
+KEY_PACKET = struct.Struct("<BBBBB")
+MOTION_FRAME_HEAD = struct.Struct("<BB")
+MOTION_FRAME_STEP = struct.Struct("<bb")
+
+
+class PacketRing(object):
+    """ A reusable buffer that packets are encoded into in place, and sent
+        from without copying.
+    """
+
+    def __init__(self, serialPort, size=PACKET_RING_SIZE):
+        """ Creates a PacketRing that sends to the given port.
+
+            serialPort  - the port to send to.  It must have a
+                          sendBuffer(buffer, packetCount) method.  If it
+                          has getWriteSize(), writes are kept to that size,
+                          otherwise to WRITE_SIZE.
+
+            size        - the size of the buffer, in bytes.  It must hold
+                          at least one write.
+        """
+        if serialPort == None:
+            raise ValueError("Parameter 'serialPort' cannot be 'None.'")
+
+        getWriteSize = getattr(serialPort, "getWriteSize", None)
+        writeSize = getWriteSize() if getWriteSize != None else WRITE_SIZE
+        if size == None or size < writeSize:
+            raise ValueError("size must be at least %d bytes." % writeSize)
+
+        self.__serialPort = serialPort
+        self.__writeSize = writeSize
+        self.__buffer = bytearray(size)
+        self.__view = memoryview(self.__buffer)
+
+        # The waiting packets run from start to end; end is also where the
+        # next packet is written.
+        self.__start = 0
+        self.__end = 0
+        self.__packets = 0
+
+        # Counters, reported by stats().
+        self.__bytesSent = 0
+        self.__packetsSent = 0
+        self.__writes = 0
+        self.__wraps = 0
+
+
+    def putMouse(self, clickDescriptor, xMove=0, yMove=0):
+        """ Appends a mouse packet.  Accepts the same values as
+            communication.encodeMouseCommand().
+        """
+        if xMove > MAX_MOVE or yMove > MAX_MOVE or xMove < -MAX_MOVE or yMove < -MAX_MOVE:
+            raise ValueError("xMove and yMove must be between -64 and 64 (inclusive).")
+
+        position = self.__reserve(PACKET_SIZE)
+        MOUSE_PACKET.pack_into(self.__buffer, position, CLICK_HEADER, xMove, yMove,
+                               clickDescriptor.getCode(), FOOTER)
+        self.__end = position + PACKET_SIZE
+        self.__packets += 1
+
+
+    def putKey(self, keyPressDescriptor):
+        """ Appends a keyboard packet.
+        """
+        position = self.__reserve(PACKET_SIZE)
+        KEY_PACKET.pack_into(self.__buffer, position, KEY_HEADER, keyPressDescriptor.getKeyCode(),
+                             keyPressDescriptor.getPushTypeCode(), 0, FOOTER)
+        self.__end = position + PACKET_SIZE
+        self.__packets += 1
+
+
+    def putKeyPhrase(self, text):
+        """ Appends a key click for every character of text.  Accepts the
+            same text sources, and checks them in the same way, as
+            communication.iterKeyPhrasePackets(); packets are sent as the
+            ring fills.  Each chunk of text is encoded in one pass and 
+            copied in a write at a time.
+        """
+        step = max(PACKET_SIZE, self.__writeSize // PACKET_SIZE * PACKET_SIZE)
+        for chunk in iterKeyPhraseText(text):
+            packets = memoryview(encodeKeyPhrase(chunk))
+            for offset in range(0, len(packets), step):
+                self.putPacket(packets[offset:offset + step])
+
+
+    def putMotionFrame(self, steps):
+        """ Appends a motion frame carrying the given steps.  Accepts the
+            same steps as communication.encodeMotionFrame().
+        """
+        count = len(steps)
+        if count < 1 or count > MAX_FRAME_STEPS:
+            raise ValueError("A motion frame carries between 1 and %d steps." % MAX_FRAME_STEPS)
+
+        length = MOTION_FRAME_OVERHEAD + 2 * count
+        position = self.__reserve(length)
+        buffer = self.__buffer
+        MOTION_FRAME_HEAD.pack_into(buffer, position, MOTION_HEADER, count)
+        offset = position + MOTION_FRAME_HEAD.size
+        for xMove, yMove in steps:
+            if xMove > MAX_MOVE or yMove > MAX_MOVE or xMove < -MAX_MOVE or yMove < -MAX_MOVE:
+                self.__end = position
+                raise ValueError("xMove and yMove must be between -64 and 64 (inclusive).")
+            MOTION_FRAME_STEP.pack_into(buffer, offset, xMove, yMove)
+            offset += MOTION_FRAME_STEP.size
+        buffer[offset] = FOOTER
+        self.__end = position + length
+        self.__packets += 1
+
+
+    def putPacket(self, packet):
+        """ Appends an already encoded packet, (a List of Bytes or any
+            bytes-like object), by copying it in.  It may hold several 
+            packets, as the chunks of a motion model's path do, and they
+            are counted as communication.countPackets() counts them.  A
+            chunk longer than a write is split between its packets.
+        """
+        if isinstance(packet, list):
+            packet = b"".join(packet)
+        if len(packet) > self.__writeSize:
+            for piece in iterPacketSlices(packet, self.__writeSize):
+                self.__copyIn(piece)
+            return
+        self.__copyIn(packet)
+
+
+    def flush(self):
+        """ Sends every waiting packet.
+        """
+        if self.__end == self.__start:
+            return
+
+        start = self.__start
+        end = self.__end
+        packets = self.__packets
+        self.__start = end
+        self.__packets = 0
+        self.__serialPort.sendBuffer(self.__view[start:end], packets)
+        self.__bytesSent += end - start
+        self.__packetsSent += packets
+        self.__writes += 1
+
+
+    def getBytesSent(self):
+        """ Returns the number of bytes handed to the port so far.
+        """
+        return self.__bytesSent
+
+
+    def getPacketsSent(self):
+        """ Returns the number of packets handed to the port so far.
+        """
+        return self.__packetsSent
+
+
+    def getPending(self):
+        """ Returns the number of bytes waiting to be sent.
+        """
+        return self.__end - self.__start
+
+
+    def stats(self):
+        """ Returns a snapshot of the ring's counters as a dictionary:
+
+                size        - the size of the buffer, in bytes.
+                bytesSent   - bytes handed to the port.
+                packetsSent - packets handed to the port.
+                writes      - calls made to the port's sendBuffer().
+                wraps       - times writing started again from the
+                              beginning of the buffer.
+        """
+        return {
+            "size":         len(self.__buffer),
+            "bytesSent":    self.__bytesSent,
+            "packetsSent":  self.__packetsSent,
+            "writes":       self.__writes,
+            "wraps":        self.__wraps,
+        }
+
+
+    def __copyIn(self, packet):
+        """ Copies packets that fit in one write in at the write position.
+        """
+        length = len(packet)
+        position = self.__reserve(length)
+        self.__buffer[position:position + length] = packet
+        self.__end = position + length
+        self.__packets += countPackets(packet)
+
+
+    def __reserve(self, length):
+        """ Returns the position to write a packet of the given length at,
+            sending the waiting packets first if the packet would overflow
+            their write or run past the end of the buffer.
+        """
+        if self.__end - self.__start + length > self.__writeSize:
+            self.flush()
+
+        if self.__end + length > len(self.__buffer):
+            self.flush()
+            if length > len(self.__buffer):
+                raise ValueError("A %d byte packet does not fit in the ring." % length)
+            self.__start = 0
+            self.__end = 0
+            self.__wraps += 1
+        return self.__end
@@ -4,29 +4,121 @@
 # Updated:  March 25th, 2013
 
 import configparser
+import os
+import threading
 
-# Create a config parser and read in the properties
-config = configparser.RawConfigParser()
-config.read('serial.cfg')
+# The config file read when no other is given, relative to the current
+# directory.
+CONFIG_FILE = 'serial.cfg'
+
+# The section of the config file read when no other is given.  A file may
+# describe several devices, one section each.
+CONFIG_SECTION = 'serial'
+
+# Each setting, the SectionProxy method that reads it, and its default,
+# (None for settings that must be present).
+SETTINGS = (
+    ('port',         'get',        None),
+    ('baud',         'getint',     None),
+    ('readybyte',    'getint',     None),
+    ('waitbyte',     'getint',     None),
+    ('motionframes', 'getboolean', False),
+    ('devicebuffer', 'getint',     0),
+)
+
+# Parsed config files, keyed by absolute path, with the modification time
+# each was read at.
+_cache = {}
+_cacheLock = threading.Lock()
+
+
+def readConfig(filename=CONFIG_FILE):
+    """ Reads a config file and returns its RawConfigParser.  Files are
+        only parsed again once they have changed on disk.  Raises an
+        OSError if the file cannot be read.
+    """
+    path = os.path.abspath(filename)
+    modified = os.stat(path).st_mtime
+    with _cacheLock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == modified:
+            return cached[1]
+
+    parser = configparser.RawConfigParser()
+    with open(path) as configFile:
+        parser.read_file(configFile, path)
+
+    with _cacheLock:
+        _cache[path] = (modified, parser)
+    return parser
 
 
 class SerialConfig(object):
     """ A class that contains all the config properties for Serial communication
         with the Arduino.
+
+        Nothing is read when this module is imported.  Each SerialConfig
+        reads the settings it was not given from its config file as it is
+        created, and only if it needs any.
     """
 
-    # The serial port's identifier (this is '/dev/tty/AM0' on Unix-like systems or 'COM4' on windows systems)
-    port      = config.get('serial', 'port')
+    # port - The serial port's identifier (this is '/dev/tty/AM0' on
+    # Unix-like systems or 'COM4' on windows systems)
+    #
+    # baud - The baudrate to use for serial communications.
+    #
+    # readybyte - The 'go-ahead' byte configured, if any.  When the serial
+    # port receives this byte it knows its okay to transmit more bytes to
+    # the target device.
+    #
+    # waitbyte - the configured 'wait byte', if any.  When the SerialPort
+    # gets this byte it waits until receiving the readbyte before
+    # continuing to xmit more data.
+    #
+    # motionframes - True if the target device's firmware understands
+    # motion frames, (see communication.py).  Mice on this port then send
+    # their paths as frames.  Defaults to False so that existing firmware
+    # keeps working.
+    #
+    # devicebuffer - the size, in bytes, of the target device's receive
+    # buffer.  If set, SerialPorts pace their output to fit it and the baud
+    # rate, (see pacing.py).  Defaults to 0, which leaves output unpaced.
 
-    # The baudrate to use for serial communications.
-    baud      = config.getint('serial', 'baud')
+    def __init__(self, port=None, baud=None, readybyte=None, waitbyte=None, motionframes=None,
+                 devicebuffer=None, filename=None, section=CONFIG_SECTION):
+        """ Creates a SerialConfig holding the given values, with any that
+            are not specified read from a config file.
 
-    # The 'go-ahead' byte configured, if any.  When the serial port
-    # receives this byte it knows its okay to transmit more bytes to
-    # the target device.
-    readybyte = config.getint('serial', 'readybyte')
+            filename    - the config file to read.  If not specified, 
+                          serial.cfg in the current directory is read, 
+                          and only if a required value was not given.
+
+            section     - the section of the config file to read.
+        """
+        self.port = port
+        self.baud = baud
+        self.readybyte = readybyte
+        self.waitbyte = waitbyte
+        self.motionframes = motionframes
+        self.devicebuffer = devicebuffer
+
+        missing = [setting for setting in SETTINGS if getattr(self, setting[0]) is None]
+        if filename is not None or any(default is None for name, read, default in missing):
+            parser = readConfig(filename if filename is not None else CONFIG_FILE)
+            if not parser.has_section(section):
+                raise ValueError("Config file has no [%s] section." % section)
+            values = parser[section]
+        else:
+            values = None
+
+        for name, read, default in missing:
+            if values is not None and name in values:
+                setattr(self, name, getattr(values, read)(name))
+            elif default is not None:
+                setattr(self, name, default)
+            else:
+                raise ValueError("Config setting '%s' is missing from [%s]." % (name, section))
 
-    # the configured 'wait byte', if any.  When the SerialPort gets
-    # this byte it waits until receiving the readbyte before continuing
-    # to xmit more data.
-    waitbyte  = config.getint('serial', 'waitbyte')
+    def __repr__(self):
+        return "SerialConfig(%s)" % ", ".join("%s=%r" % (name, getattr(self, name))
+                                             for name, read, default in SETTINGS)
@@ -0,0 +1,297 @@
+# Depends on:  Python 3.3
+# Created:  October 18, 2026
+
+from concurrent.futures import Future
+from collections import deque
+from itertools import chain
+from itertools import islice
+
+from commands import *
+from motionmodel import SimpleMotionModel
+import communication
+import threading
+
+# --------------------------------------------------------------------------
+# Queued input devices
+# --------------------------------------------------------------------------
+# A SerialWriter owns a dedicated thread that writes packets to a SerialPort
+# on behalf of its callers.  Each submission returns a Future that completes
+# once its last packet has been written, so callers are free to do other work
+# while input streams out.
+#
+# There are two lanes.  Long jobs in the normal lane are written a few
+# packets at a time, and anything waiting in the priority lane is written
+# between those slices - so a key press need not wait for the end of a long
+# motion path.
+#
+# QueuedMouse and QueuedKeyboard mirror Mouse and Keyboard, but return
+# Futures from every action instead of blocking.
+# --------------------------------------------------------------------------
+
+# Lane for jobs that are written strictly in submission order.
+NORMAL = 0
+
+# Lane for jobs that may be written ahead of pending normal jobs.
+PRIORITY = 1
+
+# The default bound on the number of jobs waiting in the queue.
+QUEUE_SIZE = 64
+
+# The number of packets of a normal job written between checks of the
+# priority lane.
+SLICE_PACKETS = communication.WRITE_SIZE // communication.PACKET_SIZE
+
+
+class SerialWriter(object):
+    """ Writes packets to a SerialPort from a dedicated thread.
+    """
+
+    def __init__(self, serialPort, maxQueued=QUEUE_SIZE):
+        """ Constructs a SerialWriter and starts its writer thread.
+
+            serialPort  - the SerialPort to write to.  Must not be None.
+
+            maxQueued   - the most jobs that may be waiting at once.
+                          submit() blocks while the queue is full.
+        """
+        if serialPort == None:
+            raise ValueError("Parameter 'serialPort' cannot be 'None.'")
+
+        self.__serialPort = serialPort
+        self.__maxQueued = maxQueued
+
+        # Each lane holds [packet iterator, future, started] jobs.
+        self.__lanes = (deque(), deque())
+        self.__condition = threading.Condition()
+        self.__closed = False
+
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+
+    def submit(self, packets, priority=NORMAL):
+        """ Queues packets to be written, and returns a Future that
+            completes (with None) once they have all been written, or with
+            the exception that stopped them.
+
+            packets     - an iterable of packets.  It is consumed on the
+                          writer thread, so it may be a lazy iterator such
+                          as MotionModel.iterPath().
+
+            priority    - NORMAL or PRIORITY.
+        """
+        future = Future()
+        with self.__condition:
+            while not self.__closed and self.__queuedCount() >= self.__maxQueued:
+                self.__condition.wait()
+
+            if self.__closed:
+                raise RuntimeError("SerialWriter has been closed.")
+
+            self.__lanes[priority].append([iter(packets), future, False])
+            self.__condition.notify_all()
+
+        return future
+
+
+    def close(self, wait=True):
+        """ Stops accepting jobs.  Jobs already queued are still written.
+
+            wait    - if True, blocks until the queue has drained.
+        """
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+
+        if wait:
+            self.__thread.join()
+
+
+    def __queuedCount(self):
+        return len(self.__lanes[NORMAL]) + len(self.__lanes[PRIORITY])
+
+
+    def __run(self):
+        priorityLane, normalLane = self.__lanes[PRIORITY], self.__lanes[NORMAL]
+        while True:
+            with self.__condition:
+                while not priorityLane and not normalLane:
+                    if self.__closed:
+                        return
+                    self.__condition.wait()
+
+                # Priority jobs are always written whole; normal jobs a
+                # slice at a time so that priority jobs can cut in.
+                lane = priorityLane if priorityLane else normalLane
+                job = lane[0]
+
+            packets, future, started = job
+            if not started:
+                if not future.set_running_or_notify_cancel():
+                    self.__finish(lane)
+                    continue
+                job[2] = True
+
+            try:
+                if lane is priorityLane:
+                    self.__serialPort.sendPackets(packets)
+                    done = True
+                else:
+                    packetSlice = list(islice(packets, SLICE_PACKETS))
+                    self.__serialPort.sendPackets(packetSlice)
+                    done = len(packetSlice) < SLICE_PACKETS
+            except BaseException as e:
+                self.__finish(lane)
+                future.set_exception(e)
+                continue
+
+            if done:
+                self.__finish(lane)
+                future.set_result(None)
+
+
+    def __finish(self, lane):
+        """ Removes the finished job from the front of its lane.
+        """
+        with self.__condition:
+            lane.popleft()
+            self.__condition.notify_all()
+
+
+
+class QueuedMouse(object):
+    """ A Mouse whose actions are written by a SerialWriter.  Every action
+        returns immediately with a Future that completes once the action's
+        packets have been written.
+
+        Location is tracked as actions are queued, so getLocation() reports
+        where the mouse will be once everything queued has been written.
+    """
+
+    def __init__(self, serialWriter, motionModel=SimpleMotionModel()):
+        """ Constructor.  Creates a QueuedMouse that queues its packets on
+            the supplied SerialWriter, and queues the release of both
+            buttons, as Mouse does.
+        """
+        if serialWriter == None:
+            raise ValueError("Parameter 'serialWriter' cannot be 'None.'")
+
+        if motionModel == None:
+            raise ValueError("Parameter 'motionModel' cannot be 'None.'")
+
+        self.__writer = serialWriter
+        self.__motionModel = motionModel
+
+        self.doClick(MouseButton.LEFT, ClickType.RELEASE)
+        self.doClick(MouseButton.RIGHT, ClickType.RELEASE)
+
+        self.__x = 0
+        self.__y = 0
+
+
+    def doLeftClick(self, priority=NORMAL):
+        """ Queues a left click.
+        """
+        return self.doClick(MouseButton.LEFT, ClickType.CLICK, priority)
+
+
+    def doRightClick(self, priority=NORMAL):
+        """ Queues a right click.
+        """
+        return self.doClick(MouseButton.RIGHT, ClickType.CLICK, priority)
+
+
+    def doClick(self, button=MouseButton.LEFT, clickType=ClickType.CLICK, priority=NORMAL):
+        """ Queues a click as specified by the button and click type.
+
+            Clicks default to the NORMAL lane so that they land where the
+            queued moves have put the cursor.  Pass PRIORITY to let a
+            click run ahead of pending motion.
+        """
+        packet = communication.encodeMouseCommand(ClickDescriptor(button, clickType), 0, 0)
+        return self.__writer.submit([packet], priority)
+
+
+    def move(self, xMove, yMove):
+        """ Queues a relative move.  The path is generated lazily on the
+            writer thread.
+        """
+        future = self.__writer.submit(self.__motionModel.iterPath(xMove, yMove))
+        self.__x += xMove
+        self.__y += yMove
+        return future
+
+
+    def doClickDragRelease(self, xMove, yMove, mouseButton=MouseButton.LEFT):
+        """ Queues a click, drag, release operation from the mouse's
+            location.
+        """
+        if mouseButton == None:
+            raise ValueError("mouseButton must not be None.")
+
+        press = communication.encodeMouseCommand(ClickDescriptor(mouseButton, ClickType.PRESS), 0, 0)
+        release = communication.encodeMouseCommand(ClickDescriptor(mouseButton, ClickType.RELEASE), 0, 0)
+
+        future = self.__writer.submit(chain([press], self.__motionModel.iterPath(xMove, yMove), [release]))
+        self.__x += xMove
+        self.__y += yMove
+        return future
+
+
+    def returnToOrigin(self):
+        """ Queues a move back to the mouse's original position.
+        """
+        return self.move(-1 * self.__x, -1 * self.__y)
+
+
+    def getLocation(self):
+        """ Returns the x and y values (respectively) the mouse will be at
+            relative to its original position once every queued action
+            has been written.
+        """
+        return self.__x, self.__y
+
+
+
+class QueuedKeyboard(object):
+    """ A Keyboard whose key presses are written by a SerialWriter.  Every
+        action returns a Future.
+    """
+
+    def __init__(self, serialWriter, priority=NORMAL):
+        """ Constructor.
+
+            serialWriter    - the SerialWriter to queue packets on.
+
+            priority        - the lane key presses are queued in.  Key
+                              presses default to the NORMAL lane so that
+                              they land in the field the queued clicks
+                              have focused.  Pass PRIORITY to let them
+                              run ahead of pending motion.
+        """
+        if serialWriter == None:
+            raise ValueError("Parameter 'serialWriter' cannot be 'None.'")
+
+        self.__writer = serialWriter
+        self.__priority = priority
+
+    def typeKey(self, character, keyPushType=KeyPushType.CLICK):
+        """ Queues a single key push of the provided character.
+        """
+        packet = communication.encodeKeyboardCommand(KeyPressDescriptor(character, keyPushType))
+        return self.__writer.submit([packet], self.__priority)
+
+    def typeKeyPhrase(self, text):
+        """ Queues a key click for each character of the provided text,
+            which may be any source accepted by Keyboard.typeKeyPhrase().
+            A String is checked here, so a bad character is reported to
+            the caller rather than through the Future; streamed text is 
+            read and encoded on the writer thread.  Nothing is queued for
+            None, and the Future returned is already done.
+        """
+        if text == None:
+            future = Future()
+            future.set_result(None)
+            return future
+
+        return self.__writer.submit(communication.iterKeyPhrasePackets(text), self.__priority)
@@ -0,0 +1,686 @@
+# Depends on:  Python 3.4, PySerial 3.0
+# Created:  October 18, 2026
+
+from concurrent.futures import Future
+from collections import deque
+
+from projectconfig import SerialConfig
+from communication import WRITE_SIZE
+from communication import countPackets
+from loopback import DefaultLoopbackHandler
+from loopback import asChunkHandler
+from metrics import Histogram
+from metrics import MeteredPackets
+from serialport import DeviceStalledError
+from serialport import READ_SIZE
+from motionmodel import SimpleMotionModel
+from inputdevice import Mouse
+from inputdevice import Keyboard
+
+import os
+import selectors
+import serial
+import threading
+import time
+
+# --------------------------------------------------------------------------
+# SerialPortPool
+# --------------------------------------------------------------------------
+# Drives many target devices from one process.  Each device gets its own
+# SerialConfig and a PooledSerialPort, and a single selector thread does all
+# of the I/O for every port: it reads ready and wait bytes as they arrive and
+# writes queued packets as each device is ready for them, using non-blocking
+# reads and writes.  Adding a device adds a file descriptor to the selector,
+# not a thread.
+#
+# A PooledSerialPort can be handed to Mouse and Keyboard like any SerialPort.
+# Its sendPackets() joins the packets into writes on the calling thread and
+# returns at once with a Future; the selector thread writes them out.  Since
+# every port is written independently, actions dispatched to several devices
+# run concurrently:
+#
+#   pool = SerialPortPool({"left": SerialConfig(port="/dev/ttyACM0"),
+#                          "right": SerialConfig(port="/dev/ttyACM1")})
+#   futures = pool.broadcast(lambda device: device.getMouse().move(100, 0))
+#   pool.dispatch(["left"], lambda device: device.getKeyboard().typeKeyPhrase("hi"))
+#
+# The pool relies on each serial port exposing a file descriptor, so it is
+# only available on Unix-like systems.
+# --------------------------------------------------------------------------
+
+class PooledSerialPort(object):
+    """ A SerialPort whose reads and writes are done by a SerialPortPool's
+        selector thread.  Created by SerialPortPool.addPort().
+    """
+
+    def __init__(self, pool, name, config, readyTimeout, stallHandler, readSize):
+        self.__pool = pool
+        self.__name = name
+
+        self.__readyTimeout = readyTimeout
+        self.__stallHandler = stallHandler
+        self.__readSize = readSize
+
+        # The handler for loopback data, or None if loopback is off.
+        self.__loopbackHandler = None
+
+        # Jobs waiting to be written, each [chunk deque, future].  A job
+        # with no chunk deque is a barrier, which completes once every job
+        # before it has been written.
+        self.__jobs = deque()
+
+        # Guards closing against queueing, so that no job is queued after
+        # abandon() has failed the queue.
+        self.__jobsLock = threading.Lock()
+
+        # Selector thread state: the job being written, the unwritten tail
+        # of the chunk being written, whether the device is ready, when it
+        # stopped being ready and when a stall is next reported, and the
+        # first failure since the last barrier.
+        self.__job = None
+        self.__pending = None
+        self.__targetDeviceReady = True
+        self.__blockedSince = None
+        self.__stallDeadline = None
+        self.__failure = None
+        self.__closed = False
+
+        # Counters, as reported by SerialPort.stats().
+        self.__bytesSent = 0
+        self.__packetsSent = 0
+        self.__writeCalls = 0
+        self.__writeTimes = Histogram()
+        self.__blockedTimes = Histogram()
+        self.__waitTransitions = 0
+        self.__readyTransitions = 0
+        self.__bytesRead = 0
+        self.__readCalls = 0
+
+        # Open the port and switch its descriptor to non-blocking mode.
+        self.__config = config
+        self.__serialPort = serial.Serial(config.port, baudrate=config.baud, timeout=0)
+        self.__fd = self.__serialPort.fileno()
+        os.set_blocking(self.__fd, False)
+
+        #ready and wait
+        self.__ready = config.readybyte
+        self.__wait = config.waitbyte
+
+
+    def getName(self):
+        """ Returns the name this port was added to its pool under.
+        """
+        return self.__name
+
+
+    def getConfig(self):
+        """ Returns the SerialConfig this port was opened with.
+        """
+        return self.__config
+
+
+    def fileno(self):
+        """ Returns the serial port's file descriptor.
+        """
+        return self.__fd
+
+
+    def sendBytes(self, bites):
+        """ Queues an array of bytes to be sent in a single write.  Returns
+            a Future, as sendPackets() does.
+        """
+        return self.sendPackets([bites])
+
+
+    def sendByte(self, bite):
+        """ Queues a single byte to be sent.  Returns a Future, as
+            sendPackets() does.
+        """
+        return self.sendPackets([bite])
+
+
+    def sendPackets(self, packets):
+        """ Joins a series of packets into writes, exactly as
+            SerialPort.sendPackets() does, and queues them to be written by
+            the pool's selector thread.  Returns a Future that completes
+            (with None) once every write has been made, or with the
+            exception that stopped them.
+
+            The packets are consumed before this method returns, so lazy
+            iterators such as MotionModel.iterPath() are safe to pass.
+        """
+        chunks = deque()
+        buffer = bytearray()
+        count = 0
+
+        # A MeteredPackets counts its packets as they are taken from it, so
+        # they are not counted again here.
+        metered = isinstance(packets, MeteredPackets)
+        for packet in packets:
+            if isinstance(packet, list):
+                packet = b"".join(packet)
+            if not metered:
+                count += countPackets(packet)
+
+            if buffer and len(buffer) + len(packet) > WRITE_SIZE:
+                chunks.append(bytes(buffer))
+                buffer.clear()
+
+            buffer += packet
+
+        if buffer:
+            chunks.append(bytes(buffer))
+        self.__packetsSent += packets.packets if metered else count
+
+        return self.__enqueue(chunks)
+
+
+    def barrier(self):
+        """ Returns a Future that completes once everything queued on this
+            port so far has been written.  If any of it failed, the Future
+            fails with the first such exception.
+        """
+        return self.__enqueue(None)
+
+
+    def stats(self):
+        """ Returns a snapshot of this port's counters, in the same form as
+            SerialPort.stats().  packetsSent counts packets as they are
+            queued.
+        """
+        blocked = self.__blockedTimes.snapshot()
+        return {
+            "bytesSent":            self.__bytesSent,
+            "packetsSent":          self.__packetsSent,
+            "writeCalls":           self.__writeCalls,
+            "writeSeconds":         self.__writeTimes.snapshot(),
+            "waitTransitions":      self.__waitTransitions,
+            "readyTransitions":     self.__readyTransitions,
+            "blockedSeconds":       blocked["total"],
+            "maxBlockedSeconds":    blocked["max"],
+            "blocked":              blocked,
+            "bytesRead":            self.__bytesRead,
+            "readCalls":            self.__readCalls,
+        }
+
+
+    def startLoopback(self, loopbackHandler=DefaultLoopbackHandler()):
+        """ Enables loopback for debug purposes using the provided
+            LoopbackHandler.  The handler is called on the pool's selector
+            thread.
+        """
+        self.__loopbackHandler = asChunkHandler(loopbackHandler)
+
+
+    def endLoopback(self):
+        """ Turns off loopback for debug purposes.
+        """
+        self.__loopbackHandler = None
+
+
+    def close(self):
+        """ Removes this port from its pool and closes it.  Anything still
+            queued fails.
+        """
+        self.__pool.removePort(self.__name)
+
+
+    def __enqueue(self, chunks):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        with self.__jobsLock:
+            if self.__closed:
+                raise RuntimeError("Port '%s' has been closed." % self.__name)
+            self.__jobs.append([chunks, future])
+        self.__pool.wake()
+        return future
+
+
+    # ----------------------------------------------------------------------
+    # Selector thread
+    # ----------------------------------------------------------------------
+    # The methods below are only called by the pool's selector thread.
+    # ----------------------------------------------------------------------
+
+    def handleReadable(self):
+        """ Reads whatever the device has sent and tracks its ready state.
+            Raises OSError if the port has failed.
+        """
+        try:
+            chunk = os.read(self.__fd, self.__readSize)
+        except BlockingIOError:
+            return
+
+        if not chunk:
+            # The descriptor is readable but at its end: the device has
+            # gone away.
+            raise OSError("Port '%s' was closed by the device." % self.__name)
+        self.__readCalls += 1
+        self.__bytesRead += len(chunk)
+
+        handler = self.__loopbackHandler
+        if handler != None:
+            handler.handleBytes(chunk)
+
+        # Only the last ready or wait byte in the chunk matters.
+        waitIndex = chunk.rfind(self.__wait)
+        readyIndex = chunk.rfind(self.__ready)
+        if waitIndex > readyIndex and self.__targetDeviceReady:
+            self.__targetDeviceReady = False
+            self.__waitTransitions += 1
+
+        elif readyIndex > waitIndex and not self.__targetDeviceReady:
+            self.__targetDeviceReady = True
+            self.__readyTransitions += 1
+
+
+    def pump(self, now):
+        """ Writes as much queued data as the device and the descriptor
+            will take.  Returns True if the descriptor is full and the
+            port should be woken when it becomes writable.
+        """
+        while True:
+            if self.__pending:
+                try:
+                    start = time.perf_counter()
+                    written = os.write(self.__fd, self.__pending)
+                    self.__writeTimes.record(time.perf_counter() - start)
+                except BlockingIOError:
+                    return True
+                except OSError as e:
+                    self.__pending = None
+                    self.__fail(e)
+                    continue
+
+                self.__writeCalls += 1
+                self.__bytesSent += written
+                self.__pending = self.__pending[written:]
+                if self.__pending:
+                    return True
+
+            if self.__job == None:
+                if not self.__jobs:
+                    return False
+                self.__job = self.__jobs.popleft()
+
+            chunks, future = self.__job
+            if chunks == None:
+                # A barrier - report the first failure since the last one.
+                self.__job = None
+                failure, self.__failure = self.__failure, None
+                if failure == None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(failure)
+                continue
+
+            if not chunks:
+                self.__job = None
+                future.set_result(None)
+                continue
+
+            # Flow control is honored between writes, as by SerialPort.
+            if not self.__targetDeviceReady:
+                if not self.__checkStall(now):
+                    return False
+                continue
+
+            if self.__blockedSince != None:
+                self.__blockedTimes.record(now - self.__blockedSince)
+                self.__blockedSince = None
+                self.__stallDeadline = None
+
+            self.__pending = memoryview(chunks.popleft())
+
+
+    def getStallDeadline(self):
+        """ Returns the time.monotonic() time at which this port next
+            reports a stall, or None.
+        """
+        return self.__stallDeadline
+
+
+    def hasWork(self):
+        """ Returns True if anything is waiting to be written.
+        """
+        return self.__job != None or bool(self.__jobs)
+
+
+    def abandon(self, exception):
+        """ Fails every queued job with the given exception, and closes the
+            serial port.
+        """
+        with self.__jobsLock:
+            self.__closed = True
+            jobs = list(self.__jobs)
+            self.__jobs.clear()
+        self.__pending = None
+        if self.__job != None:
+            self.__job[1].set_exception(exception)
+            self.__job = None
+        for chunks, future in jobs:
+            future.set_exception(exception)
+        self.__serialPort.close()
+
+
+    def __checkStall(self, now):
+        """ Tracks time spent waiting for the device.  Returns True if the
+            current job was abandoned because of a stall.
+        """
+        if self.__blockedSince == None:
+            self.__blockedSince = now
+            if self.__readyTimeout != None:
+                self.__stallDeadline = now + self.__readyTimeout
+            return False
+
+        if self.__stallDeadline == None or now < self.__stallDeadline:
+            return False
+
+        waited = now - self.__blockedSince
+        self.__stallDeadline = now + self.__readyTimeout
+        try:
+            if self.__stallHandler == None:
+                raise DeviceStalledError("Target device not ready after %.3f seconds." % waited)
+            self.__stallHandler(self, waited)
+        except Exception as e:
+            # Abandon the current job; the next one waits afresh.
+            self.__blockedTimes.record(waited)
+            self.__blockedSince = None
+            self.__stallDeadline = None
+            self.__fail(e)
+            return True
+        return False
+
+
+    def __fail(self, exception):
+        """ Fails the job being written.
+        """
+        chunks, future = self.__job
+        self.__job = None
+        future.set_exception(exception)
+        if self.__failure == None:
+            self.__failure = exception
+
+
+
+class PooledDevice(object):
+    """ One target device in a SerialPortPool: its port, and a Mouse and
+        Keyboard driving it.
+    """
+
+    def __init__(self, serialPort, motionModel):
+        self.__serialPort = serialPort
+        self.__motionModel = motionModel
+        self.__mouse = None
+        self.__keyboard = None
+
+    def getName(self):
+        """ Returns the device's name in the pool.
+        """
+        return self.__serialPort.getName()
+
+    def getPort(self):
+        """ Returns the device's PooledSerialPort.
+        """
+        return self.__serialPort
+
+    def getMouse(self):
+        """ Returns the device's Mouse, creating it on first use.
+        """
+        if self.__mouse == None:
+            self.__mouse = Mouse(self.__serialPort, self.__motionModel)
+        return self.__mouse
+
+    def getKeyboard(self):
+        """ Returns the device's Keyboard, creating it on first use.
+        """
+        if self.__keyboard == None:
+            self.__keyboard = Keyboard(self.__serialPort)
+        return self.__keyboard
+
+
+
+class SerialPortPool(object):
+    """ Owns a set of PooledSerialPorts and the selector thread that does
+        their I/O.
+    """
+
+    def __init__(self, configs=(), readyTimeout=None, stallHandler=None,
+                 readSize=READ_SIZE, motionModel=SimpleMotionModel()):
+        """ Opens a port for each device and starts the selector thread.
+
+            configs         - the devices to open: either a dictionary
+                              mapping device names to SerialConfigs, or an
+                              iterable of SerialConfigs, each named after
+                              its port.
+
+            readyTimeout,
+            stallHandler,
+            readSize        - as for SerialPort, applied to every port.  A
+                              stall handler is called on the selector
+                              thread; if it raises, the job being written
+                              fails with its exception.
+
+            motionModel     - the motion model for each device's Mouse.
+        """
+        self.__readyTimeout = readyTimeout
+        self.__stallHandler = stallHandler
+        self.__readSize = readSize
+        self.__motionModel = motionModel
+
+        # Name -> PooledDevice, in the order the devices were added.  Only
+        # replaced, never mutated, so readers need no lock.
+        self.__devices = {}
+        self.__lock = threading.Lock()
+
+        # Registration changes for the selector thread to apply.
+        self.__changes = deque()
+
+        self.__selector = selectors.DefaultSelector()
+        self.__wakeRead, self.__wakeWrite = os.pipe()
+        os.set_blocking(self.__wakeRead, False)
+        os.set_blocking(self.__wakeWrite, False)
+        self.__selector.register(self.__wakeRead, selectors.EVENT_READ, None)
+
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+        if isinstance(configs, dict):
+            configs = configs.items()
+        else:
+            configs = ((config.port, config) for config in configs)
+        try:
+            for name, config in configs:
+                self.addPort(name, config)
+        except:
+            self.close()
+            raise
+
+
+    def addPort(self, name, config=None):
+        """ Opens a port for a new device and adds it to the pool.  Returns
+            its PooledDevice.
+
+            name    - the device's name.  Must be unique in the pool.
+
+            config  - the device's SerialConfig.  If not specified the
+                      values from serial.cfg are used.
+        """
+        if config == None:
+            config = SerialConfig()
+
+        with self.__lock:
+            if name in self.__devices:
+                raise ValueError("A device named '%s' is already in the pool." % name)
+
+            port = PooledSerialPort(self, name, config, self.__readyTimeout,
+                                    self.__stallHandler, self.__readSize)
+            device = PooledDevice(port, self.__motionModel)
+            devices = dict(self.__devices)
+            devices[name] = device
+            self.__devices = devices
+
+            # Queued under the lock, so that a removal of this device can
+            # never be queued ahead of its addition.
+            self.__changes.append((True, port))
+        self.wake()
+        return device
+
+
+    def removePort(self, name):
+        """ Removes a device from the pool and closes its port.  Anything
+            still queued for it fails.
+        """
+        with self.__lock:
+            devices = dict(self.__devices)
+            device = devices.pop(name)
+            self.__devices = devices
+            self.__changes.append((False, device.getPort()))
+
+        self.wake()
+
+
+    def getDevice(self, name):
+        """ Returns the PooledDevice with the given name.
+        """
+        return self.__devices[name]
+
+
+    def getDevices(self):
+        """ Returns a List of every PooledDevice in the pool.
+        """
+        return list(self.__devices.values())
+
+
+    def getNames(self):
+        """ Returns a List of the names of the devices in the pool.
+        """
+        return list(self.__devices.keys())
+
+
+    def dispatch(self, names, action):
+        """ Runs action(device) for each named device, then returns a
+            dictionary mapping each name to a Future that completes once
+            everything the action queued on that device has been written.
+
+            The actions themselves only encode and queue packets, so they
+            run one after another on the calling thread; the writes to
+            each device then proceed concurrently.
+        """
+        futures = {}
+        for name in names:
+            device = self.__devices[name]
+            action(device)
+            futures[name] = device.getPort().barrier()
+        return futures
+
+
+    def broadcast(self, action):
+        """ Runs action(device) for every device in the pool, as dispatch()
+            does.
+        """
+        return self.dispatch(self.getNames(), action)
+
+
+    def stats(self):
+        """ Returns a dictionary mapping each device name to its port's
+            stats().
+        """
+        return dict((name, device.getPort().stats())
+                    for name, device in self.__devices.items())
+
+
+    def wake(self):
+        """ Wakes the selector thread to look for new work.
+        """
+        try:
+            os.write(self.__wakeWrite, b"\0")
+        except OSError:
+            # Already awake, or about to be, or closed.
+            pass
+
+
+    def close(self):
+        """ Stops the selector thread and closes every port.  Anything
+            still queued fails.
+        """
+        if not self.__running:
+            return
+        self.__running = False
+        self.wake()
+        if self.__thread is not threading.current_thread():
+            self.__thread.join()
+
+
+    def __run(self):
+        selector = self.__selector
+        registered = {}
+        try:
+            while self.__running:
+                # Apply additions and removals requested by other threads.
+                while self.__changes:
+                    add, port = self.__changes.popleft()
+                    if add:
+                        selector.register(port.fileno(), selectors.EVENT_READ, port)
+                        registered[port] = selectors.EVENT_READ
+                    elif port in registered:
+                        self.__drop(port, registered, RuntimeError("Port '%s' was removed from the pool." % port.getName()))
+
+                # Write whatever can be written, and sleep until there is
+                # more to read or room to write, or a stall is due.
+                now = time.monotonic()
+                timeout = None
+                for port in registered:
+                    events = selectors.EVENT_READ
+                    if port.hasWork():
+                        if port.pump(now):
+                            events |= selectors.EVENT_WRITE
+                        deadline = port.getStallDeadline()
+                        if deadline != None:
+                            timeout = deadline - now if timeout == None else min(timeout, deadline - now)
+
+                    if events != registered[port]:
+                        selector.modify(port.fileno(), events, port)
+                        registered[port] = events
+
+                if timeout != None:
+                    timeout = max(timeout, 0)
+                for key, mask in selector.select(timeout):
+                    if key.data == None:
+                        try:
+                            while os.read(self.__wakeRead, 4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                    elif mask & selectors.EVENT_READ:
+                        try:
+                            key.data.handleReadable()
+                        except OSError as e:
+                            # The device has gone away; take it out of the
+                            # pool and fail whatever was queued for it.
+                            self.__drop(key.data, registered, e)
+                            with self.__lock:
+                                devices = dict(self.__devices)
+                                devices.pop(key.data.getName(), None)
+                                self.__devices = devices
+        finally:
+            for port in registered:
+                selector.unregister(port.fileno())
+                port.abandon(RuntimeError("SerialPortPool has been closed."))
+            # Ports added but not yet picked up by the loop.
+            while self.__changes:
+                add, port = self.__changes.popleft()
+                if add:
+                    port.abandon(RuntimeError("SerialPortPool has been closed."))
+            selector.close()
+            os.close(self.__wakeRead)
+            os.close(self.__wakeWrite)
+
+
+    def __drop(self, port, registered, exception):
+        """ Stops selecting on a port and abandons it.
+        """
+        self.__selector.unregister(port.fileno())
+        del registered[port]
+        port.abandon(exception)
@@ -1,9 +1,18 @@
 # Adam Anderson
-# Depends on:  Python 3.3, PySerial 2.6
+# Depends on:  Python 3.3, PySerial 3.0
 # Created:  February 12, 2012
 # Updated:  March 25, 2013
 
 from projectconfig import SerialConfig
+from communication import PACKET_SIZE
+from communication import WRITE_SIZE
+from communication import countPackets
+from communication import iterPacketSlices
+from loopback import DefaultLoopbackHandler
+from loopback import asChunkHandler
+from metrics import Histogram
+from metrics import MeteredPackets
+from pacing import OutputPacer
 
 import serial
 import threading
@@ -15,17 +24,99 @@ import time
 # The SerialPort object wraps the Serial Port provided by the pyserial project
 # to provide a dirt simple, easy to manipulate API.
 #
-# At construction the SerialPort starts listening for incoming data.  A custom
-# LoopbackHandler can be created and provided to handle incoming data.
+# The serial port is opened lazily, on the first write or an explicit open(),
+# and the SerialPort starts listening for incoming data once it is open.  A
+# custom LoopbackHandler can be created and provided to handle incoming data.
+#
+# If the connection is lost - the device is unplugged, or re-enumerates after
+# a USB reset - the SerialPort reopens it, backing off between attempts.  A
+# write that failed is retried on the new connection, so queued output
+# resumes where it stopped.  A write that failed part way through may be
+# sent again in full.
+#
+# If the config gives the size of the device's receive buffer, writes are
+# paced to fit it and the baud rate, so that the device rarely needs to send
+# its wait byte; see pacing.py.
+#
+# The SerialPort keeps running counters of what it has sent and received and
+# how long it has spent waiting on the target device; see stats().
 # --------------------------------------------------------------------------
 
+# The default maximum number of bytes the listener reads at once.
+READ_SIZE = 256
+
+# The first pause between attempts to reconnect, in seconds.  Each failed
+# attempt doubles it, up to RECONNECT_MAX_DELAY.
+RECONNECT_DELAY = 0.1
+
+# The longest pause between attempts to reconnect, in seconds.
+RECONNECT_MAX_DELAY = 5.0
+
+class DeviceStalledError(Exception):
+    """ Raised when the target device has asked the SerialPort to wait and
+        has not signalled that it is ready again within the configured 
+        timeout.
+    """
+    pass
+
+
 class SerialPort(object):
     """ This is the primary communication class of the project.  This
         class manages and uses the Serial Port connection.
     """
     
-    def __init__(self):
-        """
+    def __init__(self, readyTimeout=None, stallHandler=None, readSize=READ_SIZE, config=None,
+                 lazy=True, reconnect=True, reconnectTimeout=None, pacing=None):
+        """ Constructs a new SerialPort.  The serial port itself is not
+            opened until it is first needed, unless lazy is False.
+            
+            Parameters:
+                readyTimeout    - the number of seconds to wait for the 
+                                  target device to become ready before 
+                                  treating it as stalled.  If not specified
+                                  the SerialPort waits forever.
+                                  
+                stallHandler    - a callable invoked as 
+                                  stallHandler(serialPort, secondsWaited)
+                                  each time readyTimeout elapses without 
+                                  the device becoming ready.  The 
+                                  SerialPort keeps waiting after the 
+                                  handler returns; the handler may raise
+                                  to abandon the write.  If no handler is
+                                  given a DeviceStalledError is raised 
+                                  instead.
+                                  
+                readSize        - the most bytes the listener will read 
+                                  from the serial port at once.
+                                  
+                config          - the SerialConfig to use.  If not 
+                                  specified the values from serial.cfg are
+                                  used.
+                                  
+                lazy            - if False, the serial port is opened 
+                                  now, rather than on first use.
+                                  
+                reconnect       - if True, a lost connection is reopened
+                                  automatically, retrying with back-off,
+                                  and the failed write is retried.  The 
+                                  first open is never retried, so a 
+                                  misconfigured port fails straight away.
+                                  If False, the error is raised and the 
+                                  next write makes a single attempt to
+                                  reopen the port.
+                                  
+                reconnectTimeout - the number of seconds to keep trying to
+                                  reconnect before giving up and raising
+                                  the last error.  If not specified the
+                                  SerialPort keeps trying forever.
+                                  
+                pacing          - True to pace writes with an OutputPacer,
+                                  False not to.  If not specified, writes
+                                  are paced when the config's 
+                                  'devicebuffer' is set.  Without a 
+                                  device buffer size, the pacer assumes a
+                                  buffer of two full writes, and so allows
+                                  bursts of half a write.
         """
         # True if this SerialPort is listening to a loopback on the 
         # serial port.
@@ -37,32 +128,162 @@ class SerialPort(object):
         # True if the target device is ready to receive more bytes.
         self.__targetDeviceReady = True
         
-        # Starts the listening thread.  This thread listens for 'ready'
-        # messages from the target device and changes the value of
-        # self.__targetDeviceReady.
-        thread = threading.Thread(target=self.__listen)
-        thread.start()
-
-        # lock for making boolean access threadsafe.
-        self.__lock = threading.Lock()
-
-        # Initialize the pyserial serial port object that this object wraps.
-        config = SerialConfig()
-        self.__serialPort = serial.Serial(config.port, baudrate=config.baud)
+        # How long to wait for the device before reporting a stall, and
+        # who to report it to.
+        self.__readyTimeout = readyTimeout
+        self.__stallHandler = stallHandler
+        
+        # The largest chunk the listener reads in one go.
+        self.__readSize = readSize
+
+        # Condition guarding the ready state.  Writers wait on it while
+        # the device is not ready and the listener notifies it as soon as 
+        # the ready byte arrives.
+        self.__readyCondition = threading.Condition()
+
+        # Counters, updated by the writing thread and the listener thread
+        # respectively, and reported by stats().
+        self.__bytesSent = 0
+        self.__packetsSent = 0
+        self.__writeCalls = 0
+        self.__writeTimes = Histogram()
+        self.__blockedTimes = Histogram()
+        self.__waitTransitions = 0
+        self.__readyTransitions = 0
+        self.__bytesRead = 0
+        self.__readCalls = 0
+
+        self.__reconnects = 0
+
+        if config == None:
+            config = SerialConfig()
+        self.__config = config
         
         #ready and wait
         self.__ready = config.readybyte
         self.__wait = config.waitbyte
+        
+        # The pacer metering writes, if any.  Paced writes are kept to the
+        # pacer's burst, so that no single write overruns the device.
+        if pacing == None:
+            pacing = bool(config.devicebuffer)
+        self.__pacer = None
+        self.__writeSize = WRITE_SIZE
+        if pacing:
+            self.__pacer = OutputPacer(config.baud, config.devicebuffer or 2 * WRITE_SIZE)
+            burst = int(self.__pacer.getBurst()) // PACKET_SIZE * PACKET_SIZE
+            self.__writeSize = min(WRITE_SIZE, max(burst, PACKET_SIZE))
+        
+        # The pyserial serial port object that this object wraps, and the
+        # thread listening to it, while the port is open.  The lock is held
+        # while the port is being opened or closed.
+        self.__serialPort = None
+        self.__thread = None
+        self.__connectLock = threading.Lock()
+        
+        # Reconnection settings, the pause before the next attempt, and an
+        # event set when the SerialPort is closed to cut short any pause.
+        self.__reconnect = reconnect
+        self.__reconnectTimeout = reconnectTimeout
+        self.__reconnectDelay = 0.0
+        self.__opened = False
+        self.__closed = False
+        self.__closedEvent = threading.Event()
+        
+        if not lazy:
+            self.open()
+
+
+    def open(self):
+        """ Opens the serial port and starts listening to it, if that has
+            not already happened.  Called automatically by the first write.
+        """
+        self.__open(False)
+
+
+    def isOpen(self):
+        """ Returns True if the serial port is currently open.
+        """
+        return self.__serialPort is not None
 
 
     def sendBytes(self, bites):
-        """ Sends an array of bytes via this serial port.
+        """ Sends an array of bytes via this serial port in a single write.
     
             Parameters:
                 bites   - a List of Bytes to send.
         """
-        for bite in bites:
-            self.sendByte(bite)
+        self.sendPackets([bites])
+
+    def sendPackets(self, packets):
+        """ Sends a series of packets via this serial port.  Packets are 
+            joined together into a single contiguous buffer and written
+            out in as few writes as possible.  A packet is never split 
+            across two writes, and the ready/wait state of the target
+            device is checked before each write, so flow control is
+            honored at packet boundaries.
+            
+            Parameters:
+                packets - an iterable of packets.  Each packet may be a 
+                          List of Bytes (as built by the communication
+                          module) or any bytes-like object.
+        """
+        buffer = bytearray()
+        count = 0
+
+        # A MeteredPackets counts its packets as they are taken from it, so
+        # they are not counted again here.
+        metered = isinstance(packets, MeteredPackets)
+        writeSize = self.__writeSize
+        for packet in packets:
+            if isinstance(packet, list):
+                packet = b"".join(packet)
+            if not metered:
+                count += countPackets(packet)
+            
+            # Chunks of several packets longer than a write, (as when 
+            # writes are paced), are split between their packets.
+            if len(packet) > writeSize:
+                if buffer:
+                    self.__write(buffer)
+                    buffer.clear()
+                for piece in iterPacketSlices(packet, writeSize):
+                    self.__write(piece)
+                continue
+            
+            # Write out what has been gathered so far if adding this 
+            # packet would overflow a single write.
+            if buffer and len(buffer) + len(packet) > writeSize:
+                self.__write(buffer)
+                buffer.clear()
+                
+            buffer += packet
+            
+        if buffer:
+            self.__write(buffer)
+        self.__packetsSent += packets.packets if metered else count
+
+    def sendBuffer(self, buffer, packetCount=None):
+        """ Sends a buffer of whole packets in a single write, without 
+            copying it, (see packetring.py).  The write is finished with 
+            the buffer when this returns.
+            
+            Parameters:
+                buffer      - a bytes-like object, normally no larger than
+                              getWriteSize().
+                              
+                packetCount - the number of packets in the buffer.  If not
+                              specified, it is counted, (see 
+                              communication.countPackets()).
+        """
+        self.__write(buffer)
+        self.__packetsSent += packetCount if packetCount != None else countPackets(buffer)
+
+    def getWriteSize(self):
+        """ Returns the largest number of bytes sendPackets() puts in one
+            write: WRITE_SIZE, or less when writes are paced.
+        """
+        return self.__writeSize
 
     def sendByte(self, bite):
         """ Sends a byte into the serial port.
@@ -70,13 +291,116 @@ class SerialPort(object):
             Parameters:
                 bite - a single Byte to send.
         """
-        # Verify the device is ready.
-        while not self.__targetDeviceReady:
-            # If not ready, wait 0.01 seconds and check again.
-            print("Waiting...")
-            time.sleep(0.001)
+        self.__write(bite)
+
+    def __write(self, data):
+        """ Writes the supplied bytes to the serial port once the target 
+            device is ready to receive them, reconnecting and retrying if
+            the connection is lost.
+        """
+        while True:
+            port = self.__serialPort
+            if port is None:
+                port = self.__open(self.__reconnect and self.__opened)
+            
+            if not self.__targetDeviceReady:
+                self.__waitUntilReady()
+                
+                # The connection may have changed while waiting.
+                continue
+    
+            if self.__pacer is not None:
+                self.__pacer.acquire(len(data))
+                
+                # The device may have asked to wait while the pacer held
+                # this write back.  The bytes go back to the pacer, to be
+                # taken again, (not twice), once the device is ready.
+                if not self.__targetDeviceReady:
+                    self.__pacer.refund(len(data))
+                    continue
+                
+            try:
+                start = time.perf_counter()
+                port.write(data)
+            except (serial.SerialException, OSError):
+                self.__connectionLost(port)
+                if self.__closed or not self.__reconnect:
+                    raise
+                continue
+                
+            self.__writeTimes.record(time.perf_counter() - start)
+            self.__writeCalls += 1
+            self.__bytesSent += len(data)
+            self.__reconnectDelay = 0.0
+            return
+
+    def __waitUntilReady(self):
+        """ Blocks until the listener reports that the target device is
+            ready, reporting a stall each time the ready timeout elapses.
+        """
+        start = time.monotonic()
+        try:
+            with self.__readyCondition:
+                while not self.__targetDeviceReady:
+                    if self.__closed:
+                        raise RuntimeError("SerialPort has been closed.")
+                    if self.__readyCondition.wait(self.__readyTimeout):
+                        continue
+                        
+                    waited = time.monotonic() - start
+                    if self.__stallHandler == None:
+                        raise DeviceStalledError("Target device not ready after %.3f seconds." % waited)
+                    self.__stallHandler(self, waited)
+        finally:
+            self.__blockedTimes.record(time.monotonic() - start)
+
+    def getConfig(self):
+        """ Returns the SerialConfig this port was opened with.
+        """
+        return self.__config
 
-        self.__serialPort.write(bite)
+    def stats(self):
+        """ Returns a snapshot of this SerialPort's counters as a 
+            dictionary:
+            
+                bytesSent           - bytes written to the serial port.
+                packetsSent         - packets passed to sendPackets().
+                writeCalls          - writes made to the serial port.
+                writeSeconds        - a Histogram snapshot of the time each
+                                      write took.
+                waitTransitions     - times the device went from ready to 
+                                      waiting.
+                readyTransitions    - times the device went from waiting to
+                                      ready.
+                blockedSeconds      - total time writers spent waiting for 
+                                      the device to become ready.
+                maxBlockedSeconds   - the longest single such wait.
+                blocked             - a Histogram snapshot of those waits.
+                bytesRead           - bytes read by the listener.
+                readCalls           - non-empty reads made by the listener.
+                reconnects          - times a lost connection was reopened.
+                open                - True if the serial port is open.
+                pacing              - the pacer's stats, (see 
+                                      OutputPacer.stats()), or None if 
+                                      writes are not paced.
+        """
+        blocked = self.__blockedTimes.snapshot()
+        return {
+            "bytesSent":            self.__bytesSent,
+            "packetsSent":          self.__packetsSent,
+            "writeCalls":           self.__writeCalls,
+            "writeSeconds":         self.__writeTimes.snapshot(),
+            "waitTransitions":      self.__waitTransitions,
+            "readyTransitions":     self.__readyTransitions,
+            "blockedSeconds":       blocked["total"],
+            "maxBlockedSeconds":    blocked["max"],
+            "blocked":              blocked,
+            "bytesRead":            self.__bytesRead,
+            "readCalls":            self.__readCalls,
+            "reconnects":           self.__reconnects,
+            "open":                 self.__serialPort is not None,
+            "pacing":               self.__pacer.stats() if self.__pacer is not None else None,
+        }
 
     def startLoopback(self, loopbackHandler=DefaultLoopbackHandler()):
         """ Enables loopback for debug purposes using the provided 
@@ -88,7 +412,7 @@ class SerialPort(object):
                                     used which prints out the data to the 
                                     console.
         """
-        self.__loopbackHandler = loopbackHandler
+        self.__loopbackHandler = asChunkHandler(loopbackHandler)
         self.__loopback = True
         
     def endLoopback(self):
@@ -97,36 +421,159 @@ class SerialPort(object):
         self.__loopback = False
         self.__loopbackHandler = None
             
-    def __listen(self):
-        while(True):
-            byteValue = self.__serialPort.read()
-            intValue = int.from_bytes(byteValue, byteorder='little')
+    def close(self):
+        """ Stops listening and closes the underlying serial port.  Any
+            writer still waiting for the device is released with a 
+            RuntimeError.
+        """
+        self.__closed = True
+        self.__closedEvent.set()
+        with self.__connectLock:
+            port, self.__serialPort = self.__serialPort, None
+            thread = self.__thread
             
-            # if loopback is activated, print the received byte 
-            # to the screen.  This should be updated to allow the user
-            # of this API to supply a function that accepts an int as
-            # a parameter.  This function will be called here in order
-            # to enable users to define how they want to
-            # use the loopback values.
-            if (self.__loopback):
-                self.__loopbackHandler.handleByte(intValue)
+        if port is not None:
+            self.__closePort(port)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
             
-            # Listen for the 'ready' and 'not ready' commands coming 
-            # back the target device and indicate as appropriate.
-            if (intValue == self.__wait):
-                # Update Ready State.
-                self.__lock.acquire()
-                try:
-                    if self.__targetDeviceReady:
-                        self.__targetDeviceReady = False
-                finally:
-                    self.__lock.release()
+        with self.__readyCondition:
+            self.__readyCondition.notify_all()
+            
+    def __open(self, reconnecting):
+        """ Opens the serial port if it is not open, and returns it.  If 
+            reconnecting, failed attempts are retried with back-off.
+        """
+        with self.__connectLock:
+            if self.__serialPort is not None:
+                return self.__serialPort
+            
+            deadline = None
+            if self.__reconnectTimeout is not None:
+                deadline = time.monotonic() + self.__reconnectTimeout
                 
-            elif(intValue == self.__ready):
-                # Update Ready State.
-                self.__lock.acquire()
+            while True:
+                if self.__closed:
+                    raise RuntimeError("SerialPort has been closed.")
+                    
+                if self.__reconnectDelay:
+                    self.__closedEvent.wait(self.__reconnectDelay)
+                    if self.__closed:
+                        raise RuntimeError("SerialPort has been closed.")
+                    
                 try:
-                    if not self.__targetDeviceReady:
-                        self.__targetDeviceReady = True
-                finally:
-                    self.__lock.release()
+                    port = serial.Serial(self.__config.port, baudrate=self.__config.baud)
+                    break
+                except (serial.SerialException, OSError):
+                    if not reconnecting or (deadline is not None and time.monotonic() >= deadline):
+                        raise
+                    self.__backOff()
+            
+            # A device that has just been (re)connected has an empty 
+            # buffer, so it is ready.
+            self.__setTargetDeviceReady(True)
+            if self.__pacer is not None:
+                self.__pacer.reset()
+            if self.__opened:
+                self.__reconnects += 1
+            self.__opened = True
+            
+            # Start the listening thread, now that there is a port to 
+            # listen to.  This thread listens for 'ready' messages from the
+            # target device and changes the value of 
+            # self.__targetDeviceReady.
+            self.__serialPort = port
+            self.__thread = threading.Thread(target=self.__listen, args=(port,), daemon=True)
+            self.__thread.start()
+            return port
+            
+    def __backOff(self):
+        """ Lengthens the pause before the next attempt to reconnect.
+        """
+        self.__reconnectDelay = min(max(self.__reconnectDelay * 2, RECONNECT_DELAY), RECONNECT_MAX_DELAY)
+            
+    def __connectionLost(self, port):
+        """ Closes a serial port that has failed, unless it has already 
+            been replaced, so that the next write reopens it.
+        """
+        with self.__connectLock:
+            if self.__serialPort is not port:
+                return
+            self.__serialPort = None
+            self.__backOff()
+        self.__closePort(port)
+        
+        # The lost device's wait no longer applies; release any writer 
+        # waiting on it to reconnect.
+        self.__setTargetDeviceReady(True)
+            
+    def __closePort(self, port):
+        try:
+            if hasattr(port, "cancel_read"):
+                port.cancel_read()
+            port.close()
+        except (serial.SerialException, OSError):
+            pass
+            
+    def __listen(self, port):
+        while self.__serialPort is port:
+            # Block until at least one byte arrives, then take everything 
+            # else that is already waiting, up to the read size.
+            try:
+                waiting = min(max(port.in_waiting, 1), self.__readSize)
+                chunk = port.read(waiting)
+            except (serial.SerialException, OSError, TypeError):
+                # Closing the port from another thread interrupts the read.
+                if self.__serialPort is not port:
+                    return
+                    
+                # The connection has been lost.  Reconnect straight away,
+                # rather than waiting for the next write, so that the
+                # listener is running again when the device comes back.
+                # The new connection gets a listener thread of its own.
+                self.__connectionLost(port)
+                if self.__reconnect:
+                    try:
+                        self.__open(True)
+                    except (serial.SerialException, OSError, RuntimeError):
+                        # Gave up, or closed; the next write tries again.
+                        pass
+                return
+                
+            if not chunk:
+                continue
+            self.__reconnectDelay = 0.0
+            self.__readCalls += 1
+            self.__bytesRead += len(chunk)
+            
+            # if loopback is activated, hand the received bytes to the
+            # loopback handler.
+            handler = self.__loopbackHandler
+            if (self.__loopback and handler != None):
+                handler.handleBytes(chunk)
+            
+            # Listen for the 'ready' and 'not ready' commands coming 
+            # back the target device and indicate as appropriate.  Only
+            # the last of them in the chunk matters.
+            waitIndex = chunk.rfind(self.__wait)
+            readyIndex = chunk.rfind(self.__ready)
+            if (waitIndex > readyIndex):
+                self.__setTargetDeviceReady(False)
+                if self.__pacer is not None:
+                    self.__pacer.deviceWaiting()
+                
+            elif(readyIndex > waitIndex):
+                self.__setTargetDeviceReady(True)
+
+    def __setTargetDeviceReady(self, ready):
+        """ Updates the ready state of the target device and wakes any 
+            writer waiting for it.
+        """
+        with self.__readyCondition:
+            if self.__targetDeviceReady != ready:
+                self.__targetDeviceReady = ready
+                if ready:
+                    self.__readyTransitions += 1
+                    self.__readyCondition.notify_all()
+                else:
+                    self.__waitTransitions += 1
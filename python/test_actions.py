@@ -0,0 +1,61 @@
+# Depends on:  Python 3.3
+# Created:  October 18, 2026
+
+from actions import *
+from commands import *
+
+import unittest
+
+
+class OptimizeActionsTest(unittest.TestCase):
+    """ Checks that optimizeActions() keeps what the device does.
+    """
+
+    def optimize(self, queue):
+        actions, counts = optimizeActions(queue.getActions())
+        return actions
+
+    def testHeldKeyStaysHeldOverMove(self):
+        queue = ActionQueue()
+        queue.typeKey("b", KeyPushType.PRESS)
+        queue.move(10, 10)
+        queue.typeKey("b", KeyPushType.RELEASE)
+        self.assertEqual(self.optimize(queue), [
+            KeyAction("b", KeyPushType.PRESS),
+            MoveAction(10, 10),
+            KeyAction("b", KeyPushType.RELEASE),
+        ])
+
+    def testDragPathIsNotMerged(self):
+        queue = ActionQueue()
+        queue.doClick(MouseButton.LEFT, ClickType.PRESS)
+        queue.move(100, 0)
+        queue.typeKey("x")
+        queue.move(0, 100)
+        queue.doClick(MouseButton.LEFT, ClickType.RELEASE)
+        self.assertEqual(self.optimize(queue), [
+            ClickAction(MouseButton.LEFT, ClickType.PRESS),
+            MoveAction(100, 0),
+            KeyAction("x", KeyPushType.CLICK),
+            MoveAction(0, 100),
+            ClickAction(MouseButton.LEFT, ClickType.RELEASE),
+        ])
+
+    def testKeyClicksReorderAroundFreeMoves(self):
+        queue = ActionQueue()
+        queue.doClick(MouseButton.LEFT, ClickType.RELEASE)
+        queue.move(100, 0)
+        queue.typeKey("x")
+        queue.move(0, 100)
+        queue.doClickDragRelease(0, 0)
+        queue.returnToOrigin()
+        self.assertEqual(self.optimize(queue), [
+            KeyAction("x", KeyPushType.CLICK),
+            MoveAction(100, 100),
+            ClickAction(MouseButton.LEFT, ClickType.CLICK),
+            MoveAction(-100, -100),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# Depends on:  Python 3.7, PySerial 3.0
+# Created:  October 18, 2026
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+if serial != None:
+    from asyncserialport import AsyncSerialPort
+    from emulator import ArduinoEmulator
+
+import asyncio
+import unittest
+
+# The seconds a test waits for a writer to be released.
+TIMEOUT = 5.0
+
+# A key packet, and enough of them to fill a slow device's buffer.
+PACKET = bytes([131, ord("a"), 2, 0, 134])
+FILL = PACKET * 20
+
+
+@unittest.skipIf(serial == None, "PySerial is not installed.")
+class AsyncSerialPortTest(unittest.TestCase):
+    """ Checks that writers waiting on a failed or closed AsyncSerialPort
+        are released.
+    """
+
+    def setUp(self):
+        # A device that all but stops draining, so it soon asks to wait.
+        self.emulator = ArduinoEmulator(drainRate=1.0)
+
+    def tearDown(self):
+        if self.emulator != None:
+            self.emulator.close()
+
+    async def blockedWriter(self, port):
+        """ Fills the device's buffer, and returns a write left waiting for
+            the ready byte.
+        """
+        await port.sendBytes(FILL)
+        for attempt in range(100):
+            await asyncio.sleep(0.01)
+            writer = asyncio.ensure_future(port.sendBytes(PACKET))
+            await asyncio.sleep(0.01)
+            if not writer.done():
+                return writer
+            await writer
+        self.fail("The device never asked the port to wait.")
+
+    async def assertReleased(self, writer, exceptionType):
+        """ Checks that a waiting write fails with the given exception
+            within TIMEOUT seconds.
+        """
+        await asyncio.wait([writer], timeout=TIMEOUT)
+        self.assertTrue(writer.done(), "The writer was left waiting.")
+        self.assertIsInstance(writer.exception(), exceptionType)
+
+    def testCloseReleasesWaitingWriter(self):
+        async def body():
+            port = AsyncSerialPort(config=self.emulator.getConfig())
+            writer = await self.blockedWriter(port)
+            port.close()
+            await self.assertReleased(writer, ConnectionError)
+            with self.assertRaises(ConnectionError):
+                await port.sendBytes(PACKET)
+        asyncio.run(body())
+
+    def testLostDeviceReleasesWaitingWriter(self):
+        async def body():
+            port = AsyncSerialPort(config=self.emulator.getConfig())
+            writer = await self.blockedWriter(port)
+            self.emulator.close()
+            self.emulator = None
+            await self.assertReleased(writer, OSError)
+            port.close()
+        asyncio.run(body())
+
+
+if __name__ == "__main__":
+    unittest.main()
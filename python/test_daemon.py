@@ -0,0 +1,129 @@
+# Depends on:  Python 3.4, PySerial 3.0
+# Created:  October 18, 2026
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+if serial != None:
+    from serialport import SerialPort
+    from emulator import ArduinoEmulator
+
+from daemon import *
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+# The seconds a test waits for a response.
+TIMEOUT = 5.0
+
+# The longest move the daemons under test allow.
+MAX_MOVE = 100
+
+
+if serial != None:
+    class GatedSerialPort(SerialPort):
+        """ A SerialPort whose writes wait for the test to open a gate, and
+            fail while failing is set, as a stalled or lost device would.
+        """
+
+        def __init__(self, **options):
+            SerialPort.__init__(self, **options)
+            self.gate = threading.Event()
+            self.gate.set()
+            self.failing = False
+
+        def sendPackets(self, packets):
+            self.gate.wait(TIMEOUT)
+            if self.failing:
+                raise OSError("The device has gone away.")
+            SerialPort.sendPackets(self, packets)
+
+
+@unittest.skipIf(serial == None, "PySerial is not installed.")
+class DeviceDaemonTest(unittest.TestCase):
+    """ Checks the daemon's move limit, and that it stays responsive, and
+        keeps its location, when the device misbehaves.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "bruce.sock")
+        self.emulator = ArduinoEmulator()
+        self.port = GatedSerialPort(config=self.emulator.getConfig())
+        self.daemon = DeviceDaemon(self.path, self.port, maxMove=MAX_MOVE)
+        self.daemon.start()
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.port.gate.set()
+        self.daemon.close()
+        self.emulator.close()
+        shutil.rmtree(self.directory)
+
+    def connect(self):
+        client = DaemonClient(self.path)
+        self.clients.append(client)
+        return client
+
+    def testMovesAreBounded(self):
+        mouse = DaemonMouse(self.connect())
+        mouse.move(MAX_MOVE, -MAX_MOVE).result(TIMEOUT)
+        with self.assertRaises(DaemonError):
+            mouse.move(MAX_MOVE + 1, 0).result(TIMEOUT)
+        with self.assertRaises(DaemonError):
+            mouse.doClickDragRelease(0, -MAX_MOVE - 1).result(TIMEOUT)
+
+        mouse.move(MAX_MOVE, 0).result(TIMEOUT)
+        with self.assertRaises(DaemonError):
+            mouse.returnToOrigin().result(TIMEOUT)
+
+        self.assertEqual(mouse.getLocation().result(TIMEOUT), (2 * MAX_MOVE, -MAX_MOVE))
+        self.emulator.waitUntilIdle()
+        self.assertEqual(self.emulator.getPosition(), (2 * MAX_MOVE, -MAX_MOVE))
+
+    def testStalledDeviceDoesNotBlockClients(self):
+        mouse = DaemonMouse(self.connect())
+        self.port.gate.clear()
+        move = mouse.move(10, 10)
+
+        # While the move is being written, a new client is still accepted
+        # and read, so one that sends an oversized request is dropped.
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.settimeout(TIMEOUT / 2)
+            connection.connect(self.path)
+            connection.sendall(REQUEST_HEADER.pack(0, OP_MOVE, MAX_PAYLOAD + 1))
+            self.assertEqual(connection.recv(RESPONSE_HEADER.size), b"")
+        finally:
+            connection.close()
+
+        self.assertFalse(move.done())
+        self.port.gate.set()
+        move.result(TIMEOUT)
+        self.assertEqual(mouse.getLocation().result(TIMEOUT), (10, 10))
+
+    def testFailedWriteKeepsLocation(self):
+        mouse = DaemonMouse(self.connect())
+        mouse.move(10, 20).result(TIMEOUT)
+
+        self.port.failing = True
+        with self.assertRaises(DaemonError):
+            mouse.move(30, 30).result(TIMEOUT)
+        self.assertEqual(mouse.getLocation().result(TIMEOUT), (10, 20))
+
+        self.port.failing = False
+        mouse.returnToOrigin().result(TIMEOUT)
+        self.emulator.waitUntilIdle()
+        self.assertEqual(self.emulator.getPosition(), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+# Depends on:  Python 3.4, PySerial 3.0
+# Created:  October 18, 2026
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+if serial != None:
+    from serialpool import SerialPortPool
+    from emulator import ArduinoEmulator
+
+import threading
+import time
+import unittest
+
+# The seconds a test waits for the selector thread to catch up.
+TIMEOUT = 5.0
+
+# The number of times a device is added and removed at once.
+RACES = 50
+
+
+@unittest.skipIf(serial == None, "PySerial is not installed.")
+class SerialPortPoolTest(unittest.TestCase):
+    """ Checks that devices come and go from a SerialPortPool cleanly.
+    """
+
+    def setUp(self):
+        self.emulator = ArduinoEmulator()
+        self.pool = SerialPortPool()
+
+    def tearDown(self):
+        self.pool.close()
+        if self.emulator != None:
+            self.emulator.close()
+
+    def waitUntilClosed(self, port):
+        """ Waits for the selector thread to close a removed port, which
+            then refuses new work.
+        """
+        deadline = time.monotonic() + TIMEOUT
+        while time.monotonic() < deadline:
+            try:
+                port.barrier()
+            except RuntimeError:
+                return
+            time.sleep(0.01)
+        self.fail("Port '%s' was never closed." % port.getName())
+
+    def testRemoveRacingAddClosesPort(self):
+        config = self.emulator.getConfig()
+        for race in range(RACES):
+            removed = threading.Event()
+
+            def remove():
+                while not removed.is_set():
+                    try:
+                        self.pool.removePort("device")
+                        removed.set()
+                    except KeyError:
+                        pass
+
+            remover = threading.Thread(target=remove)
+            remover.start()
+            device = self.pool.addPort("device", config)
+            remover.join(TIMEOUT)
+            self.assertTrue(removed.is_set())
+            self.waitUntilClosed(device.getPort())
+            self.assertEqual(self.pool.getNames(), [])
+
+    def testRemovedPortIsClosed(self):
+        device = self.pool.addPort("device", self.emulator.getConfig())
+        device.getMouse().move(20, 10)
+        device.getPort().barrier().result(TIMEOUT)
+        self.pool.removePort("device")
+        self.waitUntilClosed(device.getPort())
+        self.emulator.waitUntilIdle(TIMEOUT)
+        self.assertEqual(self.emulator.getPosition(), (20, 10))
+
+    def testLostDeviceIsDropped(self):
+        self.pool.addPort("device", self.emulator.getConfig())
+        self.emulator.close()
+        self.emulator = None
+        deadline = time.monotonic() + TIMEOUT
+        while self.pool.getNames() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.pool.getNames(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+# Depends on:  Python 3.3, PySerial 3.0
+# Created:  October 18, 2026
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+if serial != None:
+    from serialport import SerialPort
+    from emulator import ArduinoEmulator
+    from inputdevice import Mouse
+    from inputdevice import Keyboard
+    from packetring import PacketRing
+
+from motionmodel import DDAMotionModel
+
+import unittest
+
+# A device with the default buffer that drains bytes more slowly than the
+# link delivers them, (5760 bytes/s at 57600 baud).
+SLOW_DEVICE = {"bufferSize": 64, "drainRate": 2000.0, "linkRate": 5760.0}
+
+# The text typed in each test.
+PHRASE = "paced writes lose nothing " * 4
+
+
+@unittest.skipIf(serial == None, "PySerial is not installed.")
+class PacedSerialPortTest(unittest.TestCase):
+    """ Checks that a paced SerialPort loses no bytes to a device that
+        cannot keep up with the link.
+    """
+
+    def setUp(self):
+        self.emulator = ArduinoEmulator(**SLOW_DEVICE)
+        config = self.emulator.getConfig()
+        config.devicebuffer = SLOW_DEVICE["bufferSize"]
+        self.port = SerialPort(config=config, pacing=True)
+
+    def tearDown(self):
+        self.port.close()
+        self.emulator.close()
+
+    def assertLossless(self, mouse, keyboard):
+        for i in range(3):
+            mouse.move(1500, -500)
+            mouse.move(-1500, 500)
+        keyboard.typeKeyPhrase(PHRASE)
+        self.emulator.waitUntilIdle()
+
+        self.assertEqual(self.emulator.getStats()["bytesDropped"], 0)
+        self.assertEqual(self.emulator.getPosition(), (0, 0))
+        self.assertEqual(self.emulator.getTypedText(), PHRASE)
+
+    def testPacketsLoseNothing(self):
+        self.assertLossless(Mouse(self.port, DDAMotionModel(), motionFrames=False), Keyboard(self.port))
+
+    def testMotionFramesLoseNothing(self):
+        self.assertLossless(Mouse(self.port, DDAMotionModel(), motionFrames=True), Keyboard(self.port))
+
+    def testPacketRingLosesNothing(self):
+        ring = PacketRing(self.port)
+        self.assertLossless(Mouse(self.port, DDAMotionModel(), motionFrames=False, packetRing=ring),
+                            Keyboard(self.port, packetRing=ring))
+
+
+if __name__ == "__main__":
+    unittest.main()